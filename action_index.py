@@ -0,0 +1,249 @@
+"""
+Action Index Module
+Clusters corrective actions into canonical actions and ranks them for a query,
+and supports direct search over individual actions.
+
+Rewordings of the same control ("Add vent-point check to job plans" /
+"Include a vent check step in the job plan") are grouped by thresholded
+TF-IDF cosine similarity (connected components), and each cluster keeps a
+representative text, its frequency, most common owners and typical timing.
+An incident x canonical-action matrix lets recommendations be aggregated
+over the matching incidents with a single sparse product.
+
+Individual actions are also indexed on their own: a TF-IDF matrix over the
+action and verification text plus facet codes for owner, timing and
+verification, so action queries never have to go through incidents.
+
+The index is built offline and persisted under MODEL_DIR, keyed to the
+action data, so startup only loads it.
+"""
+
+import hashlib
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from config import MODEL_DIR, ACTION_CLUSTER_THRESHOLD, ACTION_BLOCK_SIZE, ACTION_FACET_FIELDS
+from model_store import save_versioned
+
+
+def flatten_actions(data):
+    """
+    Flatten every incident's actions_list into parallel lists.
+    Returns (actions, incident_rows) where incident_rows[i] is the data row
+    the i-th action belongs to.
+    """
+    actions, rows = [], []
+    for row, acts in enumerate(data["actions_list"]):
+        for act in acts:
+            actions.append(act)
+            rows.append(row)
+    return actions, np.asarray(rows, dtype=np.int64)
+
+
+def _clean(value, default="N/A"):
+    text = str(value).strip() if value is not None else ""
+    return default if not text or text.lower() == "nan" else text
+
+
+# Action fields copied into the index records
+_ACTION_FIELDS = ("action_number", "action", "owner", "timing", "verification")
+
+
+def actions_version(data):
+    """Short hash of everything the index records hold: case ids, titles and every action field."""
+    digest = hashlib.sha1()
+    titles = data["title"] if "title" in data else [""] * len(data)
+    for cid, title, acts in zip(data["case_id"].astype(str), titles, data["actions_list"]):
+        digest.update(f"{cid}\x1d{_clean(title, '')}".encode("utf-8"))
+        for act in acts:
+            digest.update(b"\x1f" + "|".join(_clean(act.get(k), "") for k in _ACTION_FIELDS).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()[:12]
+
+
+class ActionIndex:
+    def __init__(self, data, threshold=ACTION_CLUSTER_THRESHOLD):
+        """
+        Build the canonical action index from prepared incident data.
+        :param data: DataFrame with 'actions_list' and 'case_id' (rows aligned with the analyzer)
+        :param threshold: Cosine similarity at which two actions are the same control
+        """
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.version = actions_version(data)
+        actions, incident_rows = flatten_actions(data)
+        texts = [_clean(a.get("action"), "") for a in actions]
+        n_incidents = len(data)
+        case_ids = data["case_id"].astype(str).to_numpy()
+
+        # Flat action table for direct search
+        self.records = [
+            {
+                "case_id": case_ids[row],
+                "title": _clean(data["title"].iloc[row]) if "title" in data else "N/A",
+                "action_number": act.get("action_number"),
+                "action": texts[i],
+                "owner": _clean(act.get("owner")),
+                "timing": _clean(act.get("timing")),
+                "verification": _clean(act.get("verification")),
+            }
+            for i, (act, row) in enumerate(zip(actions, incident_rows))
+        ]
+        self.facets = {}
+        for field in ACTION_FACET_FIELDS:
+            codes, labels = pd.factorize(pd.Series([r[field] for r in self.records], dtype=object))
+            self.facets[field] = (codes.astype(np.int32), np.asarray(labels, dtype=object))
+
+        if not any(texts):
+            self.canonical = []
+            self.incidence = csr_matrix((n_incidents, 0))
+            self.search_vectorizer = None
+            self.search_matrix = None
+            return
+
+        self.search_vectorizer = TfidfVectorizer(stop_words="english", ngram_range=(1, 2), sublinear_tf=True)
+        self.search_matrix = self.search_vectorizer.fit_transform(
+            [f"{r['action']} {r['verification']}" for r in self.records]
+        )
+
+        vectors = TfidfVectorizer(stop_words="english", ngram_range=(1, 2), sublinear_tf=True).fit_transform(texts)
+
+        # Thresholded similarity graph, built in row blocks to bound memory
+        blocks = []
+        for start in range(0, vectors.shape[0], ACTION_BLOCK_SIZE):
+            sims = vectors[start: start + ACTION_BLOCK_SIZE] @ vectors.T
+            sims.data[sims.data < threshold] = 0
+            sims.eliminate_zeros()
+            blocks.append(sims)
+        from scipy.sparse import vstack
+        graph = vstack(blocks).tocsr()
+        n_clusters, labels = connected_components(graph, directed=False)
+
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(n_clusters + 1))
+
+        self.canonical = []
+        for cluster in range(n_clusters):
+            members = order[bounds[cluster]: bounds[cluster + 1]]
+            # Representative: the member most similar to the rest of its cluster
+            if len(members) > 1:
+                centrality = np.asarray(graph[members][:, members].sum(axis=1)).ravel()
+                rep = members[int(centrality.argmax())]
+            else:
+                rep = members[0]
+            owners = Counter(_clean(actions[m].get("owner")) for m in members)
+            timings = Counter(_clean(actions[m].get("timing")) for m in members)
+            self.canonical.append(
+                {
+                    "action": texts[rep],
+                    "frequency": len(members),
+                    "owners": [o for o, _ in owners.most_common(3)],
+                    "timing": timings.most_common(1)[0][0],
+                    "cases": sorted(set(case_ids[incident_rows[members]])),
+                    "variants": sorted({texts[m] for m in members}),
+                }
+            )
+
+        # incidence[i, c] = how many of incident i's actions fall in cluster c
+        self.incidence = csr_matrix(
+            (np.ones(len(labels)), (incident_rows, labels)), shape=(n_incidents, n_clusters)
+        )
+        self._frequency = np.array([c["frequency"] for c in self.canonical], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.canonical)
+
+    def rank(self, incident_scores, top_n=10):
+        """
+        Rank canonical actions for a query.
+
+        :param incident_scores: Array of per-incident relevance (0 for non-matches)
+        :param top_n: Number of canonical actions to return
+        :return: List of (cluster id, score); score = summed relevance of the
+            matching incidents that used the action, ties broken by corpus frequency
+        """
+        if not self.canonical:
+            return []
+        scores = self.incidence.T @ np.asarray(incident_scores, dtype=np.float64)
+        hits = np.flatnonzero(scores > 0)
+        order = np.lexsort((-self._frequency[hits], -scores[hits]))[:top_n]
+        return [(int(c), float(scores[c])) for c in hits[order]]
+
+    def _filter_mask(self, filters):
+        """Mask of actions matching all facet filters (case-insensitive substring on labels)."""
+        mask = np.ones(len(self.records), dtype=bool)
+        for field, val in (filters or {}).items():
+            if not val or field not in self.facets:
+                continue
+            needle = str(val).lower()
+            codes, labels = self.facets[field]
+            hits = [i for i, label in enumerate(labels) if needle in str(label).lower()]
+            mask &= np.isin(codes, hits)
+        return mask
+
+    def search(self, query, filters=None, top_n=10, threshold=0.0):
+        """
+        Search individual actions by text, optionally restricted by facets.
+
+        :param query: Free text matched against action and verification text
+        :param filters: Dict like {'owner': 'Maintenance Planner', 'timing': '<30 days'}
+        :param top_n: Number of actions to return
+        :param threshold: Minimum text score (ignored for filter-only queries)
+        :return: List of action dicts with a 'score'
+        """
+        if not self.records:
+            return []
+        mask = self._filter_mask(filters)
+        scores = np.zeros(len(self.records))
+        if query and query.strip() and self.search_matrix is not None:
+            query_vec = self.search_vectorizer.transform([query])
+            scores = (self.search_matrix @ query_vec.T).toarray().ravel()
+
+        # With filters, every matching action is a result; text only orders them
+        if not filters:
+            mask &= scores > threshold
+        candidates = np.flatnonzero(mask)
+        order = np.argsort(-scores[candidates], kind="stable")[:top_n]
+        return [dict(self.records[i], score=float(scores[i])) for i in candidates[order]]
+
+    @property
+    def path(self):
+        return os.path.join(MODEL_DIR, f"action_index-{self.version}.joblib")
+
+
+def load_or_build(data):
+    """Load the persisted index for this action data, or build and save it."""
+    import joblib
+
+    path = os.path.join(MODEL_DIR, f"action_index-{actions_version(data)}.joblib")
+    if os.path.exists(path):
+        try:
+            return joblib.load(path)
+        except Exception as e:
+            print(f"Error loading action index: {e}")
+
+    index = ActionIndex(data)
+    try:
+        save_versioned(index, path)
+    except OSError as e:
+        print(f"Error saving action index: {e}")
+    return index
+
+
+if __name__ == "__main__":
+    import time
+    from data_loader import prepare_dataset
+
+    df = prepare_dataset()
+    start = time.perf_counter()
+    index = ActionIndex(df)
+    total = int(index.incidence.sum())
+    print(f"Clustered {total} actions into {len(index)} canonical actions in {time.perf_counter() - start:.2f}s")
+
+    for c in sorted(index.canonical, key=lambda c: -c["frequency"])[:10]:
+        print(f"  [{c['frequency']}x] {c['action']}  ({', '.join(c['owners'])}; {c['timing']})")
@@ -1,17 +1,221 @@
-# Agent Implementation
+"""
+Agent Module
+Multi-tool planner on top of ChatbotAgent.
+
+A message can ask several things at once ("we had a chlorine leak — what
+should we do and what training is needed, and how often has this
+happened?"). The planner splits it into clauses, turns each into a tool call
+(recommend, training, search, actions, stats, trending), scores the descriptive part
+of the message once and runs the independent calls concurrently in a shared
+thread pool. A message made only of questions is answered against the
+previous turn's topic when a session is given. Results are
+merged into one response; calls that miss the per-turn latency budget
+(AGENT_TURN_BUDGET seconds) are reported instead of holding up the rest.
+The budget only stops the wait: a tool call already running in a pool
+thread cannot be interrupted, so it finishes in the background and its
+result is discarded. respond_async runs the same plan from an event loop,
+with the tools in an executor and Gemini through its async client.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import AGENT_MAX_WORKERS, AGENT_MAX_STEPS, AGENT_TURN_BUDGET
+from tools import match_intents, topic_text
+
+# Tool calls that need no incident retrieval
+_STANDALONE = ("actions", "trending")
+
+_STEP_LABELS = {
+    "recommend": "Recommendations",
+    "training": "Training suggestions",
+    "search": "Incident search",
+    "actions": "Action search",
+    "related": "Related incidents",
+    "stats": "Statistics",
+    "trending": "Trends",
+}
+
+_pool = {"executor": None}
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    """Thread pool shared by every Agent (created on first use)."""
+    with _pool_lock:
+        if _pool["executor"] is None:
+            _pool["executor"] = ThreadPoolExecutor(
+                max_workers=AGENT_MAX_WORKERS, thread_name_prefix="planner"
+            )
+        return _pool["executor"]
+
 
 class Agent:
-    def __init__(self, name):
-        self.name = name
+    def __init__(self, chatbot, budget=AGENT_TURN_BUDGET):
+        """
+        :param chatbot: ChatbotAgent whose tools and renderers are used
+        :param budget: Seconds a turn waits for its tool calls (late ones are reported, not stopped)
+        """
+        self.chatbot = chatbot
+        self.name = chatbot.name
+        self.budget = budget
+
+    def plan(self, message):
+        """
+        Tool calls for a message, in the order they were asked for.
+        A single-question message gets the same intent as ChatbotAgent.
+        """
+        intents = [i for i in match_intents(message) if i != "help"]
+        if len(intents) < 2:
+            return [self.chatbot.detect_intent(message)]
+        return intents[:AGENT_MAX_STEPS]
+
+    def _step(self, intent, message, text, scores):
+        """Run one tool call and its optional synthesis (in a pool thread)."""
+        result = self.chatbot.run_tool(intent, message, text, scores)
+        summary = None
+        request = self.chatbot._synthesis_request(intent, message, result)
+        if request:
+            summary = self.chatbot._synthesize_with_gemini(*request)
+        return result, summary
+
+    async def _step_async(self, intent, message, text, scores, executor=None):
+        """Async variant of _step: the tool runs in the executor, Gemini on the event loop."""
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(executor, self.chatbot.run_tool, intent, message, text, scores)
+        summary = None
+        request = self.chatbot._synthesis_request(intent, message, result)
+        if request:
+            summary = await self.chatbot._synthesize_with_gemini_async(*request)
+        return result, summary
+
+    def _shared_retrieval(self, message, session, intents):
+        """The (text, scores) every tool of the turn works from."""
+        text, scores = message, None
+        if any(i not in _STANDALONE for i in intents):
+            # One retrieval shared by every tool in the turn, on the incident
+            # description rather than the questions about it
+            topic = topic_text(message)
+            followup = None if topic else True
+            text, scores, followup = self.chatbot.shared_retrieval(topic or message, session, followup)
+            if session is not None:
+                session.update(self.chatbot.analyzer, ",".join(intents), message, scores, followup)
+        return text, scores
+
+    def run(self, message, session=None, intents=None):
+        """
+        Execute the plan for a message (or the given intents).
+        Returns (intents, results) where results maps each intent to
+        (result, summary), to "timeout" when it missed the budget, or to
+        None when it failed. Calls that have not started by the deadline are
+        cancelled; running ones are left to finish unobserved.
+        """
+        start = time.perf_counter()
+        if intents is None:
+            intents = self.plan(message)
+
+        text, scores = self._shared_retrieval(message, session, intents)
+        pool = _executor()
+        futures = {intent: pool.submit(self._step, intent, message, text, scores) for intent in intents}
+        wait(futures.values(), timeout=max(0.0, self.budget - (time.perf_counter() - start)))
+
+        results = {}
+        for intent, future in futures.items():
+            if not future.done():
+                future.cancel()
+                results[intent] = "timeout"
+                continue
+            try:
+                results[intent] = future.result()
+            except Exception as e:
+                print(f"Error running {intent} step: {e}")
+                results[intent] = None
+        return intents, results
+
+    async def run_async(self, message, executor=None, session=None, intents=None):
+        """
+        Async variant of run for callers already on an event loop (the API).
+        Awaiting stops at the budget; tool calls already running in the
+        executor still finish there.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budget
+        if intents is None:
+            intents = self.plan(message)
+
+        text, scores = await loop.run_in_executor(executor, self._shared_retrieval, message, session, intents)
+        tasks = {
+            intent: asyncio.ensure_future(self._step_async(intent, message, text, scores, executor))
+            for intent in intents
+        }
+        await asyncio.wait(tasks.values(), timeout=max(0.0, deadline - loop.time()))
+
+        results = {}
+        for intent, task in tasks.items():
+            if not task.done():
+                task.cancel()
+                results[intent] = "timeout"
+                continue
+            try:
+                results[intent] = task.result()
+            except Exception as e:
+                print(f"Error running {intent} step: {e}")
+                results[intent] = None
+        return intents, results
+
+    def respond(self, message, session=None):
+        """Answer a message, merging the sections of a multi-part plan."""
+        intents = self.plan(message)
+        if len(intents) == 1:
+            return self.chatbot.respond(message, session=session)
+
+        message, corrections = self.chatbot.correct_query(message, intents)
+        intents, results = self.run(message, session, intents)
+        return self._merge(message, intents, results, corrections)
+
+    async def respond_async(self, message, executor=None, session=None):
+        """
+        Async variant of respond for callers on an event loop.
+        Returns (intents, response text).
+        """
+        intents = self.plan(message)
+        if len(intents) == 1:
+            intent, text = await self.chatbot.respond_async(message, executor, session=session)
+            return [intent], text
+
+        message, corrections = self.chatbot.correct_query(message, intents)
+        intents, results = await self.run_async(message, executor, session, intents)
+        return intents, self._merge(message, intents, results, corrections)
+
+    def _merge(self, message, intents, results, corrections):
+        """One response from the rendered sections of a plan's results."""
+        sections = []
+        for intent in intents:
+            label = _STEP_LABELS.get(intent, intent)
+            if results[intent] == "timeout":
+                sections.append(f"⏱️ *{label} could not be completed in time.*")
+                continue
+            if results[intent] is None:
+                sections.append(f"⚠️ *{label} failed. Please try asking separately.*")
+                continue
+            result, summary = results[intent]
+            sections.append(self.chatbot.render(intent, message, result, summary))
+        return self.chatbot.corrections_note(corrections) + "\n\n---\n\n".join(sections)
+
 
-    def greet(self):
-        return f"Hello, I am {self.name} and I am your agent!"
+if __name__ == "__main__":
+    from data_loader import prepare_dataset
+    from incident_analyzer import IncidentAnalyzer
+    from chatbot_agent import ChatbotAgent
 
-    def perform_action(self, action):
-        return f"Performing action: {action}"
+    chatbot = ChatbotAgent(IncidentAnalyzer(prepare_dataset()))
+    chatbot.gemini_enabled = False
+    planner = Agent(chatbot)
 
-# Example of creating an agent instance
-if __name__ == '__main__':
-    my_agent = Agent("Agent Smith")
-    print(my_agent.greet())
-    print(my_agent.perform_action("Walk"))
+    message = "We had a chlorine leak — what should we do and what training is needed, and how often has this happened?"
+    print(f"Plan: {planner.plan(message)}")
+    start = time.perf_counter()
+    print(planner.respond(message))
+    print(f"\nAnswered in {(time.perf_counter() - start) * 1e3:.0f} ms")
@@ -0,0 +1,341 @@
+"""
+API Server Module
+Headless HTTP/JSON API for the Safety Incident Advisor.
+
+One IncidentAnalyzer is loaded at startup and shared by every request.
+CPU-bound scoring runs in a thread pool so the event loop stays free, and
+Gemini synthesis is awaited asynchronously. /respond accepts an optional
+session_id so follow-up questions keep the previous turn's context. Rows
+appended to the CSV files are picked up by a DataWatcher and swapped in
+without a restart, and PATCH/DELETE /incidents/{case_id} edits are patched
+into the live index without a reload.
+
+Run with:
+    python api_server.py
+or:
+    uvicorn api_server:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from config import (
+    API_HOST,
+    API_PORT,
+    API_WORKERS,
+    API_MAX_SESSIONS,
+    TOP_N_SIMILAR,
+    USE_SHARED_INDEX,
+    WATCH_INTERVAL,
+)
+from data_loader import prepare_dataset, build_search_text
+from data_writer import save_new_incident, update_incident, delete_incident, editable_fields, find_duplicates
+from data_watcher import DataWatcher
+from incident_analyzer import IncidentAnalyzer
+from chatbot_agent import ChatbotAgent
+from conversation import ConversationContext
+from agent import Agent
+from shared_index import SharedAnalyzer, current_generation, publish
+from tools import (
+    get_recommendations,
+    get_training_suggestions,
+    search_incidents,
+    search_actions,
+    get_related,
+    get_statistics,
+    get_trends,
+    to_jsonable,
+)
+
+# Shared state: the loaded analyzer/agent and the worker pool
+_state = {"analyzer": None, "agent": None, "executor": None}
+_reload_lock = asyncio.Lock()
+# Conversation contexts by session id, least recently used evicted first
+_sessions = OrderedDict()
+_background_tasks = set()
+_shared = SharedAnalyzer() if USE_SHARED_INDEX else None
+# Without a shared index, CSV edits are applied to the live analyzer as they happen
+_watcher = None if USE_SHARED_INDEX else DataWatcher()
+
+
+# ──────────────────────────────────────────────
+# Request bodies
+# ──────────────────────────────────────────────
+class MessageRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+
+
+class QueryRequest(BaseModel):
+    query: str
+    top_n: Optional[int] = Field(default=None, ge=1, le=100)
+
+
+class SearchRequest(QueryRequest):
+    filters: Optional[Dict[str, str]] = None
+
+
+class ActionItem(BaseModel):
+    action: str
+    owner: str = "TBD"
+    timing: str = ""
+    verification: str = ""
+
+
+class IncidentRequest(BaseModel):
+    report: Dict[str, str]
+    actions: List[ActionItem] = []
+
+
+class IncidentUpdateRequest(BaseModel):
+    report: Dict[str, str] = {}
+    # When given, replaces all of the incident's actions
+    actions: Optional[List[ActionItem]] = None
+
+
+# ──────────────────────────────────────────────
+# Helpers
+# ──────────────────────────────────────────────
+def _build_system():
+    """Load the dataset and build the analyzer and agent (blocking)."""
+    if _shared is not None:
+        analyzer = _shared.get()
+    else:
+        analyzer = _watcher.analyzer or _watcher.build()
+    return analyzer, ChatbotAgent(analyzer)
+
+
+def _rebuild_system():
+    """
+    Refresh after a write: with a shared index, publish a new generation;
+    otherwise apply the appended rows (the write is complete, so no settle delay).
+    """
+    if _shared is not None:
+        publish(IncidentAnalyzer(prepare_dataset()), _shared.root)
+    else:
+        _watcher.refresh(settle=0)
+    return _build_system()
+
+
+def _corrected(func, analyzer, query, *args):
+    """
+    Run a query tool on the spelling-corrected query. Returns the tool's
+    result and the corrections as {typed: corrected}.
+    """
+    query, corrections = analyzer.correct_query(query)
+    return func(analyzer, query, *args), dict(corrections)
+
+
+def _screen(analyzer, report):
+    """Probable duplicates and topic of a submitted report."""
+    return find_duplicates(report, analyzer.dedupe), analyzer.assign_topic(build_search_text(report))
+
+
+def _session(session_id):
+    """Conversation context for a session id (None for stateless requests)."""
+    if not session_id:
+        return None
+    session = _sessions.pop(session_id, None) or ConversationContext()
+    _sessions[session_id] = session
+    while len(_sessions) > API_MAX_SESSIONS:
+        _sessions.popitem(last=False)
+    return session
+
+
+async def _run(func, *args):
+    """Run a blocking function in the shared worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_state["executor"], func, *args)
+
+
+async def _reload(build=_build_system):
+    """Rebuild the analyzer in the pool and swap it in once it is ready."""
+    async with _reload_lock:
+        analyzer, agent = await _run(build)
+        _state["analyzer"], _state["agent"] = analyzer, agent
+
+
+async def _system():
+    """
+    Return the current (analyzer, agent). With a shared index, re-attach
+    first if another worker has published a newer generation.
+    """
+    if _shared is not None:
+        generation = current_generation(_shared.root)
+        if generation and generation != getattr(_state["analyzer"], "generation", None):
+            await _reload()
+    return _state["analyzer"], _state["agent"]
+
+
+async def _watch():
+    """Check the CSV files every WATCH_INTERVAL seconds and swap in any change."""
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL)
+        try:
+            if await _run(_watcher.refresh):
+                await _reload()
+        except Exception as e:
+            print(f"Error applying CSV changes: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    _state["executor"] = ThreadPoolExecutor(
+        max_workers=API_WORKERS, thread_name_prefix="advisor"
+    )
+    await _reload()
+    watch = asyncio.create_task(_watch()) if _watcher is not None else None
+    yield
+    if watch is not None:
+        watch.cancel()
+    _state["executor"].shutdown(wait=False)
+
+
+app = FastAPI(title="Safety Incident Advisor API", lifespan=lifespan)
+
+
+# ──────────────────────────────────────────────
+# Endpoints
+# ──────────────────────────────────────────────
+@app.get("/health")
+async def health():
+    analyzer, _ = await _system()
+    return {
+        "status": "ok",
+        "incidents": int((~analyzer.deleted).sum()),
+        "generation": getattr(analyzer, "generation", None),
+    }
+
+
+@app.post("/respond")
+async def respond(body: MessageRequest):
+    _, agent = await _system()
+    session = _session(body.session_id)
+    # Multi-part questions run their tools concurrently in the executor
+    intents, text = await Agent(agent).respond_async(body.message, _state["executor"], session=session)
+    return {"intent": intents[0], "intents": intents, "response": text}
+
+
+@app.post("/search")
+async def search(body: SearchRequest):
+    analyzer, _ = await _system()
+    results, corrections = await _run(
+        _corrected, search_incidents, analyzer, body.query, body.filters, body.top_n or 10
+    )
+    return {"results": to_jsonable(results), "corrections": corrections}
+
+
+@app.post("/actions")
+async def actions(body: SearchRequest):
+    analyzer, _ = await _system()
+    results, corrections = await _run(
+        _corrected, search_actions, analyzer, body.query, body.filters, body.top_n or 10
+    )
+    return {"results": to_jsonable(results), "corrections": corrections}
+
+
+@app.get("/incidents/{case_id}/related")
+async def related(case_id: str, top_n: int = 5):
+    analyzer, _ = await _system()
+    if case_id not in analyzer.case_rows:
+        raise HTTPException(status_code=404, detail=f"Unknown case_id: {case_id}")
+    return {"case_id": case_id, "related": to_jsonable(await _run(get_related, analyzer, case_id, top_n))}
+
+
+@app.post("/recommend")
+async def recommend(body: QueryRequest):
+    analyzer, _ = await _system()
+    result, corrections = await _run(
+        _corrected, get_recommendations, analyzer, body.query, body.top_n or TOP_N_SIMILAR
+    )
+    return {**to_jsonable(result), "corrections": corrections}
+
+
+@app.post("/training")
+async def training(body: QueryRequest):
+    analyzer, _ = await _system()
+    result, corrections = await _run(
+        _corrected, get_training_suggestions, analyzer, body.query, body.top_n or TOP_N_SIMILAR
+    )
+    return {**to_jsonable(result), "corrections": corrections}
+
+
+@app.get("/stats")
+async def stats():
+    analyzer, _ = await _system()
+    return to_jsonable(await _run(get_statistics, analyzer))
+
+
+@app.get("/trends")
+async def trends(dimension: Optional[str] = None, top_n: int = 5):
+    analyzer, _ = await _system()
+    return to_jsonable(await _run(get_trends, analyzer, dimension, top_n))
+
+
+@app.post("/incidents", status_code=201)
+async def submit_incident(body: IncidentRequest):
+    if not body.report.get("title") or not body.report.get("what_happened"):
+        raise HTTPException(status_code=422, detail="report.title and report.what_happened are required")
+
+    analyzer, _ = await _system()
+    report = dict(body.report)
+    duplicates, topic = await _run(_screen, analyzer, report)
+
+    actions = [a.model_dump() for a in body.actions]
+    success, result = await _run(save_new_incident, report, actions)
+    if not success:
+        raise HTTPException(status_code=500, detail=f"Failed to save incident: {result}")
+
+    # Refresh the shared index in the background; queries keep using the
+    # previous analyzer until the new one is ready
+    task = asyncio.create_task(_reload(_rebuild_system))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return {
+        "case_id": result,
+        "topic": topic,
+        "possible_duplicates": [{"case_id": cid, "similarity": sim} for cid, sim in duplicates],
+    }
+
+
+async def _known(case_id):
+    analyzer, _ = await _system()
+    if case_id not in analyzer.case_rows:
+        raise HTTPException(status_code=404, detail=f"Unknown case_id: {case_id}")
+
+
+@app.patch("/incidents/{case_id}")
+async def edit_incident(case_id: str, body: IncidentUpdateRequest):
+    await _known(case_id)
+    unknown = sorted(set(body.report) - set(await _run(editable_fields)))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Fields that cannot be edited: {', '.join(unknown)}")
+    actions = None if body.actions is None else [a.model_dump() for a in body.actions]
+    success, result = await _run(update_incident, case_id, body.report, actions, _watcher)
+    if not success:
+        raise HTTPException(status_code=500, detail=f"Failed to update incident: {result}")
+    # The watcher has already patched its analyzer; swap it in before replying
+    await _reload(_rebuild_system)
+    return {"case_id": case_id, "updated": sorted(body.report), "actions_replaced": actions is not None}
+
+
+@app.delete("/incidents/{case_id}")
+async def remove_incident(case_id: str):
+    await _known(case_id)
+    success, result = await _run(delete_incident, case_id, _watcher)
+    if not success:
+        raise HTTPException(status_code=500, detail=f"Failed to delete incident: {result}")
+    await _reload(_rebuild_system)
+    return {"case_id": case_id, "deleted": True}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api_server:app", host=API_HOST, port=API_PORT)
@@ -5,10 +5,18 @@ actions/trainings based on what worked in the past.
 """
 
 import streamlit as st
-from data_loader import prepare_dataset
+from data_loader import prepare_dataset, build_search_text
 from incident_analyzer import IncidentAnalyzer
 from chatbot_agent import ChatbotAgent
-from data_writer import save_new_incident
+from conversation import ConversationContext
+from chat_history import ChatHistory
+from agent import Agent
+from data_writer import save_new_incident, update_incident, delete_incident, find_duplicates
+from profiler import profiled, get_sample_rate, set_sample_rate
+from config import USE_SHARED_INDEX
+from shared_index import load_or_publish, current_generation, publish
+from model_trainer import load_or_train, data_version
+from data_watcher import DataWatcher
 
 # ──────────────────────────────────────────────
 # Page Config
@@ -122,16 +130,41 @@ st.markdown(
 # ──────────────────────────────────────────────
 # Cache data loading (runs once)
 # ──────────────────────────────────────────────
+@st.cache_resource
+def init_watcher():
+    return DataWatcher()
+
+
 @st.cache_resource(show_spinner="Loading incident database...")
+@profiled("init_system")
 def init_system():
-    dataset = prepare_dataset()
-    analyzer = IncidentAnalyzer(dataset)
+    if USE_SHARED_INDEX:
+        # Attach to the memory-mapped index shared by all worker processes
+        analyzer = load_or_publish()
+    else:
+        # The watcher keeps the analyzer in step with edits to the CSV files
+        watcher = init_watcher()
+        analyzer = watcher.analyzer or watcher.build()
     agent = ChatbotAgent(analyzer)
     return analyzer, agent
 
 
+@st.cache_resource(show_spinner="Loading incident classifiers...")
+def init_classifier(_analyzer, version):
+    # Keyed on the data version, so a reloaded analyzer never gets stale models
+    return load_or_train(_analyzer)
+
+
 try:
     analyzer, agent = init_system()
+    if USE_SHARED_INDEX and current_generation() != analyzer.generation:
+        # Another process published a newer index generation
+        init_system.clear()
+        analyzer, agent = init_system()
+    elif not USE_SHARED_INDEX and init_watcher().refresh():
+        # Rows appended to (or edits made in) the CSV files since the last run
+        init_system.clear()
+        analyzer, agent = init_system()
     stats = analyzer.get_statistics()
 
     # ──────────────────────────────────────────────
@@ -190,6 +223,19 @@ try:
             st.warning("⚠️ Gemini AI: Inactive (using offline engine)")
             st.info("To enable Gemini, add `GEMINI_API_KEY` to secrets.")
 
+        # Admin: on-demand profiling of a fraction of calls
+        with st.expander("🛠️ Admin"):
+            rate = st.slider(
+                "Profile sample rate",
+                min_value=0.0,
+                max_value=1.0,
+                value=get_sample_rate(),
+                step=0.05,
+                help="Fraction of chat, load and submit calls written to the profiles directory.",
+            )
+            if rate != get_sample_rate():
+                set_sample_rate(rate)
+
         st.caption("Data: 196 incidents • 1,688 corrective actions")
 
 
@@ -209,17 +255,30 @@ try:
     tab1, tab2 = st.tabs(["💬 Chat Advisor", "📝 Report Incident"])
 
     with tab1:
-        # Initialize chat history
+        # Initialize chat history (bounded; older messages are paginated)
         if "messages" not in st.session_state:
-            st.session_state.messages = [
-                {
-                    "role": "assistant",
-                    "content": agent.respond("help"),
-                }
-            ]
-
-        # Display chat history
-        for message in st.session_state.messages:
+            st.session_state.messages = ChatHistory()
+            st.session_state.messages.append("assistant", agent.respond("help"))
+            st.session_state.history_pages = 0
+
+        # Candidate incidents from earlier turns, for follow-up questions
+        if "conversation" not in st.session_state:
+            st.session_state.conversation = ConversationContext()
+
+        # Display chat history: earlier pages only when requested, then the live page
+        history = st.session_state.messages
+        shown = min(st.session_state.history_pages, history.earlier_pages)
+        hidden = len(history) - history.page_size * (shown + 1)
+        if hidden > 0:
+            st.button(
+                f"⬆️ Load earlier messages ({hidden} older)",
+                key="load_earlier",
+                on_click=lambda: st.session_state.update(history_pages=shown + 1),
+            )
+        for block in reversed(history.earlier(shown)):
+            with st.container(border=True):
+                st.markdown(block)
+        for message in history.recent():
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
 
@@ -234,41 +293,60 @@ try:
 
         if prompt:
             # Show user message
-            st.session_state.messages.append({"role": "user", "content": prompt})
+            st.session_state.messages.append("user", prompt)
             with st.chat_message("user"):
                 st.markdown(prompt)
 
             # Generate response
             with st.chat_message("assistant"):
                 with st.spinner("Analyzing historical patterns..."):
-                    response = agent.respond(prompt)
+                    # The planner answers multi-part questions with several tools at once
+                    response = Agent(agent).respond(prompt, session=st.session_state.conversation)
                 st.markdown(response)
 
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            st.session_state.messages.append("assistant", response)
 
     with tab2:
         st.markdown("### 📝 Report a New Incident")
         st.info("Fill out the form below to add a new incident to the historical database. This will help METHAN-AI provide better recommendations in the future.")
-        
+
+        # Quick classification: pre-fill risk, severity and injury from the narrative
+        with st.expander("⚡ Auto-classify from a description", expanded=True):
+            draft = st.text_area("Describe what happened", key="draft_what_happened", placeholder="Describe the sequence of events...")
+            if st.button("Suggest classifications") and draft.strip():
+                st.session_state["suggested_labels"] = init_classifier(analyzer, data_version(analyzer.live_data)).predict([draft])[0]
+            suggested = st.session_state.get("suggested_labels", {})
+            if suggested:
+                st.caption(" | ".join(
+                    f"**{target.replace('_', ' ').title()}:** {pred['label']} ({pred['confidence']:.0%})"
+                    for target, pred in suggested.items()
+                ))
+        suggested = {target: pred["label"] for target, pred in st.session_state.get("suggested_labels", {}).items()}
+        risk_levels = analyzer.get_risk_levels()
+
         with st.form("incident_report_form", clear_on_submit=True):
             col_a, col_b = st.columns(2)
             
             with col_a:
                 title = st.text_input("Incident Title*", placeholder="e.g., Gas leak during flange tightening")
                 category = st.selectbox("Category*", analyzer.get_category_list())
-                risk_level = st.selectbox("Risk Level*", analyzer.get_risk_levels())
+                risk_level = st.selectbox(
+                    "Risk Level*",
+                    risk_levels,
+                    index=risk_levels.index(suggested["risk_level"]) if suggested.get("risk_level") in risk_levels else 0,
+                )
                 location = st.selectbox("Location*", analyzer.get_locations())
                 date = st.date_input("Date*")
                 
             with col_b:
                 setting = st.text_input("Setting", placeholder="e.g., Maintenance, Operation")
-                injury_category = st.text_input("Injury Category", placeholder="e.g., First Aid, Near Miss")
-                severity = st.text_input("Severity", placeholder="e.g., Low, Medium, High")
+                injury_category = st.text_input("Injury Category", value=suggested.get("injury_category", ""), placeholder="e.g., First Aid, Near Miss")
+                severity = st.text_input("Severity", value=suggested.get("severity", ""), placeholder="e.g., Low, Medium, High")
                 primary_classification = st.text_input("Primary Classification")
 
             st.markdown("---")
             st.markdown("#### Incident Details")
-            what_happened = st.text_area("What Happened?*", placeholder="Describe the sequence of events...")
+            what_happened = st.text_area("What Happened?*", value=st.session_state.get("draft_what_happened", ""), placeholder="Describe the sequence of events...")
             what_could_have_happened = st.text_area("What Could Have Happened?", placeholder="describe potential consequences...")
             why_did_it_happen = st.text_area("Why Did It Happen? (Root Cause)", placeholder="Identify the underlying causes...")
             causal_factors = st.text_area("Causal Factors", placeholder="List specific contributing factors...")
@@ -317,16 +395,61 @@ try:
                     if action_2:
                         actions.append({"action": action_2, "owner": owner_2 or "TBD"})
                     
+                    duplicates = find_duplicates(report_data, analyzer.dedupe)
+                    if duplicates:
+                        st.warning(
+                            "⚠️ This report looks like a possible duplicate of: "
+                            + ", ".join(f"{cid} ({sim:.0%} similar)" for cid, sim in duplicates[:5])
+                        )
+
                     success, result = save_new_incident(report_data, actions)
                     
                     if success:
                         st.success(f"✅ Incident {result} successfully reported! The similarity engine will be updated.")
+                        st.info(f"🏷️ Topic: {analyzer.assign_topic(build_search_text(report_data))}")
                         st.balloons()
-                        # Clear cache to reload new data
-                        st.cache_resource.clear()
+                        if USE_SHARED_INDEX:
+                            # Publish a new generation for every worker process
+                            publish(IncidentAnalyzer(prepare_dataset()))
+                        else:
+                            # Apply just the appended rows; the write is complete, so no settle delay
+                            init_watcher().refresh(settle=0)
+                        # Reload the analyzer and retrain the classifiers on the new data
+                        init_system.clear()
+                        init_classifier.clear()
                         # st.rerun() # Optional: auto-rerun to refresh UI
                     else:
                         st.error(f"❌ Failed to save incident: {result}")
+
+        # Corrections are patched into the live index instead of reloading the database
+        with st.expander("✏️ Correct or remove an existing incident"):
+            edit_id = st.selectbox("Case ID", sorted(analyzer.case_rows), key="edit_case_id")
+            row = analyzer.case_rows[edit_id]
+            st.caption(analyzer.data["title"].iloc[row])
+            editable = ["title", "category", "risk_level", "severity", "injury_category", "location", "setting"]
+            field = st.selectbox("Field", [f for f in editable if f in analyzer.data.columns], key="edit_field")
+            value = st.text_input(
+                "New value",
+                value=analyzer.data[field].astype("string").fillna("").iloc[row],
+                key=f"edit_value_{edit_id}_{field}",
+            )
+            confirm_delete = st.checkbox("Delete this incident and its actions", key="confirm_delete")
+            col_save, col_delete = st.columns(2)
+            done = edit = None
+            if col_save.button("Save correction", type="primary"):
+                done, edit = "updated", update_incident(edit_id, {field: value}, watcher=None if USE_SHARED_INDEX else init_watcher())
+            if col_delete.button("Delete incident", disabled=not confirm_delete):
+                done, edit = "deleted", delete_incident(edit_id, watcher=None if USE_SHARED_INDEX else init_watcher())
+            if edit is not None:
+                success, result = edit
+                if success:
+                    if USE_SHARED_INDEX:
+                        publish(IncidentAnalyzer(prepare_dataset()))
+                    st.success(f"✅ Incident {result} {done}.")
+                    init_system.clear()
+                    init_classifier.clear()
+                else:
+                    st.error(f"❌ Failed to update incident: {result}")
 except Exception as main_error:
     st.error("🚀 METHAN-AI Startup Error")
     st.exception(main_error)
@@ -0,0 +1,77 @@
+"""
+Chat History Module
+Bounded, paginated message store for the Streamlit chat.
+
+Only the last CHAT_PAGE_SIZE messages are drawn as chat bubbles on each
+rerun; older ones are folded into "earlier" pages that are only rendered
+when the user asks for them. Each message's compact archive markdown is
+built once when it is added, and at most CHAT_HISTORY_MAX messages are kept
+per session, so both rerun cost and session memory stay flat however long
+the conversation runs.
+"""
+
+from collections import deque
+
+from config import CHAT_HISTORY_MAX, CHAT_PAGE_SIZE
+
+_ROLE_LABELS = {"user": "🧑 You", "assistant": "🛡️ Advisor"}
+
+
+class ChatHistory:
+    def __init__(self, max_messages=CHAT_HISTORY_MAX, page_size=CHAT_PAGE_SIZE):
+        """
+        :param max_messages: Messages kept; the oldest are dropped beyond this
+        :param page_size: Messages per page (the live page and each earlier page)
+        """
+        self.page_size = page_size
+        self.messages = deque(maxlen=max_messages)
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def append(self, role, content):
+        if len(self.messages) == self.messages.maxlen:
+            self.dropped += 1
+        label = _ROLE_LABELS.get(role, role)
+        self.messages.append(
+            {"role": role, "content": content, "archived": f"**{label}:**\n\n{content}"}
+        )
+
+    def recent(self):
+        """The live page: the last page_size messages, oldest first."""
+        start = max(0, len(self.messages) - self.page_size)
+        return [self.messages[i] for i in range(start, len(self.messages))]
+
+    @property
+    def earlier_pages(self):
+        """Number of pages of messages before the live page."""
+        earlier = max(0, len(self.messages) - self.page_size)
+        return -(-earlier // self.page_size)
+
+    def earlier(self, pages):
+        """
+        Markdown for the given number of earlier pages (nearest first), each
+        as one block joined from the cached per-message markdown.
+        """
+        end = max(0, len(self.messages) - self.page_size)
+        blocks = []
+        for _ in range(min(pages, self.earlier_pages)):
+            start = max(0, end - self.page_size)
+            blocks.append("\n\n---\n\n".join(self.messages[i]["archived"] for i in range(start, end)))
+            end = start
+        return blocks
+
+
+if __name__ == "__main__":
+    import time
+
+    history = ChatHistory()
+    for n in range(1000):
+        history.append("user", f"Question {n}")
+        history.append("assistant", f"Answer {n} " + "lorem ipsum " * 200)
+
+    start = time.perf_counter()
+    live, pages = history.recent(), history.earlier(1)
+    print(f"{len(history)} messages kept ({history.dropped} dropped), {history.earlier_pages} earlier pages")
+    print(f"Live page of {len(live)} + one earlier page in {(time.perf_counter() - start) * 1e6:.0f} µs")
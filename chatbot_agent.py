@@ -3,41 +3,87 @@ Chatbot Agent Module
 Routes user messages to the appropriate tools and formats responses.
 """
 
+import asyncio
 import os
+import re
+import sys
+
 from tools import (
     detect_intent,
     get_recommendations,
     get_training_suggestions,
     search_incidents,
+    search_actions,
+    get_related,
     get_statistics,
+    get_trends,
+    find_case_ids,
 )
+from config import USE_GEMINI, GEMINI_MODEL, USE_INTENT_MODEL, USE_SHARDED_INDEX
+from profiler import profiled, annotate
 
+_OWNER_PHRASE = re.compile(
+    r"\b(?:owned by|assigned to)\s+(?:the\s+|a\s+|an\s+)?([a-z][a-z &/-]*?)"
+    r"(?=\s+(?:with|for|about|and|that|due|within|on)\b|[?.,!]|$)"
+)
+_ACTION_WORD = re.compile(r"\bactions?\b", re.IGNORECASE)
+# Intents that do not search by text, so their messages are not spell-corrected
+_UNCORRECTED = ("help", "stats", "trending")
+_TREND_DIMENSIONS = {
+    "location": re.compile(r"\b(?:locations?|sites?|where)\b", re.IGNORECASE),
+    "category": re.compile(r"\b(?:categor(?:y|ies)|types?)\b", re.IGNORECASE),
+    "topic": re.compile(r"\b(?:topics?|themes?|hazards?)\b", re.IGNORECASE),
+}
+
+
+def _get_api_key():
+    """
+    Read the Gemini API key from Streamlit secrets (when running inside the app)
+    or the environment. Streamlit is not imported here so non-UI use stays light.
+    """
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            key = st.secrets.get("GEMINI_API_KEY")
+            if key:
+                return key
+        except Exception:
+            pass
+    return os.environ.get("GEMINI_API_KEY")
 
-import streamlit as st
-from config import USE_GEMINI, GEMINI_MODEL
 
 class ChatbotAgent:
     def __init__(self, analyzer):
         self.analyzer = analyzer
         self.name = "Safety Advisor"
-        self.gemini_enabled = False
-        
-        # Initialize Gemini if configured
-        if USE_GEMINI:
+        self.model = None
+        self._api_key = _get_api_key() if USE_GEMINI else None
+
+        # Gemini counts as enabled once a key is configured; the client library
+        # itself is only imported on the first synthesis call
+        self.gemini_enabled = bool(self._api_key)
+
+        # Back the keyword intent matcher with the trained model, if one was saved
+        if USE_INTENT_MODEL:
+            from intent_classifier import load_intent_model
+            load_intent_model()
+
+    def _get_model(self):
+        """Lazily import and configure the Gemini client on first use."""
+        if self.model is None:
             try:
                 import google.generativeai as genai
-                api_key = st.secrets.get("GEMINI_API_KEY") or os.environ.get("GEMINI_API_KEY")
-                if api_key:
-                    genai.configure(api_key=api_key)
-                    self.model = genai.GenerativeModel(GEMINI_MODEL)
-                    self.gemini_enabled = True
+                genai.configure(api_key=self._api_key)
+                self.model = genai.GenerativeModel(GEMINI_MODEL)
             except (ImportError, Exception) as e:
                 print(f"Error initializing Gemini: {e}")
                 self.gemini_enabled = False
+                raise
+        return self.model
 
-    def _synthesize_with_gemini(self, query, context_text, intent_type="general"):
-        """Uses Gemini to synthesize a natural language response based on the search context."""
-        prompt = f"""
+    def _build_prompt(self, query, context_text, intent_type="general"):
+        """Build the Gemini prompt for a query and its historical context."""
+        return f"""
         You are METHAN-AI, an expert Safety Incident Advisor for Methanex. 
         Your goal is to help users understand safety risks and prevent incidents by learning from historical data.
         
@@ -57,33 +103,230 @@ class ChatbotAgent:
         
         INTENT: {intent_type}
         """
-        
+
+    def _synthesize_with_gemini(self, query, context_text, intent_type="general"):
+        """Uses Gemini to synthesize a natural language response based on the search context."""
+        prompt = self._build_prompt(query, context_text, intent_type)
         try:
-            response = self.model.generate_content(prompt)
+            response = self._get_model().generate_content(prompt)
             return response.text
         except Exception as e:
             print(f"Gemini Synthesis Error: {e}")
             return "⚠️ Gemini synthesis failed. Falling back to structured data view."
 
-    def respond(self, user_message):
+    async def _synthesize_with_gemini_async(self, query, context_text, intent_type="general"):
+        """Async variant of _synthesize_with_gemini for use from an event loop."""
+        prompt = self._build_prompt(query, context_text, intent_type)
+        try:
+            response = await self._get_model().generate_content_async(prompt)
+            return response.text
+        except Exception as e:
+            print(f"Gemini Synthesis Error: {e}")
+            return "⚠️ Gemini synthesis failed. Falling back to structured data view."
+
+    @profiled("respond", query_arg=1)
+    def respond(self, user_message, session=None):
         """
         Process a user message, detect intent, call the right tool,
         and return a formatted response string.
+
+        :param session: Optional ConversationContext; follow-up questions are
+            then answered within the previous turn's candidate incidents
         """
-        intent = detect_intent(user_message)
+        intent = self.detect_intent(user_message)
+        annotate(intent=intent)
 
         if intent == "help":
             return self._help_response()
-        elif intent == "stats":
-            return self._stats_response()
+
+        query, corrections = self.correct_query(user_message, [intent])
+        result = self.retrieve(intent, query, session)
+        summary = None
+        request = self._synthesis_request(intent, query, result)
+        if request:
+            summary = self._synthesize_with_gemini(*request)
+        return self.corrections_note(corrections) + self.render(intent, query, result, summary)
+
+    async def respond_async(self, user_message, executor=None, session=None):
+        """
+        Async variant of respond for servers: the CPU-bound tool call runs in
+        the given executor and the Gemini call is awaited without blocking it.
+        """
+        loop = asyncio.get_running_loop()
+        intent = self.detect_intent(user_message)
+
+        if intent == "help":
+            return intent, await loop.run_in_executor(executor, self._help_response)
+
+        query, corrections = self.correct_query(user_message, [intent])
+        result = await loop.run_in_executor(executor, self.retrieve, intent, query, session)
+        summary = None
+        request = self._synthesis_request(intent, query, result)
+        if request:
+            summary = await self._synthesize_with_gemini_async(*request)
+        return intent, self.corrections_note(corrections) + self.render(intent, query, result, summary)
+
+    def detect_intent(self, user_message):
+        """
+        tools.detect_intent, except that a message about actions naming an
+        action owner or timing ("actions for the Maintenance Planner") is an
+        action search rather than a request for recommendations.
+        """
+        intent = detect_intent(user_message)
+        if intent in ("recommend", "search") and _ACTION_WORD.search(user_message):
+            if self._action_facet_pattern().search(user_message.replace("–", "-")):
+                return "actions"
+        return intent
+
+    def _action_facet_pattern(self):
+        """Regex of the multi-word owner and timing labels of the action index (cached per index)."""
+        index = self.analyzer.get_action_index()
+        cached = getattr(self, "_facet_pattern", None)
+        if cached is None or cached[0] is not index:
+            labels = {
+                str(label).replace("–", "-")
+                for field in ("owner", "timing")
+                for label in index.facets[field][1]
+                if label != "N/A" and " " in str(label).strip()
+            }
+            alternatives = "|".join(re.escape(l) for l in sorted(labels, key=len, reverse=True)) or r"(?!)"
+            cached = (index, re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)", re.IGNORECASE))
+            self._facet_pattern = cached
+        return cached[1]
+
+    def correct_query(self, query, intents):
+        """
+        Spell-correct a message before its tools search with it.
+        Returns (query, [(word, correction), ...]); left as typed when none
+        of the intents searches by text.
+        """
+        if all(intent in _UNCORRECTED for intent in intents):
+            return query, []
+        return self.analyzer.correct_query(query)
+
+    @staticmethod
+    def corrections_note(corrections):
+        """Markdown line telling the user which words were corrected ("" for none)."""
+        if not corrections:
+            return ""
+        fixes = ", ".join(f"~~{word}~~ → **{fix}**" for word, fix in corrections)
+        return f"✏️ *Searched with corrected spelling:* {fixes}\n\n"
+
+    def retrieve(self, intent, query, session=None):
+        """
+        Run the tool that answers an intent and return its raw result.
+
+        Incident scores are computed once per turn and shared by the tools
+        that need them. With a session, follow-ups are re-ranked within the
+        previous turn's candidates and the session is updated afterwards.
+        """
+        if intent in ("stats", "actions", "trending"):
+            return self.run_tool(intent, query)
+        if intent == "related" and find_case_ids(query):
+            return self.run_tool(intent, query)
+
+        text, scores, followup = self.shared_retrieval(query, session)
+        result = self.run_tool(intent, query, text, scores)
+        if session is not None:
+            session.update(self.analyzer, intent, query, scores, followup)
+        return result
+
+    def shared_retrieval(self, query, session=None, followup=None):
+        """Score a turn's query once; returns (text, scores, followup)."""
+        if session is not None:
+            return session.retrieve(self.analyzer, query, followup)
+        return query, self.analyzer.score(query), False
+
+    def run_tool(self, intent, query, text=None, scores=None):
+        """
+        Call the tool for one intent. text and scores come from the turn's
+        shared retrieval (both default to scoring the query itself).
+        """
+        text = query if text is None else text
+        if intent == "stats":
+            return get_statistics(self.analyzer, scores=scores)
+        elif intent == "actions":
+            return search_actions(
+                self.analyzer, query, filters=self._action_filters(query), top_n=10
+            )
+        elif intent == "trending":
+            return get_trends(self.analyzer, dimension=self._trend_dimension(query), top_n=5)
+        elif intent == "related" and find_case_ids(query):
+            case_id = find_case_ids(query)[0]
+            return {"case_id": case_id, "related": get_related(self.analyzer, case_id, top_n=5)}
         elif intent == "training":
-            return self._training_response(user_message)
-        elif intent == "search":
-            return self._search_response(user_message)
-        elif intent == "recommend":
-            return self._recommend_response(user_message)
+            return get_training_suggestions(self.analyzer, text, top_n=5, scores=scores)
+        elif intent in ("search", "related"):
+            # "related" without a case ID is an ordinary search
+            return search_incidents(
+                self.analyzer, text, filters=self._search_filters(query), top_n=10, scores=scores
+            )
         else:
-            return self._recommend_response(user_message)
+            return get_recommendations(self.analyzer, text, top_n=5, scores=scores)
+
+    def render(self, intent, query, result, summary=None):
+        """Format a tool result (and optional Gemini summary) as markdown."""
+        if intent == "stats":
+            return self._stats_response(result)
+        elif intent == "training":
+            return self._training_response(query, result, summary)
+        elif intent == "related" and isinstance(result, dict):
+            return self._related_response(result)
+        elif intent in ("search", "related"):
+            return self._search_response(query, result, summary)
+        elif intent == "actions":
+            return self._actions_response(query, result)
+        elif intent == "trending":
+            return self._trending_response(result)
+        else:
+            return self._recommend_response(query, result, summary)
+
+    def _synthesis_request(self, intent, query, result):
+        """
+        Return the (query, context, intent_type) to send to Gemini for a tool
+        result, or None when Gemini is off or there is nothing to synthesize.
+        """
+        if not self.gemini_enabled:
+            return None
+
+        if intent == "training":
+            lessons = result["lessons_to_prevent"]
+            practices = result["good_practices"]
+            if not lessons and not practices:
+                return None
+            context = "Training Lessons:\n"
+            for l in lessons:
+                context += f"- From {l['from_title']}: {l['lesson']}\n"
+            context += "\nGood Practices:\n"
+            for p in practices:
+                context += f"- From {p['from_title']}: {p['practice']}\n"
+            return query, context, "training"
+
+        if intent in ("search", "related") and isinstance(result, list):
+            if not result:
+                return None
+            context = "Found Incidents:\n"
+            for inc in result[:5]:
+                context += f"- {inc['title']} ({inc.get('risk_level')})\n"
+                context += f"  Context: {inc.get('what_happened')}\n"
+            return f"Summarize these search results for: {query}", context, "search"
+
+        if intent == "recommend":
+            similar = result["similar_incidents"]
+            if not similar:
+                return None
+            context = f"Matched Incidents:\n"
+            for inc in similar:
+                context += f"- {inc['title']} (Risk: {inc.get('risk_level')})\n"
+                context += f"  What Happened: {inc.get('what_happened')}\n"
+                context += f"  Lessons: {inc.get('lessons_to_prevent')}\n"
+
+            context += "\nRecommended Actions:\n"
+            for act in result["recommended_actions"][:10]:
+                context += f"- {act['action']} (Owner: {act['owner']})\n"
+            return query, context, "recommendations"
+
+        return None
 
     def _help_response(self):
         stats = self.analyzer.get_statistics()
@@ -97,15 +340,26 @@ class ChatbotAgent:
             "🎓 **Ask for training suggestions** — e.g. *\"What training for confined space work?\"*\n\n"
             "📊 **Ask for statistics** — e.g. *\"How many high-risk incidents do we have?\"*\n\n"
             "🔎 **Search incidents** — e.g. *\"Show me incidents involving pressure release\"*\n\n"
+            "🧰 **Search corrective actions** — e.g. *\"Actions owned by the Maintenance Planner with <30 days timing\"*\n\n"
+            "🔗 **Explore related incidents** — e.g. *\"Incidents related to CASE-001\"*\n\n"
+            "📈 **See what's trending** — e.g. *\"Which hazards are on the rise?\"*\n\n"
             f"Just type your question and I'll analyze our database of **{total_inc} historical incidents** and **{total_act} corrective actions**!"
         )
 
-    def _stats_response(self):
-        stats = get_statistics(self.analyzer)
+    def _stats_response(self, stats=None):
+        if stats is None:
+            stats = get_statistics(self.analyzer)
         lines = [
             f"📊 **Incident Database Overview**\n",
             f"📁 **Total Incidents:** {stats['total_incidents']}",
             f"✅ **Total Corrective Actions:** {stats['total_actions']}\n",
+        ]
+        matching = stats.get("matching")
+        if matching is not None:
+            by_risk = ", ".join(f"{level}: {count}" for level, count in matching["by_risk_level"].items())
+            lines.append(f"🔁 **Similar past incidents:** {matching['total_incidents']}" + (f" ({by_risk})" if by_risk else ""))
+            lines.append("")
+        lines += [
             "---",
             "**By Risk Level:**",
         ]
@@ -121,10 +375,16 @@ class ChatbotAgent:
         for inj, count in list(stats["by_injury"].items())[:5]:
             lines.append(f"  • {inj}: {count}")
 
+        if stats.get("by_topic"):
+            lines.append("\n**Top Hazard Themes:**")
+            for topic, count in list(stats["by_topic"].items())[:5]:
+                lines.append(f"  • {topic}: {count}")
+
         return "\n".join(lines)
 
-    def _recommend_response(self, query):
-        result = get_recommendations(self.analyzer, query, top_n=5)
+    def _recommend_response(self, query, result=None, summary=None):
+        if result is None:
+            result = get_recommendations(self.analyzer, query, top_n=5)
         similar = result["similar_incidents"]
         actions = result["recommended_actions"]
 
@@ -134,19 +394,8 @@ class ChatbotAgent:
                 "Try describing the situation in more detail, or ask me for general training recommendations."
             )
 
-        if self.gemini_enabled:
-            # Prepare context for Gemini
-            context = f"Matched Incidents:\n"
-            for inc in similar:
-                context += f"- {inc['title']} (Risk: {inc.get('risk_level')})\n"
-                context += f"  What Happened: {inc.get('what_happened')}\n"
-                context += f"  Lessons: {inc.get('lessons_to_prevent')}\n"
-            
-            context += "\nRecommended Actions:\n"
-            for act in actions[:10]:
-                context += f"- {act['action']} (Owner: {act['owner']})\n"
-                
-            return self._synthesize_with_gemini(query, context, "recommendations")
+        if summary is not None:
+            return summary
 
         lines = [f"🔍 **Found {len(similar)} similar past incidents:**\n"]
 
@@ -170,14 +419,16 @@ class ChatbotAgent:
                 if action_text not in seen and count < 10:
                     seen.add(action_text)
                     lines.append(f"  {count + 1}. {action_text}")
-                    lines.append(f"     ↳ *Owner:* {act['owner']} | *Timing:* {act['timing']} | *From:* {act['from_case']}")
+                    used_in = f" | *Used in:* {act['frequency']} past incidents" if act.get("frequency", 1) > 1 else ""
+                    lines.append(f"     ↳ *Owner:* {act['owner']} | *Timing:* {act['timing']} | *From:* {act['from_case']}{used_in}")
                     lines.append("")
                     count += 1
 
         return "\n".join(lines)
 
-    def _training_response(self, query):
-        result = get_training_suggestions(self.analyzer, query, top_n=5)
+    def _training_response(self, query, result=None, summary=None):
+        if result is None:
+            result = get_training_suggestions(self.analyzer, query, top_n=5)
         lessons = result["lessons_to_prevent"]
         practices = result["good_practices"]
 
@@ -187,15 +438,8 @@ class ChatbotAgent:
                 "Try being more specific about the type of work or hazard."
             )
 
-        if self.gemini_enabled:
-            context = "Training Lessons:\n"
-            for l in lessons:
-                context += f"- From {l['from_title']}: {l['lesson']}\n"
-            context += "\nGood Practices:\n"
-            for p in practices:
-                context += f"- From {p['from_title']}: {p['practice']}\n"
-                
-            return self._synthesize_with_gemini(query, context, "training")
+        if summary is not None:
+            return summary
 
         lines = [f"🎓 **Training & Prevention Recommendations:**\n"]
 
@@ -204,7 +448,7 @@ class ChatbotAgent:
             for i, lesson in enumerate(lessons, 1):
                 risk_emoji = "🔴" if "high" in str(lesson.get("risk_level", "")).lower() else "🟡" if "medium" in str(lesson.get("risk_level", "")).lower() else "🟢"
                 lines.append(f"**{i}. From {lesson['from_case']}** — *{lesson['from_title']}* {risk_emoji}")
-                lines.append(f"   {lesson['lesson'][:300]}{'...' if len(lesson['lesson']) > 300 else ''}")
+                lines.append(f"   {lesson['lesson']}")
                 lines.append("")
 
         if practices:
@@ -212,13 +456,13 @@ class ChatbotAgent:
             lines.append("\n**✨ What Went Well (Good Practices to Reinforce):**\n")
             for i, p in enumerate(practices, 1):
                 lines.append(f"**{i}. From {p['from_case']}** — *{p['from_title']}*")
-                lines.append(f"   {p['practice'][:300]}{'...' if len(p['practice']) > 300 else ''}")
+                lines.append(f"   {p['practice']}")
                 lines.append("")
 
         return "\n".join(lines)
 
-    def _search_response(self, query):
-        # Extract potential filters from the query
+    def _search_filters(self, query):
+        """Extract potential filters from the query."""
         filters = {}
         query_lower = query.lower()
         if "high risk" in query_lower or "high-risk" in query_lower:
@@ -227,23 +471,97 @@ class ChatbotAgent:
             filters["risk_level"] = "medium"
         elif "low risk" in query_lower or "low-risk" in query_lower:
             filters["risk_level"] = "low"
+        if USE_SHARDED_INDEX:
+            # A site named in the query ("... in Trinidad") narrows the search to its shards
+            for location in self.analyzer.get_locations():
+                if re.search(rf"\b{re.escape(str(location).lower())}\b", query_lower):
+                    filters["location"] = location
+                    break
+        return filters
+
+    def _action_filters(self, query):
+        """Pick owner / timing facet values named in the query (longest match wins)."""
+        index = self.analyzer.get_action_index()
+        query_norm = query.lower().replace("–", "-")
+        filters = {}
+        for field in ("owner", "timing"):
+            _, labels = index.facets[field]
+            named = [
+                str(label) for label in labels
+                if label != "N/A" and str(label).lower().replace("–", "-") in query_norm
+            ]
+            if named:
+                filters[field] = max(named, key=len)
+        if "owner" not in filters:
+            # Partial owner names ("owned by maintenance") match as substrings
+            match = _OWNER_PHRASE.search(query_norm)
+            if match:
+                filters["owner"] = match.group(1).strip()
+        return filters
+
+    def _trend_dimension(self, query):
+        """The single dimension a trends question asks about, if any."""
+        asked = [dim for dim, pattern in _TREND_DIMENSIONS.items() if pattern.search(query)]
+        return asked[0] if len(asked) == 1 else None
+
+    def _trending_response(self, result=None):
+        if result is None:
+            result = get_trends(self.analyzer, top_n=5)
+
+        labels = {"category": "Category", "location": "Location", "topic": "Theme"}
+        lines = ["📈 **What's trending**\n"]
+        if result["spikes"]:
+            lines.append("**Unusual spikes:**")
+            for s in result["spikes"]:
+                lines.append(
+                    f"  🔺 **{s['value']}** ({labels.get(s['dimension'], s['dimension'])}) — "
+                    f"{s['count']} incidents in {s['period']} vs ~{s['expected']:.0f} expected"
+                )
+        elif result["rising"]:
+            lines.append("No unusual spikes recently. **Growing above baseline:**")
+            for s in result["rising"]:
+                lines.append(
+                    f"  ↗️ **{s['value']}** ({labels.get(s['dimension'], s['dimension'])}) — "
+                    f"{s['count']} incidents in {s['period']} vs ~{s['expected']:.0f} expected"
+                )
+        else:
+            lines.append("🤔 No trends stand out in the incident history.")
+
+        if result["per_year"]:
+            lines.append("\n**Incidents per year:** " + ", ".join(f"{y}: {n}" for y, n in result["per_year"].items() if n))
+
+        return "\n".join(lines)
+
+    def _actions_response(self, query, results=None):
+        if results is None:
+            results = search_actions(
+                self.analyzer, query, filters=self._action_filters(query), top_n=10
+            )
+
+        if not results:
+            return "🤔 No corrective actions found matching your search. Try different keywords."
+
+        lines = [f"🧰 **Found {len(results)} corrective actions:**\n"]
+        for i, act in enumerate(results, 1):
+            lines.append(f"**{i}. {act['action']}**")
+            lines.append(f"   ↳ *Owner:* {act['owner']} | *Timing:* {act['timing']} | *From:* {act['case_id']} — *{act['title']}*")
+            if act.get("verification", "N/A") != "N/A":
+                lines.append(f"   ✔️ *Verification:* {act['verification']}")
+            lines.append("")
+
+        return "\n".join(lines)
 
-        results = search_incidents(self.analyzer, query, filters=filters, top_n=10)
+    def _search_response(self, query, results=None, summary=None):
+        if results is None:
+            results = search_incidents(
+                self.analyzer, query, filters=self._search_filters(query), top_n=10
+            )
 
         if not results:
             return "🤔 No incidents found matching your search. Try different keywords."
 
-        if self.gemini_enabled and results:
-            context = "Found Incidents:\n"
-            for inc in results[:5]:
-                context += f"- {inc['title']} ({inc.get('risk_level')})\n"
-                context += f"  Context: {inc.get('what_happened')}\n"
-            
-            summary = self._synthesize_with_gemini(f"Summarize these search results for: {query}", context, "search")
-            if not summary.startswith("⚠️"):
-                lines = [f"🤖 **Gemini Summary:**\n{summary}\n", "---", f"🔎 **Full Search Results ({len(results)}):**\n"]
-            else:
-                lines = [f"🔎 **Found {len(results)} incidents:**\n"]
+        if summary is not None and not summary.startswith("⚠️"):
+            lines = [f"🤖 **Gemini Summary:**\n{summary}\n", "---", f"🔎 **Full Search Results ({len(results)}):**\n"]
         else:
             lines = [f"🔎 **Found {len(results)} incidents:**\n"]
 
@@ -258,6 +576,24 @@ class ChatbotAgent:
             what = str(inc.get("what_happened", ""))[:150]
             if what and what != "nan":
                 lines.append(f"   > {what}...")
+            related = [r["case_id"] for r in self.analyzer.related(inc["case_id"], top_n=3)]
+            if related:
+                lines.append(f"   ↪ *Related:* {', '.join(related)}")
+            lines.append("")
+
+        return "\n".join(lines)
+
+    def _related_response(self, result):
+        related = result["related"]
+        if not related:
+            return f"🤔 I couldn't find {result['case_id']} or any incidents related to it."
+
+        lines = [f"🔗 **Incidents related to {result['case_id']}:**\n"]
+        for i, inc in enumerate(related, 1):
+            score_pct = int(inc["similarity"] * 100)
+            risk_emoji = "🔴" if "high" in str(inc.get("risk_level", "")).lower() else "🟡" if "medium" in str(inc.get("risk_level", "")).lower() else "🟢"
+            lines.append(f"**{i}. {inc['case_id']} — {inc['title']}** ({score_pct}% match)")
+            lines.append(f"   {risk_emoji} {inc.get('risk_level', 'N/A')} | 📍 {inc.get('setting', 'N/A')} | 📅 {inc.get('date', 'N/A')}")
             lines.append("")
 
         return "\n".join(lines)
\ No newline at end of file
@@ -22,8 +22,123 @@ TEXT_FIELDS = [
 # App settings
 APP_TITLE = "🛡️ Safety Incident Advisor"
 APP_ICON = "🛡️"
+CHAT_HISTORY_MAX = 200     # Messages kept per chat session (oldest dropped first)
+CHAT_PAGE_SIZE = 10        # Messages shown live; older ones load a page at a time
 
 # Gemini AI Settings
 # Note: Api key should be stored in streamlit secrets or environment variables
 GEMINI_MODEL = "gemini-1.5-flash"
 USE_GEMINI = True  # Toggle this to False to fall back to the offline engine only
+
+# Profiling settings
+# Fraction of respond/init/save calls to run under cProfile (0 = off)
+PROFILE_SAMPLE_RATE = float(os.environ.get("SAFETY_PROFILE_RATE", "0") or 0)
+PROFILE_DIR = os.environ.get("SAFETY_PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_MAX_FILES = 200    # Oldest profiles are deleted beyond this count
+
+# HTTP API settings (api_server.py)
+API_HOST = os.environ.get("SAFETY_API_HOST", "0.0.0.0")
+API_PORT = int(os.environ.get("SAFETY_API_PORT", "8000"))
+API_WORKERS = int(os.environ.get("SAFETY_API_WORKERS", str(min(8, (os.cpu_count() or 1) + 4))))
+API_MAX_SESSIONS = 1000  # Conversation contexts kept by /respond (least recently used evicted)
+
+# Columns with a small set of distinct values, indexed as integer codes
+FACET_FIELDS = [
+    "category",
+    "risk_level",
+    "severity",
+    "location",
+    "injury_category",
+    "setting",
+    "topic",
+]
+
+# Shared-memory index (shared_index.py)
+# Set SAFETY_SHARED_INDEX_DIR to let worker processes attach to one
+# memory-mapped copy of the index instead of each building their own
+SHARED_INDEX_DIR = os.environ.get("SAFETY_SHARED_INDEX_DIR", os.path.join(BASE_DIR, "shared_index"))
+USE_SHARED_INDEX = bool(os.environ.get("SAFETY_SHARED_INDEX_DIR"))
+SHARED_INDEX_KEEP = 2      # Published generations kept on disk
+
+# Intent classifier (intent_classifier.py)
+USE_INTENT_MODEL = True    # Load the trained model at startup when it has been saved
+INTENT_MODEL_PATH = os.path.join(BASE_DIR, "models", "intent_model.joblib")
+INTENT_EXAMPLES_CSV = os.path.join(BASE_DIR, "intent_examples.csv")
+INTENT_MODEL_MIN_CONFIDENCE = 0.6  # Below this the keyword matcher decides
+
+# Incident classifiers (model_trainer.py)
+MODEL_DIR = os.path.join(BASE_DIR, "models")
+MODEL_N_JOBS = -1          # Cores used for training (-1 = all)
+CLASSIFIER_TARGETS = ["risk_level", "severity", "injury_category"]
+CLASSIFIER_TEXT_FIELD = "what_happened"  # Narrative the classifiers learn from and predict on
+MODEL_VERSIONS_KEEP = 3    # Data-versioned model files kept per kind (model_store.py)
+
+# Near-duplicate detection (dedupe.py)
+DEDUPE_NUM_PERM = 128      # MinHash signature length
+DEDUPE_BANDS = 32          # LSH bands (rows per band = NUM_PERM / BANDS)
+DEDUPE_THRESHOLD = 0.5     # Estimated Jaccard similarity of word shingles to flag
+DEDUPE_SHINGLE_SIZE = 3    # Words per shingle
+COLLAPSE_DUPLICATES = True # Show one result per duplicate cluster in find_similar
+
+# Canonical action index (action_index.py)
+ACTION_CLUSTER_THRESHOLD = 0.5  # Cosine similarity at which two actions are merged
+ACTION_BLOCK_SIZE = 2048        # Rows per block when building the similarity graph
+ACTION_FACET_FIELDS = ["owner", "timing", "verification"]  # Facets for direct action search
+
+# Sentence-level lessons index (lessons_index.py)
+LESSON_FIELDS = ["lessons_to_prevent", "what_went_well"]
+LESSON_CONTEXT_WEIGHT = 0.3  # Share of a sentence's score taken from its incident's similarity
+
+# Conversation context for follow-up questions (conversation.py)
+SESSION_CANDIDATES = 50        # Incidents kept from the previous turn
+SESSION_HISTORY = 10           # Recent turns remembered per session
+FOLLOWUP_MAX_WORDS = 8         # Longer messages are treated as new topics
+FOLLOWUP_CONTEXT_WEIGHT = 0.5  # Share of a follow-up's score kept from the previous turn
+
+# Multi-tool planner (agent.py)
+AGENT_MAX_WORKERS = 4    # Threads shared by all planners for concurrent tool calls
+AGENT_MAX_STEPS = 4      # Tool calls per turn
+AGENT_TURN_BUDGET = 8.0  # Seconds a turn waits for tools + Gemini; late calls are reported, not stopped
+
+# Related-incident graph (knn_graph.py)
+KNN_K = 10                 # Neighbours kept per incident
+KNN_BLOCK_SIZE = 256       # Rows per block when building the graph
+KNN_MIN_SIMILARITY = 0.05  # Weaker links are not stored
+
+# Topic model of hazard themes (topic_model.py)
+TOPIC_COUNT = 12           # Number of topics
+TOPIC_MIN_INCIDENTS = 20   # Models trained on fewer incidents are not saved
+TOPIC_LABEL_TERMS = 3      # Top terms in each topic label
+TOPIC_REFIT_DRIFT = 0.15   # Refit once this share of TF-IDF weight is on terms the saved model lacks
+
+# Incident trends and spike detection (trends.py)
+TREND_DIMENSIONS = ["category", "location", "topic"]  # Columns with per-period series
+TREND_WINDOW = 3           # Trailing periods (years) used as the baseline
+TREND_Z_THRESHOLD = 2.0    # Poisson z-score above which a count is a spike
+TREND_MIN_COUNT = 3        # Fewer incidents in a period are never a spike
+TREND_PRIOR_INCIDENTS = 20 # Pseudo-incidents spread evenly over values in every baseline
+TREND_RECENT_PERIODS = 2   # Most recent periods checked for spikes
+
+# Latent semantic search mode (latent_index.py)
+USE_LSA = False            # Blend dense LSA scores into incident search
+LSA_DIMENSIONS = 200       # Dense dimensions kept by the truncated SVD
+LSA_WEIGHT = 0.5           # Share of the latent score in the blended score
+
+# Sharded per-site index (sharded_index.py)
+USE_SHARDED_INDEX = False  # Answer incident searches by fanning out over site shards
+SHARD_FIELD = "location"   # Column incidents are partitioned by
+SHARD_MAX_ROWS = 5000      # Sites with more incidents are split into several shards
+SHARD_WORKERS = 4          # Threads used to search shards in parallel
+
+# Change-detecting reload of the CSV files (data_watcher.py)
+WATCH_INTERVAL = 5.0       # Seconds between checks of the CSV files (API server)
+WATCH_SETTLE_SECONDS = 1.0  # Files modified more recently are left until the next check
+
+# In-place edits and deletes of incidents (incident_analyzer.py)
+COMPACT_TOMBSTONE_RATIO = 0.1  # Deleted rows are compacted out beyond this share of the index
+
+# Typo-tolerant query correction (spelling.py)
+SPELL_CORRECTION = True    # Correct misspelt query words before searching
+SPELL_MAX_DISTANCE = 2     # Largest edit distance corrected (one edit for words of up to 6 letters)
+SPELL_PREFIX_LENGTH = 7    # Leading characters of a word used to look up candidates
+SPELL_MIN_LENGTH = 4       # Shorter words are never corrected
@@ -0,0 +1,104 @@
+"""
+Conversation Module
+Per-session retrieval context so follow-up questions keep their topic.
+
+After each retrieval turn the session keeps the top candidate incidents and
+their scores (bounded by SESSION_CANDIDATES). A short follow-up that refers
+back ("what training for that?") is re-ranked within that candidate set,
+blending the previous scores with the follow-up's own, instead of being
+searched against the whole corpus on its few words. Candidates are stored
+by case_id so they survive an index reload.
+"""
+
+import re
+from collections import deque
+
+import numpy as np
+
+from config import SESSION_CANDIDATES, SESSION_HISTORY, FOLLOWUP_MAX_WORDS, FOLLOWUP_CONTEXT_WEIGHT
+
+_REFERENCE_RE = re.compile(r"\b(?:that|this|it|those|these|them|same|above|such)\b", re.IGNORECASE)
+_WORD_RE = re.compile(r"\w+")
+
+
+def is_followup(message):
+    """A short message that refers back to the previous topic."""
+    return len(_WORD_RE.findall(message)) <= FOLLOWUP_MAX_WORDS and bool(_REFERENCE_RE.search(message))
+
+
+class ConversationContext:
+    def __init__(self, max_candidates=SESSION_CANDIDATES, history=SESSION_HISTORY):
+        """
+        :param max_candidates: Incidents kept from the previous turn
+        :param history: Number of recent (intent, query) turns remembered
+        """
+        self.max_candidates = max_candidates
+        self.history = deque(maxlen=history)
+        self.clear()
+
+    def clear(self):
+        self.case_ids = []
+        self.scores = np.empty(0)
+        self.topic = None
+        self.history.clear()
+
+    @property
+    def has_candidates(self):
+        return bool(self.case_ids)
+
+    def candidates(self, analyzer):
+        """Row positions and previous scores of the candidates still in the analyzer."""
+        pairs = [
+            (analyzer.case_rows[cid], score)
+            for cid, score in zip(self.case_ids, self.scores)
+            if cid in analyzer.case_rows
+        ]
+        rows = np.array([p[0] for p in pairs], dtype=np.int64)
+        return rows, np.array([p[1] for p in pairs], dtype=np.float64)
+
+    def retrieve(self, analyzer, query, followup=None):
+        """
+        Score a turn's query once for every tool in the turn.
+        Returns (text, scores, followup): the text to match against (the topic
+        is prepended for follow-ups) and per-incident scores.
+        :param followup: Force follow-up handling on/off (default: detect it)
+        """
+        if followup is None:
+            followup = is_followup(query)
+        if self.has_candidates and followup:
+            rows, previous = self.candidates(analyzer)
+            if len(rows):
+                fresh = analyzer.score_rows(query, rows)
+                blended = previous
+                if fresh.any():
+                    blended = FOLLOWUP_CONTEXT_WEIGHT * previous + (1 - FOLLOWUP_CONTEXT_WEIGHT) * fresh
+                scores = np.zeros(len(analyzer.data))
+                scores[rows] = blended
+                return f"{self.topic} {query}", scores, True
+        return query, analyzer.score(query), False
+
+    def update(self, analyzer, intent, query, scores, followup=False):
+        """Remember the top candidates of this turn."""
+        top = np.argsort(-scores, kind="stable")[: self.max_candidates]
+        top = top[scores[top] > 0]
+        if len(top):
+            self.case_ids = analyzer.data["case_id"].iloc[top].tolist()
+            self.scores = scores[top]
+            if not followup:
+                self.topic = query
+        self.history.append((intent, query))
+
+
+if __name__ == "__main__":
+    from data_loader import prepare_dataset
+    from incident_analyzer import IncidentAnalyzer
+
+    analyzer = IncidentAnalyzer(prepare_dataset())
+    session = ConversationContext()
+    for message in ["Pressure release while removing a fitting on small-bore tubing", "what training for that?"]:
+        text, scores, followup = session.retrieve(analyzer, message)
+        session.update(analyzer, "recommend", message, scores, followup)
+        top = np.argsort(-scores)[:3]
+        print(f"{message!r} (follow-up: {followup})")
+        for row in top:
+            print(f"  {scores[row]:.2f}  {analyzer.data['case_id'].iloc[row]}: {analyzer.data['title'].iloc[row]}")
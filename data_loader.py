@@ -3,11 +3,27 @@ Data Loader Module
 Loads and preprocesses the safety incident datasets.
 """
 
+import sys
+
+import numpy as np
 import pandas as pd
-import streamlit as st
 from config import REPORTS_CSV, ACTIONS_CSV, TEXT_FIELDS
 
 
+def _show_ui_error(message):
+    """
+    Surface an error in the Streamlit UI when running inside the app.
+    Streamlit is only used if the app already imported it, so scripts and
+    batch jobs never pay for loading it.
+    """
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            st.error(message)
+        except Exception:
+            pass
+
+
 def load_data():
     """
     Load both CSVs and return them as a dict of DataFrames.
@@ -18,7 +34,7 @@ def load_data():
         actions = pd.read_csv(ACTIONS_CSV, encoding='utf-8', encoding_errors='replace')
     except Exception as e:
         error_msg = f"Error loading CSV files. Path: {REPORTS_CSV}. Error: {e}"
-        st.error(f"⚠️ {error_msg}")
+        _show_ui_error(f"⚠️ {error_msg}")
         print(error_msg)
         # Create dummy data with at least one row to prevent TF-IDF crash
         reports = pd.DataFrame([{
@@ -79,13 +95,46 @@ def build_search_text(row):
     return " ".join(parts)
 
 
-def prepare_dataset():
+def normalize_dates(df):
+    """
+    Parse the free-form 'date' column, which mixes plain years ("2019") with
+    full dates from the report form ("2026-02-19"), into:
+      - incident_date: Timestamp (start of the period for partial dates)
+      - year: Int64 year
+      - date_precision: 'year', 'month', 'day' or 'unknown'
+    """
+    raw = df["date"].astype("string").str.strip() if "date" in df else pd.Series(pd.NA, index=df.index, dtype="string")
+    parsed = pd.to_datetime(raw, format="ISO8601", errors="coerce")
+    # Anything not in ISO form ("19/02/2026", "Feb 2023") is parsed one by one
+    rest = parsed.isna() & raw.notna()
+    if rest.any():
+        parsed[rest] = pd.to_datetime(raw[rest], format="mixed", dayfirst=True, errors="coerce")
+
+    df["incident_date"] = parsed
+    df["year"] = parsed.dt.year.astype("Int64")
+    df["date_precision"] = np.select(
+        [
+            parsed.isna().to_numpy(),
+            raw.str.fullmatch(r"\d{4}").fillna(False).to_numpy(dtype=bool),
+            raw.str.fullmatch(r"\d{4}-\d{1,2}").fillna(False).to_numpy(dtype=bool),
+        ],
+        ["unknown", "year", "month"],
+        "day",
+    )
+    return df
+
+
+def prepare_dataset(data=None):
     """
-    Full pipeline: load, merge, and add search text.
+    Full pipeline: load, merge, normalise dates and add search text.
     Returns the fully prepared DataFrame.
+    :param data: Optional {'reports', 'actions'} frames already read (e.g. by
+        data_watcher.DataWatcher); the CSVs are loaded when omitted
     """
-    data = load_data()
+    if data is None:
+        data = load_data()
     merged = merge_data(data["reports"], data["actions"])
+    merged = normalize_dates(merged)
     merged["search_text"] = merged.apply(build_search_text, axis=1)
     return merged
 
@@ -0,0 +1,281 @@
+"""
+Data Watcher Module
+Change-detecting reload of reports.csv / actions.csv.
+
+For each CSV the watcher remembers the size and mtime it last saw, the
+byte offset up to which it has parsed complete records, and a digest of
+those bytes. A check that finds both files unchanged costs a few stat calls.
+When a file has grown and its already-read bytes are intact, only the
+appended bytes are parsed (with the stored header) and applied to the live
+analyzer as new incidents. Any other change (bytes edited or removed,
+actions added to an existing incident, a case_id re-used) falls back to a
+full rebuild, except for edits made through data_writer.update_incident
+and delete_incident: those patch the analyzer directly and the rewritten
+files are then tracked as already applied. If the files the edit was made
+from held rows the analyzer had not seen yet, it is rebuilt instead.
+Updates are built on a copy of the analyzer and swapped in when ready, so
+queries in progress keep using the version they started with.
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+
+import pandas as pd
+
+from config import REPORTS_CSV, ACTIONS_CSV, WATCH_SETTLE_SECONDS
+from data_loader import load_data, prepare_dataset
+
+_CHUNK = 1 << 20
+
+
+def _complete_length(chunk, final=False):
+    """
+    Length of the prefix of chunk made of complete CSV records: up to the
+    last newline outside a quoted field. With final, an unterminated last
+    record counts as complete when its quotes are balanced.
+    """
+    end = quotes = pos = 0
+    for line in chunk.splitlines(keepends=True):
+        pos += len(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0 and (line.endswith(b"\n") or final):
+            end = pos
+    return end
+
+
+class _FileState:
+    def __init__(self, path):
+        self.path = path
+        self.size = self.mtime = self.offset = 0
+        self.header = b""
+        self.digest = hashlib.blake2b()
+
+    def track(self):
+        """Record the file's current contents as applied and return its complete records."""
+        with open(self.path, "rb") as f:
+            # Stat before reading: rows appended in between then change the
+            # size or mtime seen by the next check, which picks them up
+            stat = os.fstat(f.fileno())
+            content = f.read()
+        self.size, self.mtime = stat.st_size, stat.st_mtime_ns
+        self.offset = _complete_length(content, final=True)
+        self.header = content[: content.find(b"\n") + 1]
+        self.digest = hashlib.blake2b(content[: self.offset])
+        return content[: self.offset]
+
+    def applied(self, content):
+        """Whether content is exactly the bytes this file was last applied from."""
+        return len(content) == self.offset and hashlib.blake2b(content).digest() == self.digest.digest()
+
+    def read_all(self):
+        """Read the whole file, record its state and return the parsed frame."""
+        return pd.read_csv(io.BytesIO(self.track()), encoding="utf-8", encoding_errors="replace")
+
+    def settling(self, settle):
+        """Whether the file was modified less than settle seconds ago."""
+        return time.time() - os.stat(self.path).st_mtime_ns / 1e9 < settle
+
+    def check(self):
+        """
+        Returns None (unchanged), "rebuild", or the bytes of newly appended
+        complete records (possibly empty).
+        """
+        stat = os.stat(self.path)
+        if stat.st_size == self.size and stat.st_mtime_ns == self.mtime:
+            return None
+        if stat.st_size < self.offset:
+            return "rebuild"
+
+        digest = hashlib.blake2b()
+        with open(self.path, "rb") as f:
+            remaining = self.offset
+            while remaining:
+                block = f.read(min(_CHUNK, remaining))
+                if not block:
+                    return "rebuild"
+                digest.update(block)
+                remaining -= len(block)
+            if digest.digest() != self.digest.digest():
+                return "rebuild"
+            tail = f.read()
+
+        # The file has settled, so an unterminated last record is complete
+        complete = _complete_length(tail, final=True)
+        self.size, self.mtime = stat.st_size, stat.st_mtime_ns
+        self.offset += complete
+        self.digest.update(tail[:complete])
+        return tail[:complete]
+
+    def parse(self, records):
+        """Parse appended records with the header read at load time."""
+        return pd.read_csv(
+            io.BytesIO(self.header + records), encoding="utf-8", encoding_errors="replace"
+        )
+
+
+class DataWatcher:
+    def __init__(self, reports_path=REPORTS_CSV, actions_path=ACTIONS_CSV, settle=WATCH_SETTLE_SECONDS):
+        """
+        :param settle: Seconds a file must be left unmodified before it is read,
+            so a writer's report and action appends are picked up together
+        """
+        self.reports = _FileState(reports_path)
+        self.actions = _FileState(actions_path)
+        self.settle = settle
+        self.analyzer = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read both CSVs in full and start tracking them from there."""
+        try:
+            return {"reports": self.reports.read_all(), "actions": self.actions.read_all()}
+        except Exception as e:
+            print(f"Error reading CSV files for the watcher: {e}")
+            return load_data()
+
+    def build(self):
+        """Build the analyzer from a full read of the CSVs."""
+        from incident_analyzer import IncidentAnalyzer
+
+        with self._lock:
+            self.analyzer = IncidentAnalyzer(prepare_dataset(self.load()))
+            return self.analyzer
+
+    def poll(self, settle=None):
+        """
+        Check the files once. Returns None (nothing to apply), "rebuild", or
+        {'reports', 'actions'} frames of the appended rows.
+        """
+        settle = self.settle if settle is None else settle
+        try:
+            # Wait until both files are quiet so a report and its actions arrive together
+            if self.reports.settling(settle) or self.actions.settling(settle):
+                return None
+            changes = [self.reports.check(), self.actions.check()]
+        except OSError as e:
+            print(f"Error checking CSV files: {e}")
+            return None
+        if "rebuild" in changes:
+            return "rebuild"
+        if not any(changes):
+            return None
+        reports, actions = changes
+        try:
+            return {
+                "reports": self.reports.parse(reports or b""),
+                "actions": self.actions.parse(actions or b""),
+            }
+        except Exception as e:
+            print(f"Error parsing appended CSV rows: {e}")
+            return "rebuild"
+
+    def refresh(self, settle=None):
+        """
+        Apply any change on disk to self.analyzer.
+        Returns "append", "rebuild" or None when nothing changed.
+        """
+        from incident_analyzer import IncidentAnalyzer
+
+        with self._lock:
+            if self.analyzer is None:
+                return None
+            change = self.poll(settle)
+            if change is None:
+                return None
+            if change != "rebuild":
+                known = self.analyzer.case_rows
+                new_ids = set(change["reports"]["case_id"].tolist())
+                # Actions for incidents already loaded, or a re-used case_id, change existing rows
+                if new_ids & known.keys() or not set(change["actions"]["case_id"].tolist()) <= new_ids:
+                    change = "rebuild"
+            if change == "rebuild":
+                self.analyzer = IncidentAnalyzer(prepare_dataset(self.load()))
+                return "rebuild"
+            if change["reports"].empty:
+                return None
+            self.analyzer = self.analyzer.with_incidents(prepare_dataset(change))
+            return "append"
+
+    def apply_edit(self, case_id, data=None, read=None):
+        """
+        Patch the analyzer after data_writer rewrote the CSV files for one
+        incident, then track the rewritten files as applied so the next
+        check does not rebuild.
+        :param data: {'reports', 'actions'} frames of the edited incident;
+            None when it was deleted
+        :param read: (reports, actions) bytes the edit was made from; when
+            they hold rows the analyzer has not seen (appended by another
+            process since the last refresh), the analyzer is rebuilt instead
+        """
+        from incident_analyzer import IncidentAnalyzer
+
+        with self._lock:
+            if self.analyzer is not None and read is not None and not (
+                self.reports.applied(read[0]) and self.actions.applied(read[1])
+            ):
+                # load() tracks the rewritten files
+                self.analyzer = IncidentAnalyzer(prepare_dataset(self.load()))
+                return
+            if self.analyzer is not None:
+                if data is None:
+                    self.analyzer = self.analyzer.with_edits(deleted=[case_id])
+                else:
+                    self.analyzer = self.analyzer.with_edits(updates=prepare_dataset(data))
+            try:
+                self.reports.track()
+                self.actions.track()
+            except OSError as e:
+                print(f"Error reading CSV files for the watcher: {e}")
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+
+    tmp = tempfile.mkdtemp()
+    reports_path, actions_path = os.path.join(tmp, "reports.csv"), os.path.join(tmp, "actions.csv")
+    shutil.copy(REPORTS_CSV, reports_path)
+    shutil.copy(ACTIONS_CSV, actions_path)
+
+    watcher = DataWatcher(reports_path, actions_path, settle=0)
+    start = time.perf_counter()
+    analyzer = watcher.build()
+    print(f"Full build: {len(analyzer.data)} incidents in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    print(f"Unchanged check: {watcher.refresh()} ({(time.perf_counter() - start) * 1e6:.0f} µs)")
+
+    reports = pd.read_csv(reports_path)
+    new = reports.iloc[[0]].assign(case_id="INC-900", title="Appended: steam leak at a flange", date="2026-03-01")
+    with open(reports_path, "a", encoding="utf-8") as f:
+        f.write(new.to_csv(header=False, index=False))
+    with open(actions_path, "a", encoding="utf-8") as f:
+        f.write('INC-900,1,"Replace the gasket, then\nre-torque the flange",Maintenance,<30 days,Inspection\n')
+
+    start = time.perf_counter()
+    result = watcher.refresh()
+    print(f"Appended rows: {result} -> {len(watcher.analyzer.data)} incidents ({(time.perf_counter() - start) * 1e3:.0f} ms)")
+    print(f"  {watcher.analyzer.data['actions_list'].iloc[-1]}")
+    print(f"  original analyzer untouched: {len(analyzer.data)} incidents")
+
+    import data_writer
+
+    data_writer.REPORTS_CSV, data_writer.ACTIONS_CSV = reports_path, actions_path
+    case_id = reports["case_id"].iloc[1]
+    start = time.perf_counter()
+    data_writer.update_incident(case_id, {"risk_level": "Low"}, watcher=watcher)
+    data_writer.delete_incident("INC-900", watcher=watcher)
+    print(
+        f"Edited {case_id} and deleted INC-900 in place ({(time.perf_counter() - start) * 1e3:.0f} ms): "
+        f"risk_level={watcher.analyzer.data['risk_level'].iloc[1]}, "
+        f"{len(watcher.analyzer.live_data)} live incidents, next check: {watcher.refresh()}"
+    )
+
+    with open(reports_path, "r+b") as f:
+        f.seek(10)
+        f.write(b"X")
+    print(f"Edited existing bytes: {watcher.refresh()}")
+    shutil.rmtree(tmp)
@@ -1,8 +1,16 @@
 import csv
+import io
 import os
+import tempfile
+import threading
 import pandas as pd
 from datetime import datetime
 from config import REPORTS_CSV, ACTIONS_CSV
+from data_loader import build_search_text
+from profiler import profiled, annotate
+
+# Serialises writers (e.g. API worker threads) so case IDs stay unique
+_write_lock = threading.Lock()
 
 def ensure_newline(filepath):
     """Ensures the file ends with a newline character."""
@@ -38,45 +46,97 @@ def generate_case_id(existing_ids):
     new_id = max(numeric_ids) + 1
     return f"INC-{new_id:03d}"
 
+@profiled("save_new_incident")
 def save_new_incident(report_data, action_data_list):
     """
     Appends a new incident report and its actions to the CSV files.
     
     report_data: dict containing report fields
     action_data_list: list of dicts containing action fields
+
+    The analyzer's duplicate index picks the incident up when the watcher
+    applies the appended rows.
+    """
+    with _write_lock:
+        success, result = _append_incidents([(report_data, action_data_list)])
+    if success:
+        annotate(case_id=result[0], query=report_data.get('title', ""))
+        return True, result[0]
+    return False, result
+
+
+def update_incident(case_id, changes=None, actions=None, watcher=None):
+    """
+    Edits an existing incident in the CSV files.
+
+    case_id: incident to edit
+    changes: dict of report fields to overwrite (the case_id itself is kept)
+    actions: optional list of action dicts replacing the incident's actions
+    watcher: optional data_watcher.DataWatcher whose analyzer is patched to match
+    Returns (True, case_id) or (False, error message).
+    """
+    with _write_lock:
+        return _edit_incident(case_id, changes or {}, actions, watcher)
+
+
+def delete_incident(case_id, watcher=None):
+    """
+    Removes an incident and its actions from the CSV files.
+    Returns (True, case_id) or (False, error message).
     """
-    # 1. Load existing reports to get a new case_id
+    with _write_lock:
+        return _edit_incident(case_id, {}, [], watcher, delete=True)
+
+
+def editable_fields():
+    """Report columns update_incident can change: every reports.csv column but case_id."""
+    _, header, _ = _read_rows(REPORTS_CSV)
+    return [col for col in header if col != 'case_id']
+
+
+def find_duplicates(report_data, dedupe_index):
+    """Return probable duplicates of a report as (case_id, similarity) pairs."""
+    return dedupe_index.query(build_search_text(report_data))
+
+
+def _append_incidents(items):
+    # 1. Load existing reports to get new case_ids
     reports_df = pd.read_csv(REPORTS_CSV)
-    new_case_id = generate_case_id(reports_df['case_id'].tolist())
-    
-    # 2. Prepare report row
-    report_data['case_id'] = new_case_id
-    report_data['date'] = report_data.get('date', datetime.now().strftime('%Y-%m-%d'))
-    
-    # Ensure all columns exist in the right order
+    existing_ids = reports_df['case_id'].tolist()
     report_cols = reports_df.columns.tolist()
-    report_row = {col: report_data.get(col, "") for col in report_cols}
-    
-    # 3. Prepare action rows
+
+    report_rows = []
     action_rows = []
-    for i, action_item in enumerate(action_data_list):
-        action_row = {
-            'case_id': new_case_id,
-            'action_number': i + 1,
-            'action': action_item.get('action', ""),
-            'owner': action_item.get('owner', "TBD"),
-            'timing': action_item.get('timing', ""),
-            'verification': action_item.get('verification', "")
-        }
-        action_rows.append(action_row)
+    for report_data, action_data_list in items:
+        new_case_id = generate_case_id(existing_ids)
+        existing_ids.append(new_case_id)
+
+        # 2. Prepare report row
+        report_data['case_id'] = new_case_id
+        report_data['date'] = report_data.get('date', datetime.now().strftime('%Y-%m-%d'))
+
+        # Ensure all columns exist in the right order
+        report_rows.append({col: report_data.get(col, "") for col in report_cols})
+
+        # 3. Prepare action rows
+        for i, action_item in enumerate(action_data_list):
+            action_row = {
+                'case_id': new_case_id,
+                'action_number': i + 1,
+                'action': action_item.get('action', ""),
+                'owner': action_item.get('owner', "TBD"),
+                'timing': action_item.get('timing', ""),
+                'verification': action_item.get('verification', "")
+            }
+            action_rows.append(action_row)
     
     # 4. Append to CSVs
     try:
-        # Append Report
+        # Append Reports
         ensure_newline(REPORTS_CSV)
         with open(REPORTS_CSV, 'a', newline='', encoding='utf-8') as f:
             writer = csv.DictWriter(f, fieldnames=report_cols)
-            writer.writerow(report_row)
+            writer.writerows(report_rows)
             
         # Append Actions
         actions_df = pd.read_csv(ACTIONS_CSV)
@@ -88,8 +148,105 @@ def save_new_incident(report_data, action_data_list):
                 # Ensure all columns are present
                 clean_row = {col: row.get(col, "") for col in action_cols}
                 writer.writerow(clean_row)
-                
-        return True, new_case_id
     except Exception as e:
         print(f"Error saving incident: {e}")
         return False, str(e)
+
+    return True, [row['case_id'] for row in report_rows]
+
+
+def _read_rows(filepath):
+    """
+    Returns (raw bytes, header, rows) of a CSV file. Undecodable bytes are
+    replaced, as the loaders do, so one bad byte does not block edits.
+    """
+    with open(filepath, 'rb') as f:
+        content = f.read()
+    text = content.decode('utf-8', errors='replace')
+    reader = csv.DictReader(io.StringIO(text, newline=''))
+    return content, reader.fieldnames or [], list(reader)
+
+
+def _write_rows(filepath, fieldnames, rows):
+    """
+    Rewrites a CSV file atomically, so readers never see it half-written.
+    The temporary file has a unique name, so other processes rewriting the
+    same CSV cannot collide with it.
+    """
+    with tempfile.NamedTemporaryFile(
+        'w', dir=os.path.dirname(os.path.abspath(filepath)), suffix='.tmp', delete=False,
+        newline='', encoding='utf-8',
+    ) as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    try:
+        # NamedTemporaryFile is private (0600); keep the CSV's own permissions
+        os.chmod(f.name, os.stat(filepath).st_mode & 0o777)
+        os.replace(f.name, filepath)
+    except OSError:
+        os.remove(f.name)
+        raise
+
+
+def _as_read(rows, columns):
+    """DataFrame of CSV rows with the column types a CSV read would give them."""
+    return pd.read_csv(io.StringIO(pd.DataFrame(rows, columns=columns).to_csv(index=False)))
+
+
+def _edit_incident(case_id, changes, actions, watcher=None, delete=False):
+    if watcher is not None:
+        # Apply rows appended so far first: the rewritten files are then tracked as applied
+        watcher.refresh(settle=0)
+
+    try:
+        reports_read, report_cols, reports = _read_rows(REPORTS_CSV)
+        actions_read, action_cols, action_rows = _read_rows(ACTIONS_CSV)
+        report = next((row for row in reports if row.get('case_id') == case_id), None)
+        if report is None:
+            return False, f"Unknown case_id: {case_id}"
+        unknown = sorted(col for col in changes if col not in report_cols or col == 'case_id')
+        if unknown:
+            return False, f"Fields that cannot be edited: {', '.join(unknown)}"
+
+        if delete:
+            reports = [row for row in reports if row.get('case_id') != case_id]
+        else:
+            for col, value in changes.items():
+                if col in report_cols and col != 'case_id':
+                    report[col] = "" if value is None else str(value)
+
+        if actions is not None:
+            # The incident's new actions take the place of its old ones in the file
+            first = next((i for i, row in enumerate(action_rows) if row.get('case_id') == case_id), len(action_rows))
+            new_rows = [
+                {
+                    'case_id': case_id,
+                    'action_number': i + 1,
+                    'action': action_item.get('action', ""),
+                    'owner': action_item.get('owner', "TBD"),
+                    'timing': action_item.get('timing', ""),
+                    'verification': action_item.get('verification', "")
+                }
+                for i, action_item in enumerate(actions)
+            ]
+            kept = [row for row in action_rows if row.get('case_id') != case_id]
+            action_rows = kept[:first] + new_rows + kept[first:]
+            _write_rows(ACTIONS_CSV, action_cols, action_rows)
+        _write_rows(REPORTS_CSV, report_cols, reports)
+    except Exception as e:
+        print(f"Error editing incident: {e}")
+        return False, str(e)
+
+    # Patch the live analyzer in place instead of reloading it
+    if watcher is not None:
+        edited = None
+        if not delete:
+            edited = {
+                'reports': _as_read([report], report_cols),
+                'actions': _as_read([row for row in action_rows if row.get('case_id') == case_id], action_cols),
+            }
+        # The bytes read above let the watcher see rows appended after its last refresh
+        watcher.apply_edit(case_id, edited, read=(reports_read, actions_read))
+
+    return True, case_id
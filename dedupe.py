@@ -0,0 +1,205 @@
+"""
+Dedupe Module
+Near-duplicate detection for incident narratives with MinHash LSH.
+
+Each incident's search_text is reduced to word shingles, hashed into a
+MinHash signature and bucketed by bands, so a new report only has to be
+compared against the few incidents that share a bucket with it. The index
+is maintained incrementally as incidents are added, edited or removed.
+Updates and lookups are serialised by a lock inside the index, so queries
+from API worker threads can run while a submission adds to it.
+"""
+
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from config import DEDUPE_NUM_PERM, DEDUPE_BANDS, DEDUPE_THRESHOLD, DEDUPE_SHINGLE_SIZE
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def shingles(text, size=DEDUPE_SHINGLE_SIZE):
+    """Set of 32-bit hashes of the word n-grams in a text."""
+    tokens = _TOKEN_RE.findall(str(text).lower())
+    if len(tokens) < size:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = [" ".join(tokens[i: i + size]) for i in range(len(tokens) - size + 1)]
+    return {zlib.crc32(g.encode("utf-8")) & 0x7FFFFFFF for g in grams}
+
+
+class MinHashIndex:
+    def __init__(self, num_perm=DEDUPE_NUM_PERM, bands=DEDUPE_BANDS, threshold=DEDUPE_THRESHOLD, seed=1):
+        """
+        :param num_perm: Signature length (number of hash permutations)
+        :param bands: LSH bands; num_perm must be divisible by it
+        :param threshold: Minimum estimated Jaccard similarity to call a duplicate
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm).astype(np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        self.ids = []
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._pending = []
+        self._buckets = [dict() for _ in range(bands)]
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        # Locks cannot be copied or pickled; each copy gets its own
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def signature(self, text):
+        """MinHash signature of a text (all-max for texts with no tokens)."""
+        hashes = np.fromiter(shingles(text), dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(len(self._a), _MERSENNE_PRIME, dtype=np.uint32)
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, sig):
+        return [sig[i * self.rows: (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _all_signatures(self):
+        with self._lock:
+            if self._pending:
+                self._signatures = np.vstack([self._signatures] + self._pending)
+                self._pending = []
+            return self._signatures
+
+    def add(self, item_id, text):
+        """Index one incident; returns its position in the index."""
+        sig = self.signature(text)
+        with self._lock:
+            pos = len(self.ids)
+            self.ids.append(item_id)
+            self._pending.append(sig[None, :])
+            for band, key in zip(self._buckets, self._band_keys(sig)):
+                band.setdefault(key, []).append(pos)
+            return pos
+
+    def add_many(self, item_ids, texts):
+        with self._lock:
+            for item_id, text in zip(item_ids, texts):
+                self.add(item_id, text)
+
+    def _unbucket(self, pos):
+        for band, key in zip(self._buckets, self._band_keys(self._all_signatures()[pos])):
+            members = band.get(key)
+            if members and pos in members:
+                members.remove(pos)
+                if not members:
+                    del band[key]
+
+    def replace(self, pos, text):
+        """Re-index the item at a position with new text (e.g. an edited incident)."""
+        sig = self.signature(text)
+        with self._lock:
+            self._unbucket(pos)
+            self._all_signatures()[pos] = sig
+            for band, key in zip(self._buckets, self._band_keys(sig)):
+                band.setdefault(key, []).append(pos)
+
+    def remove(self, pos):
+        """
+        Stop matching the item at a position. Its position is kept (so later
+        positions stay aligned) and it forms a group of its own.
+        """
+        with self._lock:
+            self._unbucket(pos)
+
+    def _candidates(self, sig, exclude=None):
+        found = set()
+        for band, key in zip(self._buckets, self._band_keys(sig)):
+            found.update(band.get(key, ()))
+        found.discard(exclude)
+        return found
+
+    def query(self, text, exclude=None):
+        """
+        Return probable duplicates of a text as (item_id, estimated_jaccard),
+        most similar first.
+        """
+        sig = self.signature(text)
+        return self._match(sig, exclude)
+
+    def _match(self, sig, exclude=None):
+        with self._lock:
+            candidates = sorted(self._candidates(sig, exclude))
+            if not candidates:
+                return []
+            sims = (self._all_signatures()[candidates] == sig).mean(axis=1)
+            hits = [(self.ids[c], float(s)) for c, s in zip(candidates, sims) if s >= self.threshold]
+        return sorted(hits, key=lambda h: -h[1])
+
+    def groups(self):
+        """
+        Label every indexed item with a duplicate-group id (union-find over
+        LSH candidate pairs above the threshold). Unique items get their own group.
+        """
+        with self._lock:
+            sigs = self._all_signatures()
+            parent = list(range(len(self.ids)))
+
+            def find(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+
+            for band in self._buckets:
+                for members in band.values():
+                    if len(members) < 2:
+                        continue
+                    first = members[0]
+                    for other in members[1:]:
+                        if find(first) != find(other) and (sigs[first] == sigs[other]).mean() >= self.threshold:
+                            parent[find(other)] = find(first)
+            return np.array([find(i) for i in range(len(parent))], dtype=np.int64)
+
+    def report(self):
+        """Clusters of probable duplicates, largest first, as lists of item ids."""
+        clusters = {}
+        for pos, group in enumerate(self.groups()):
+            clusters.setdefault(group, []).append(self.ids[pos])
+        return sorted((c for c in clusters.values() if len(c) > 1), key=len, reverse=True)
+
+
+if __name__ == "__main__":
+    import time
+    from data_loader import prepare_dataset
+
+    df = prepare_dataset()
+    index = MinHashIndex()
+    start = time.perf_counter()
+    index.add_many(df["case_id"].tolist(), df["search_text"].tolist())
+    print(f"Indexed {len(index)} incidents in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    clusters = index.report()
+    print(f"{len(clusters)} duplicate clusters:")
+    for cluster in clusters:
+        print("  " + ", ".join(map(str, cluster)))
+
+    sample = df["search_text"].iloc[0]
+    start = time.perf_counter()
+    for _ in range(100):
+        index.query(sample)
+    print(f"Query: {(time.perf_counter() - start) * 10:.3f} ms per check")
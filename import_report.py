@@ -0,0 +1,65 @@
+"""
+Import Report
+Cold-start import-time breakdown of the core (non-UI) modules.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter for
+each module and prints the cumulative import time, the heaviest packages
+pulled in, and whether any UI / heavy dependency was loaded eagerly.
+
+Usage:
+    python import_report.py [module ...]
+"""
+
+import subprocess
+import sys
+
+CORE_MODULES = ["config", "data_loader", "incident_analyzer", "tools", "chatbot_agent"]
+HEAVY_PACKAGES = ["streamlit", "google", "sklearn", "scipy", "pandas", "numpy"]
+
+
+def measure(module):
+    """
+    Import a module in a fresh interpreter and parse the -X importtime output.
+    Returns (total microseconds, dict of package -> cumulative microseconds).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    total = 0
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented further; only top-level entries are
+        # independent costs, so summing them gives the total cold-start time
+        if not name.startswith("  "):
+            total += int(cumulative)
+        timings.setdefault(name.strip(), int(cumulative))
+    return total, timings
+
+
+def report(modules):
+    print(f"{'module':<20}{'total ms':>10}  eager heavy imports")
+    print("-" * 70)
+    for module in modules:
+        try:
+            total, timings = measure(module)
+        except RuntimeError as e:
+            print(f"{module:<20}{'error':>10}  {e}")
+            continue
+        heavy = [
+            f"{pkg} ({timings[pkg] / 1000:.0f} ms)"
+            for pkg in HEAVY_PACKAGES
+            if pkg in timings
+        ]
+        print(f"{module:<20}{total / 1000:>10.1f}  {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    report(sys.argv[1:] or CORE_MODULES)
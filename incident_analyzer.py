@@ -3,10 +3,51 @@ Incident Analyzer Module
 Uses TF-IDF + cosine similarity to find historical patterns in safety incidents.
 """
 
+import copy
+import threading
+
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from config import TOP_N_SIMILAR, SIMILARITY_THRESHOLD
+from config import (
+    TOP_N_SIMILAR,
+    SIMILARITY_THRESHOLD,
+    FACET_FIELDS,
+    COLLAPSE_DUPLICATES,
+    USE_LSA,
+    LSA_WEIGHT,
+    USE_SHARDED_INDEX,
+    SHARD_FIELD,
+    LESSON_FIELDS,
+    COMPACT_TOMBSTONE_RATIO,
+    SPELL_CORRECTION,
+)
+from data_loader import normalize_dates
+from dedupe import MinHashIndex
+from knn_graph import KnnGraph
+from latent_index import load_or_fit
+import spelling
+from trends import TrendIndex
+
+
+def _make_vectorizer():
+    """Create the TF-IDF vectorizer used for the incident index."""
+    # scikit-learn is imported here rather than at module level so that
+    # importing the analyzer (e.g. for type hints or tools) stays cheap
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return TfidfVectorizer(
+        stop_words="english",
+        max_features=5000,
+        ngram_range=(1, 2),
+    )
+
+
+def _action_offsets(data):
+    """CSR-style offsets of each incident's actions."""
+    counts = [len(a) for a in data["actions_list"]] if "actions_list" in data else []
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
 
 
 class IncidentAnalyzer:
@@ -16,11 +57,7 @@ class IncidentAnalyzer:
         :param data: DataFrame with 'search_text' column (from data_loader.prepare_dataset)
         """
         self.data = data
-        self.vectorizer = TfidfVectorizer(
-            stop_words="english",
-            max_features=5000,
-            ngram_range=(1, 2),
-        )
+        self.vectorizer = _make_vectorizer()
         # Build the TF-IDF matrix on all incident texts
         # Handle empty/missing data gracefully to prevent scikit-learn 'empty vocabulary' error
         texts = self.data["search_text"].fillna("").astype(str).tolist()
@@ -30,69 +67,545 @@ class IncidentAnalyzer:
             texts = ["placeholder search text for empty database"]
             
         self.tfidf_matrix = self.vectorizer.fit_transform(texts)
+        self._topic_model = None
+        self.data = self.data.assign(topic=self.assign_topics(self.tfidf_matrix[: len(self.data)]))
+        self._build_derived()
+
+    @classmethod
+    def from_index(
+        cls, data, vocabulary, idf, tfidf_matrix, facets=None, action_offsets=None, knn=None, latent=None
+    ):
+        """
+        Build an analyzer around an already computed index (e.g. attached from
+        shared memory by shared_index.attach) without refitting TF-IDF.
+
+        :param vocabulary: dict term -> column index
+        :param idf: IDF vector aligned with the vocabulary columns
+        :param tfidf_matrix: CSR matrix of incident vectors (rows aligned with data)
+        :param facets: Optional dict column -> (codes, labels); rebuilt when omitted
+        :param action_offsets: Optional cumulative action counts; rebuilt when omitted
+        :param knn: Optional KnnGraph of related incidents; rebuilt when omitted
+        :param latent: Optional LatentIndex; fitted when omitted and USE_LSA is on
+        """
+        analyzer = cls.__new__(cls)
+        analyzer.data = data
+        analyzer.vectorizer = _make_vectorizer()
+        analyzer.vectorizer.vocabulary_ = vocabulary
+        analyzer.vectorizer.idf_ = idf
+        analyzer.tfidf_matrix = tfidf_matrix
+        analyzer._topic_model = None
+        if "topic" not in data.columns:
+            analyzer.data = data.assign(topic=analyzer.assign_topics(tfidf_matrix[: len(data)]))
+        analyzer._build_derived(facets, action_offsets, knn, latent=latent)
+        return analyzer
+
+    def _build_derived(
+        self, facets=None, action_offsets=None, knn=None, trends=None, latent=None, spelling_index=None, dedupe=None
+    ):
+        """
+        Build the compact arrays derived from the data:
+          - facets: column -> (int32 codes per incident, array of labels)
+          - action_offsets: CSR-style offsets of each incident's actions
+          - case_rows: case_id -> row position
+          - dedupe / duplicate_groups: MinHash index and duplicate-cluster id per incident
+          - knn: k-nearest-neighbour graph of related incidents
+          - trends: per-year counts by category, location and topic
+          - latent: dense LSA vectors blended into scores (only when USE_LSA)
+          - deleted: tombstones of deleted incidents (none until delete_incidents)
+          - spelling: typo-correction index over the vocabulary (only when SPELL_CORRECTION)
+        """
+        if facets is None:
+            facets = {}
+            for col in FACET_FIELDS:
+                if col in self.data.columns:
+                    codes, labels = pd.factorize(self.data[col].astype("string"))
+                    facets[col] = (codes.astype(np.int32), np.asarray(labels, dtype=object))
+        self.facets = facets
+
+        if action_offsets is None:
+            action_offsets = _action_offsets(self.data)
+        self.action_offsets = action_offsets
+        self.deleted = np.zeros(len(self.data), dtype=bool)
+
+        # case_id -> row position (first occurrence wins)
+        self.case_rows = {}
+        for row, cid in enumerate(self.data["case_id"].tolist()):
+            self.case_rows.setdefault(cid, row)
+        self._action_index = None
+        self._lesson_index = None
+        self._shards = None
+        # Concurrent first requests build a lazy index once, not once each
+        self._lazy_lock = threading.Lock()
+
+        if dedupe is None:
+            dedupe = MinHashIndex()
+            dedupe.add_many(self.data["case_id"].tolist(), self.data["search_text"].fillna("").tolist())
+        self.dedupe = dedupe
+        self.duplicate_groups = self.dedupe.groups()
+
+        if knn is None:
+            knn = KnnGraph.build(self.tfidf_matrix[: len(self.data)])
+        self.knn = knn
+
+        if trends is None:
+            trends = TrendIndex(self.data)
+        self.trends = trends
+
+        if latent is None and USE_LSA and len(self.data):
+            latent = load_or_fit(self.tfidf_matrix[: len(self.data)])
+        self.latent = latent
+
+        if spelling_index is None and SPELL_CORRECTION:
+            spelling_index = spelling.build(
+                self.vectorizer, self.tfidf_matrix[: len(self.data)], self.data["search_text"].fillna("")
+            )
+        self.spelling = spelling_index
+
+    def add_incidents(self, new_data):
+        """
+        Append prepared incidents without refitting TF-IDF: new rows are
+        vectorised with the fitted vocabulary and inserted into the kNN graph,
+        trend series and MinHash index incrementally; the other derived arrays
+        are rebuilt.
+        :param new_data: DataFrame shaped like prepare_dataset() output
+        """
+        from scipy.sparse import vstack
+
+        if new_data.empty:
+            return
+        # Row positions of new incidents follow the live ones
+        self.compact()
+        old_rows, shards = len(self.data), self._shards
+        vectors = self.vectorizer.transform(new_data["search_text"].fillna("").astype(str).tolist())
+        self.tfidf_matrix = vstack([self.tfidf_matrix[: len(self.data)], vectors]).tocsr()
+        new_data = new_data.assign(topic=self.assign_topics(vectors))
+        if "year" not in new_data.columns:
+            new_data = normalize_dates(new_data.copy())
+        self.data = pd.concat([self.data, new_data], ignore_index=True)
+        self.knn.add(self.tfidf_matrix)
+        self.trends.add(new_data)
+        self.dedupe.add_many(new_data["case_id"].tolist(), new_data["search_text"].fillna("").tolist())
+        if self.latent is not None:
+            self.latent.add(vectors)
+        if self.spelling is not None:
+            # Same vocabulary; the new incidents' words are spelt as intended
+            self.spelling = self.spelling.updated(known=spelling.corpus_words(new_data["search_text"].fillna("")))
+        self._build_derived(
+            knn=self.knn, trends=self.trends, latent=self.latent, spelling_index=self.spelling, dedupe=self.dedupe
+        )
+        if shards is not None:
+            # Only the sites that received incidents are re-indexed
+            shards.update(self, np.arange(old_rows, len(self.data)))
+            self._shards = shards
+
+    def update_incidents(self, updates):
+        """
+        Replace incidents with edited versions in place, without refitting
+        TF-IDF: the edited rows' vectors, topics, facet codes, action offsets,
+        trend counts, MinHash signatures, kNN links, latent vectors and site
+        shards are patched, and the lazily built indexes are dropped.
+        :param updates: DataFrame shaped like prepare_dataset() output; rows
+            whose case_id is not indexed are ignored
+        """
+        from scipy.sparse import vstack
+
+        updates = updates[updates["case_id"].isin(list(self.case_rows))].drop_duplicates("case_id", keep="last")
+        if updates.empty:
+            return
+        n = len(self.data)
+        rows = np.array([self.case_rows[cid] for cid in updates["case_id"]], dtype=np.int64)
+        vectors = self.vectorizer.transform(updates["search_text"].fillna("").astype(str).tolist())
+        updates = updates.assign(topic=self.assign_topics(vectors))
+        if "year" not in updates.columns:
+            updates = normalize_dates(updates.copy())
+        old = self.data.iloc[rows]
+        moved = set(self._shards._keys(rows).tolist()) if self._shards is not None else ()
+
+        # Edited rows take the place of the originals
+        order = np.arange(n)
+        order[rows] = n + np.arange(len(rows))
+        self.data = pd.concat([self.data, updates], ignore_index=True).iloc[order].reset_index(drop=True)
+        self.tfidf_matrix = vstack([self.tfidf_matrix[:n], vectors]).tocsr()[order]
+
+        facets = {}
+        for col, (codes, labels) in self.facets.items():
+            codes, labels = np.array(codes), list(labels)
+            for row, value in zip(rows, self.data[col].iloc[rows].astype("string")):
+                if pd.isna(value):
+                    codes[row] = -1
+                    continue
+                if value not in labels:
+                    labels.append(value)
+                codes[row] = labels.index(value)
+            facets[col] = (codes, np.asarray(labels, dtype=object))
+        self.facets = facets
+        self.action_offsets = _action_offsets(self.data)
+
+        self.trends.remove(old)
+        self.trends.add(updates)
+        for row, text in zip(rows, updates["search_text"].fillna("").tolist()):
+            self.dedupe.replace(row, text)
+        self.duplicate_groups = self.dedupe.groups()
+        self.knn.update(self.tfidf_matrix, rows, ~self.deleted)
+        if self.latent is not None:
+            self.latent.replace(rows, vectors)
+        if self.spelling is not None:
+            self.spelling = self.spelling.updated(known=spelling.corpus_words(updates["search_text"].fillna("")))
+        if self._shards is not None:
+            self._shards.update(self, rows, moved)
+        self._action_index = None
+        self._lesson_index = None
+
+    def delete_incidents(self, case_ids):
+        """
+        Delete incidents by tombstoning their rows: they stop matching any
+        search, statistic or index at once, and their rows are dropped for
+        good by compact() once tombstones exceed COMPACT_TOMBSTONE_RATIO.
+        """
+        case_ids = [cid for cid in dict.fromkeys(case_ids) if cid in self.case_rows]
+        if not case_ids:
+            return
+        rows = np.array([self.case_rows[cid] for cid in case_ids], dtype=np.int64)
+        self.case_rows = {cid: row for cid, row in self.case_rows.items() if cid not in set(case_ids)}
+        self.deleted = self.deleted.copy()
+        self.deleted[rows] = True
+
+        self.trends.remove(self.data.iloc[rows])
+        for row in rows:
+            self.dedupe.remove(row)
+        self.duplicate_groups = self.dedupe.groups()
+        self.knn.update(self.tfidf_matrix, rows, ~self.deleted)
+        if self._shards is not None:
+            self._shards.update(self, rows)
+        self._action_index = None
+        self._lesson_index = None
+
+        if self.deleted.sum() > COMPACT_TOMBSTONE_RATIO * len(self.data):
+            self.compact()
+
+    def compact(self):
+        """
+        Drop tombstoned rows for good. Rows are renumbered, kNN links and
+        latent vectors are carried over, and the other derived arrays are
+        rebuilt.
+        """
+        keep = ~self.deleted
+        if keep.all():
+            return
+        self.data = self.data[keep].reset_index(drop=True)
+        self.tfidf_matrix = self.tfidf_matrix[: len(keep)][keep]
+        self.knn.compact(keep)
+        if self.latent is not None:
+            self.latent.compact(keep)
+        self._build_derived(knn=self.knn, trends=self.trends, latent=self.latent, spelling_index=self.spelling)
+
+    def _copy(self):
+        """Copy of the analyzer whose incrementally updated structures can be changed safely."""
+        updated = copy.copy(self)
+        updated.knn = copy.copy(self.knn)
+        updated.trends = copy.deepcopy(self.trends)
+        updated.dedupe = copy.deepcopy(self.dedupe)
+        if self.latent is not None:
+            updated.latent = copy.copy(self.latent)
+        if self._shards is not None:
+            updated._shards = copy.copy(self._shards)
+            updated._shards.shards = dict(self._shards.shards)
+        return updated
+
+    def with_incidents(self, new_data):
+        """
+        Copy of the analyzer with new incidents appended (see add_incidents).
+        The structures add_incidents updates in place are copied first, so
+        queries still running on this analyzer are unaffected; callers swap
+        in the returned analyzer once it is ready.
+        """
+        updated = self._copy()
+        updated.add_incidents(new_data)
+        return updated
 
-    def find_similar(self, query, top_n=None, filters=None):
+    def with_edits(self, updates=None, deleted=()):
+        """
+        Copy of the analyzer with incidents edited and/or deleted (see
+        update_incidents and delete_incidents), leaving this one untouched.
+        """
+        updated = self._copy()
+        if updates is not None:
+            updated.update_incidents(updates)
+        if deleted:
+            updated.delete_incidents(deleted)
+        return updated
+
+    @property
+    def live_data(self):
+        """The incidents that have not been deleted."""
+        return self.data[~self.deleted] if self.deleted.any() else self.data
+
+    def _indexed_data(self):
+        """
+        Data for the lazily built action and lessons indexes: rows stay
+        aligned with the analyzer, deleted incidents have no actions or lessons.
+        """
+        if not self.deleted.any():
+            return self.data
+        data = self.data.copy()
+        data["actions_list"] = [[] if gone else acts for gone, acts in zip(self.deleted, data["actions_list"])]
+        for field in LESSON_FIELDS:
+            if field in data.columns:
+                data.loc[self.deleted, field] = ""
+        return data
+
+    def _filter_mask(self, filters):
+        """
+        Boolean mask of incidents matching all filters (case-insensitive substring).
+        Facet columns are matched on their few distinct labels, then mapped
+        back through the integer codes instead of scanning every row.
+        """
+        mask = ~self.deleted
+        for col, val in (filters or {}).items():
+            if not val:
+                continue
+            needle = str(val).lower()
+            if col in self.facets:
+                codes, labels = self.facets[col]
+                hits = [i for i, label in enumerate(labels) if needle in str(label).lower()]
+                mask &= np.isin(codes, hits)
+            elif col in self.data.columns:
+                mask &= (
+                    self.data[col].astype("string").str.lower()
+                    .str.contains(needle, regex=True, na=False).to_numpy(dtype=bool)
+                )
+        return mask
+
+    def get_topic_model(self):
+        """Topic model persisted for this vocabulary (trained on this matrix the first time)."""
+        if self._topic_model is None:
+            from topic_model import load_or_train
+
+            self._topic_model = load_or_train(
+                self.tfidf_matrix[: len(self.data)], self.vectorizer.vocabulary_
+            )
+        return self._topic_model
+
+    def assign_topics(self, matrix):
+        """Topic label for each row of a TF-IDF matrix from this analyzer's vectorizer."""
+        return self.get_topic_model().assign(matrix, self.vectorizer.vocabulary_)
+
+    def assign_topic(self, text):
+        """Topic label for a single incident text (e.g. a new submission)."""
+        return self.assign_topics(self.vectorizer.transform([text]))[0]
+
+    def get_action_index(self):
+        """Canonical action index for this data (loaded or built on first use)."""
+        if self._action_index is None:
+            with self._lazy_lock:
+                if self._action_index is None:
+                    from action_index import load_or_build
+
+                    self._action_index = load_or_build(self._indexed_data())
+        return self._action_index
+
+    def get_shards(self):
+        """Per-site sharded index over this data (built on first use)."""
+        if self._shards is None:
+            with self._lazy_lock:
+                if self._shards is None:
+                    from sharded_index import ShardedIndex
+
+                    self._shards = ShardedIndex(self)
+        return self._shards
+
+    def get_lesson_index(self):
+        """Sentence-level lessons index for this data (loaded or built on first use)."""
+        if self._lesson_index is None:
+            with self._lazy_lock:
+                if self._lesson_index is None:
+                    from lessons_index import load_or_build
+
+                    self._lesson_index = load_or_build(self._indexed_data())
+        return self._lesson_index
+
+    def enable_latent(self, latent=None):
+        """Switch on the LSA mode for this analyzer (fitting it if needed)."""
+        self.latent = latent or load_or_fit(self.tfidf_matrix[: len(self.data)])
+        return self.latent
+
+    def correct_query(self, query):
+        """
+        Correct misspelt words that would fall out of the vocabulary.
+        Returns (corrected query, [(word, correction), ...]).
+        """
+        if self.spelling is None:
+            return query, []
+        return self.spelling.correct(query)
+
+    def _blend(self, lexical, query_vec, rows=None):
+        """Mix latent scores into lexical ones when the LSA mode is on."""
+        if self.latent is None:
+            return lexical
+        latent = self.latent.score(query_vec, rows)
+        if rows is None:
+            latent = np.pad(latent, (0, len(lexical) - len(latent)))
+        return (1 - LSA_WEIGHT) * lexical + LSA_WEIGHT * latent
+
+    def score(self, query):
+        """Return the cosine similarity of a query against every incident (0 for deleted ones)."""
+        query_vec = self.vectorizer.transform([query])
+        # TF-IDF rows are L2-normalised, so the sparse dot product is the cosine similarity
+        scores = self._blend((self.tfidf_matrix @ query_vec.T).toarray().ravel(), query_vec)
+        scores[np.flatnonzero(self.deleted)] = 0.0
+        return scores
+
+    def score_rows(self, query, rows):
+        """Cosine similarity of a query against a subset of incident rows."""
+        query_vec = self.vectorizer.transform([query])
+        scores = self._blend((self.tfidf_matrix[rows] @ query_vec.T).toarray().ravel(), query_vec, rows)
+        scores[self.deleted[rows]] = 0.0
+        return scores
+
+    def find_similar(self, query, top_n=None, filters=None, collapse_duplicates=None, scores=None):
         """
         Find the most similar historical incidents to a query.
 
         :param query: User's incident description or question
         :param top_n: Number of results to return (default from config)
         :param filters: Optional dict of column->value filters (e.g. {'risk_level': 'High'})
+        :param collapse_duplicates: Keep only the best match per duplicate cluster
+            (default COLLAPSE_DUPLICATES)
+        :param scores: Precomputed per-incident scores for the query (skips scoring)
         :return: List of dicts with incident details + similarity score
         """
         if top_n is None:
             top_n = TOP_N_SIMILAR
+        if collapse_duplicates is None:
+            collapse_duplicates = COLLAPSE_DUPLICATES
 
-        # Vectorize the query
-        query_vec = self.vectorizer.transform([query])
-        similarities = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
+        if scores is None and USE_SHARDED_INDEX:
+            rows, similarities = self._search_shards(query, top_n, filters, collapse_duplicates)
+        else:
+            if scores is None:
+                scores = self.score(query)
+            similarities = scores[: len(self.data)]
+
+            # Apply optional filters and the relevance threshold
+            mask = self._filter_mask(filters) & (similarities >= SIMILARITY_THRESHOLD)
+            candidates = np.flatnonzero(mask)
+
+            # Stable sort keeps the original row order for tied scores
+            order = np.argsort(-similarities[candidates], kind="stable")
+            rows = candidates[order]
+        if collapse_duplicates:
+            # First (best-scoring) member of each duplicate cluster
+            _, first = np.unique(self.duplicate_groups[rows], return_index=True)
+            rows = rows[np.sort(first)]
+        rows = rows[:top_n]
+
+        results = self.data.iloc[rows].copy()
+        results["similarity"] = similarities[rows]
+        return results.to_dict("records")
 
-        # Create results DataFrame
-        results = self.data.copy()
-        results["similarity"] = similarities
+    def _search_shards(self, query, top_n, filters, collapse_duplicates):
+        """
+        find_similar candidates from the sharded index: the site filter picks
+        the shards and the other filters are applied inside each shard. When
+        near-duplicates will be collapsed afterwards, the fetch is doubled
+        until it holds top_n distinct clusters or runs out of relevant rows.
+        Returns (ranked rows, full-length similarity array).
+        """
+        filters = dict(filters or {})
+        site = filters.pop(SHARD_FIELD, None)
+        mask = self._filter_mask(filters) if any(filters.values()) else None
+        fetch = top_n * 2 if collapse_duplicates else top_n
+        while True:
+            rows, top = self.get_shards().search(query, site=site, top_k=fetch, mask=mask)
+            keep = top >= SIMILARITY_THRESHOLD
+            if (
+                not collapse_duplicates
+                or len(rows) < fetch
+                or not keep.all()
+                or len(np.unique(self.duplicate_groups[rows])) >= top_n
+            ):
+                break
+            fetch *= 2
+        similarities = np.zeros(len(self.data))
+        similarities[rows] = top
+        return rows[keep], similarities
 
-        # Apply optional filters
-        if filters:
-            for col, val in filters.items():
-                if col in results.columns and val:
-                    results = results[
-                        results[col].str.lower().str.contains(val.lower(), na=False)
-                    ]
+    def related(self, case_id, top_n=None, collapse_duplicates=None):
+        """
+        Incidents most similar to a given incident, read from the kNN graph.
 
-        # Filter by threshold and sort
-        results = results[results["similarity"] >= SIMILARITY_THRESHOLD]
-        results = results.sort_values("similarity", ascending=False).head(top_n)
+        :param case_id: Case ID of the source incident
+        :param top_n: Number of results (default from config, at most KNN_K)
+        :param collapse_duplicates: Skip near-duplicates of the source and keep
+            one result per duplicate cluster (default COLLAPSE_DUPLICATES)
+        :return: List of dicts with incident details + similarity score
+        """
+        if top_n is None:
+            top_n = TOP_N_SIMILAR
+        if collapse_duplicates is None:
+            collapse_duplicates = COLLAPSE_DUPLICATES
+        row = self.case_rows.get(case_id)
+        if row is None:
+            return []
+
+        rows, scores = [], []
+        seen = {self.duplicate_groups[row]} if collapse_duplicates else set()
+        for neighbor, score in self.knn.neighbors(row):
+            if collapse_duplicates:
+                group = self.duplicate_groups[neighbor]
+                if group in seen:
+                    continue
+                seen.add(group)
+            rows.append(neighbor)
+            scores.append(score)
+            if len(rows) >= top_n:
+                break
 
+        results = self.data.iloc[rows].copy()
+        results["similarity"] = scores
         return results.to_dict("records")
 
-    def get_statistics(self):
+    def get_statistics(self, rows=None):
         """
         Return aggregate statistics about the incident database.
+        :param rows: Optional row positions to restrict the statistics to
         """
-        df = self.data
+        if rows is None and self.deleted.any():
+            rows = np.flatnonzero(~self.deleted)
+        if rows is None:
+            df = self.data
+            total_actions = int(self.action_offsets[-1])
+            groups = self.duplicate_groups
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            df = self.data.iloc[rows]
+            total_actions = int((self.action_offsets[rows + 1] - self.action_offsets[rows]).sum())
+            groups = self.duplicate_groups[rows]
         stats = {
             "total_incidents": len(df),
-            "total_actions": sum(len(a) for a in df["actions_list"]),
+            "total_actions": total_actions,
+            "duplicate_incidents": len(df) - len(np.unique(groups)),
             "by_category": df["category"].value_counts().to_dict(),
             "by_risk_level": df["risk_level"].value_counts().to_dict(),
             "by_severity": df["severity"].value_counts().to_dict(),
-            "by_year": df["date"].value_counts().sort_index().to_dict(),
+            "by_year": (df["year"] if "year" in df else df["date"]).value_counts().sort_index().to_dict(),
             "by_location": df["location"].value_counts().to_dict(),
             "by_injury": df["injury_category"].value_counts().to_dict(),
+            "by_topic": df["topic"].value_counts().to_dict() if "topic" in df else {},
         }
         return stats
 
     def get_category_list(self):
         """Return unique categories."""
-        return sorted(self.data["category"].dropna().unique().tolist())
+        return sorted(self.live_data["category"].dropna().unique().tolist())
 
     def get_risk_levels(self):
         """Return unique risk levels."""
-        return sorted(self.data["risk_level"].dropna().unique().tolist())
+        return sorted(self.live_data["risk_level"].dropna().unique().tolist())
 
     def get_locations(self):
         """Return unique locations."""
-        return sorted(self.data["location"].dropna().unique().tolist())
+        return sorted(self.live_data["location"].dropna().unique().tolist())
 
 
 if __name__ == "__main__":
@@ -108,4 +621,34 @@ if __name__ == "__main__":
 
     stats = analyzer.get_statistics()
     print(f"\nTotal incidents: {stats['total_incidents']}")
-    print(f"Total actions: {stats['total_actions']}")
\ No newline at end of file
+    print(f"Total actions: {stats['total_actions']}")
+
+    # In-place edits and deletes must give the same answers as a rebuild
+    # over the edited data with the same vocabulary
+    from data_loader import build_search_text
+
+    edit = df.iloc[[10]].copy()
+    edit["risk_level"] = "Low"
+    edit["title"] = "Chemical vapour leak from a flange during pump changeout"
+    edit["location"] = df["location"].iloc[50]
+    edit["search_text"] = edit.apply(build_search_text, axis=1)
+    deleted = df["case_id"].iloc[[3, 77]].tolist()
+    patched = analyzer.with_edits(updates=edit).with_edits(deleted=deleted)
+
+    expected = df.copy()
+    expected.iloc[10] = edit.iloc[0]
+    expected = expected.drop(index=[3, 77]).drop(columns=["topic"], errors="ignore").reset_index(drop=True)
+    rebuilt = IncidentAnalyzer.from_index(
+        expected,
+        analyzer.vectorizer.vocabulary_,
+        analyzer.vectorizer.idf_,
+        analyzer.vectorizer.transform(expected["search_text"].fillna("").astype(str).tolist()),
+    )
+    same = all(
+        [(r["case_id"], round(r["similarity"], 9)) for r in patched.find_similar(q, top_n=8)]
+        == [(r["case_id"], round(r["similarity"], 9)) for r in rebuilt.find_similar(q, top_n=8)]
+        for q in ["pressure release during maintenance", "chemical vapour leak", "fall from height"]
+    )
+    patched_stats, rebuilt_stats = patched.get_statistics(), rebuilt.get_statistics()
+    same_stats = all(patched_stats[k] == rebuilt_stats[k] for k in rebuilt_stats if k != "by_topic")
+    print(f"\nEdit + delete in place matches a rebuild: search {same}, statistics {same_stats}")
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+Intent Classifier Module
+Lightweight trained intent model backing tools.detect_intent.
+
+A logistic regression over word and character n-gram TF-IDF features is
+trained on the labelled examples in intent_examples.csv and persisted with
+joblib. When the saved model is loaded at startup, detect_intent uses it
+for confident predictions and falls back to the keyword matcher otherwise.
+
+Run this module to evaluate routing accuracy / latency and save the model:
+    python intent_classifier.py
+"""
+
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from config import INTENT_MODEL_PATH, INTENT_EXAMPLES_CSV
+from tools import match_intent, set_intent_model, detect_intent
+
+
+class IntentClassifier:
+    def __init__(self):
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline, make_union
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.pipeline = make_pipeline(
+            make_union(
+                TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+                TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), sublinear_tf=True),
+            ),
+            LogisticRegression(C=10.0, max_iter=1000),
+        )
+        self._compiled = None
+
+    def fit(self, texts, labels):
+        self.pipeline.fit(list(texts), list(labels))
+        self._compiled = None
+        return self
+
+    def _compile(self):
+        """
+        Flatten the fitted pipeline into plain lookups so a single message can
+        be scored without sklearn's per-call validation overhead:
+        (analyzer, vocabulary, idf, dense weight rows) per vectorizer + intercept.
+        """
+        union, clf = self.pipeline.steps[0][1], self.pipeline.steps[-1][1]
+        weights = clf.coef_.T
+        if weights.shape[1] == 1:
+            # Binary problems store one coefficient column
+            weights = np.hstack([-weights, weights])
+        intercept = clf.intercept_ if len(clf.intercept_) > 1 else np.array([-clf.intercept_[0], clf.intercept_[0]])
+
+        parts, offset = [], 0
+        for _, vec in union.transformer_list:
+            size = len(vec.vocabulary_)
+            parts.append((vec.build_analyzer(), vec.vocabulary_, vec.idf_, weights[offset: offset + size]))
+            offset += size
+        self._compiled = (parts, intercept, clf.classes_)
+
+    def predict_one(self, text):
+        """Return (intent, probability) for a single message."""
+        if self._compiled is None:
+            self._compile()
+        parts, intercept, classes = self._compiled
+
+        logits = intercept.copy()
+        for analyzer, vocabulary, idf, weights in parts:
+            counts = Counter(vocabulary[t] for t in analyzer(text) if t in vocabulary)
+            if not counts:
+                continue
+            cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+            values = tf * idf[cols]
+            values /= np.sqrt(values @ values)
+            logits += values @ weights[cols]
+
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        best = probs.argmax()
+        return classes[best], float(probs[best])
+
+    def __getstate__(self):
+        # The compiled lookups hold analyzer closures; rebuild them after loading
+        state = self.__dict__.copy()
+        state["_compiled"] = None
+        return state
+
+    def save(self, path=INTENT_MODEL_PATH):
+        import joblib
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path=INTENT_MODEL_PATH):
+        import joblib
+
+        return joblib.load(path)
+
+
+def load_intent_model(path=INTENT_MODEL_PATH):
+    """
+    Load the persisted classifier (if one has been trained) and install it
+    for detect_intent. Returns True when a model was loaded.
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        set_intent_model(IntentClassifier.load(path))
+        return True
+    except Exception as e:
+        print(f"Error loading intent model: {e}")
+        return False
+
+
+def load_examples(path=INTENT_EXAMPLES_CSV):
+    """Load the labelled (text, intent) examples."""
+    return pd.read_csv(path)
+
+
+def _latency_us(func, texts, repeats=5):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for t in texts:
+            func(t)
+    return (time.perf_counter() - start) / (repeats * len(texts)) * 1e6
+
+
+def evaluate(examples=None, test_size=0.3, random_state=42):
+    """
+    Train on a stratified split of the labelled examples and report routing
+    accuracy and mean per-call latency for the keyword matcher, the model,
+    and detect_intent with the model installed.
+    """
+    from sklearn.model_selection import train_test_split
+
+    if examples is None:
+        examples = load_examples()
+    train, test = train_test_split(
+        examples, test_size=test_size, stratify=examples["intent"], random_state=random_state
+    )
+    model = IntentClassifier().fit(train["text"], train["intent"])
+    texts, labels = test["text"].tolist(), test["intent"].tolist()
+
+    def accuracy(func):
+        return sum(func(t) == y for t, y in zip(texts, labels)) / len(labels)
+
+    previous = set_intent_model(model)
+    report = {
+        "keywords": (accuracy(match_intent), _latency_us(match_intent, texts)),
+        "model": (
+            accuracy(lambda t: model.predict_one(t)[0]),
+            _latency_us(model.predict_one, texts),
+        ),
+        "detect_intent": (accuracy(detect_intent), _latency_us(detect_intent, texts)),
+    }
+    set_intent_model(previous)
+    return report, len(train), len(test)
+
+
+if __name__ == "__main__":
+    report, n_train, n_test = evaluate()
+    print(f"Trained on {n_train} examples, evaluated on {n_test}:")
+    for name, (acc, latency) in report.items():
+        print(f"  {name:<14} accuracy {acc:6.1%}   {latency:8.1f} µs/call")
+
+    # Retrain on every example and persist for startup loading. The class is
+    # taken from the importable module so the pickle does not refer to __main__
+    from intent_classifier import IntentClassifier as PersistedClassifier
+
+    examples = load_examples()
+    PersistedClassifier().fit(examples["text"], examples["intent"]).save()
+    print(f"Saved intent model to {INTENT_MODEL_PATH}")
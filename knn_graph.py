@@ -0,0 +1,194 @@
+"""
+KNN Graph Module
+Precomputed incident-to-incident nearest-neighbour graph.
+
+Each incident keeps its k most similar incidents (TF-IDF cosine) in two
+fixed-width arrays, indices and scores (n x k, padded with -1), so a
+"related incidents" lookup is a single O(k) row read. The graph is built
+in row blocks so only block_size x n similarities exist at once, and new
+incidents are inserted incrementally: their own rows are computed and
+existing rows only change where a new incident beats their k-th neighbour.
+Edited and deleted incidents are re-linked the same way, and only the rows
+that pointed at them are recomputed in full.
+"""
+
+import numpy as np
+
+from config import KNN_K, KNN_BLOCK_SIZE, KNN_MIN_SIMILARITY
+
+
+class KnnGraph:
+    def __init__(self, k=KNN_K, min_similarity=KNN_MIN_SIMILARITY, indices=None, scores=None):
+        """
+        :param k: Neighbours kept per incident
+        :param min_similarity: Weaker links are not stored
+        :param indices / scores: Existing (n x k) arrays, e.g. memory-mapped from a shared index
+        """
+        self.k = k
+        self.min_similarity = min_similarity
+        self.indices = np.full((0, k), -1, dtype=np.int32) if indices is None else indices
+        self.scores = np.full((0, k), -1.0, dtype=np.float32) if scores is None else scores
+
+    def __len__(self):
+        return self.indices.shape[0]
+
+    @classmethod
+    def build(cls, matrix, k=KNN_K, block_size=KNN_BLOCK_SIZE, min_similarity=KNN_MIN_SIMILARITY):
+        """Build the graph over the rows of an L2-normalised sparse matrix."""
+        graph = cls(k, min_similarity)
+        n = matrix.shape[0]
+        graph.indices = np.full((n, k), -1, dtype=np.int32)
+        graph.scores = np.full((n, k), -1.0, dtype=np.float32)
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            sims = (matrix[start:stop] @ matrix.T).toarray().astype(np.float32)
+            # An incident is not its own neighbour
+            sims[np.arange(stop - start), np.arange(start, stop)] = -1.0
+            candidates = np.broadcast_to(np.arange(n, dtype=np.int32), sims.shape)
+            graph.indices[start:stop], graph.scores[start:stop] = graph._top_k(candidates, sims)
+        return graph
+
+    def _top_k(self, candidates, sims):
+        """Per row, the k best (candidate, score) pairs above min_similarity, best first."""
+        k = min(self.k, sims.shape[1])
+        if k == 0:
+            rows = sims.shape[0]
+            return np.full((rows, self.k), -1, dtype=np.int32), np.full((rows, self.k), -1.0, dtype=np.float32)
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_scores, axis=1, kind="stable")
+        best = np.take_along_axis(part, order, axis=1)
+        scores = np.take_along_axis(part_scores, order, axis=1)
+        indices = np.take_along_axis(candidates, best, axis=1).astype(np.int32)
+
+        weak = scores < self.min_similarity
+        indices[weak] = -1
+        scores[weak] = -1.0
+        if k < self.k:
+            pad = self.k - k
+            indices = np.pad(indices, ((0, 0), (0, pad)), constant_values=-1)
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-1.0)
+        return indices, scores.astype(np.float32)
+
+    def add(self, matrix):
+        """
+        Insert the rows of matrix beyond the current graph size.
+        :param matrix: The full (old + new rows) L2-normalised sparse matrix
+        """
+        old, n = len(self), matrix.shape[0]
+        if n <= old:
+            return
+        sims = (matrix[old:] @ matrix.T).toarray().astype(np.float32)
+        sims[np.arange(n - old), np.arange(old, n)] = -1.0
+
+        candidates = np.broadcast_to(np.arange(n, dtype=np.int32), sims.shape)
+        new_indices, new_scores = self._top_k(candidates, sims)
+
+        # Existing rows whose weakest link is beaten by one of the new incidents
+        indices, scores = np.array(self.indices), np.array(self.scores)
+        incoming = sims[:, :old].T
+        touched = np.flatnonzero((incoming > scores[:, -1:]).any(axis=1) & (incoming.max(axis=1) >= self.min_similarity))
+        if len(touched):
+            merged_candidates = np.hstack(
+                [indices[touched], np.broadcast_to(np.arange(old, n, dtype=np.int32), (len(touched), n - old))]
+            )
+            merged_scores = np.hstack([scores[touched], incoming[touched]])
+            indices[touched], scores[touched] = self._top_k(merged_candidates, merged_scores)
+
+        self.indices = np.vstack([indices, new_indices])
+        self.scores = np.vstack([scores, new_scores])
+
+    def update(self, matrix, rows, live=None):
+        """
+        Re-link incidents whose vectors changed or that were deleted.
+        :param matrix: The full L2-normalised sparse matrix (changed rows already replaced)
+        :param rows: Row positions that changed
+        :param live: Optional boolean mask of rows that may be linked (False for deleted incidents)
+        """
+        n = matrix.shape[0]
+        rows = np.asarray(rows, dtype=np.int64)
+        live = np.ones(n, dtype=bool) if live is None else live
+        indices, scores = np.array(self.indices), np.array(self.scores)
+
+        # Deleted incidents lose their links
+        dead = rows[~live[rows]]
+        indices[dead], scores[dead] = -1, -1.0
+
+        # A row that linked to a changed incident may now have a different k-th
+        # neighbour, so it is recomputed in full along with the changed rows
+        stale = np.isin(indices, rows).any(axis=1)
+        stale[rows] = True
+        recompute = np.flatnonzero(stale & live)
+        if len(recompute):
+            sims = (matrix[recompute] @ matrix.T).toarray().astype(np.float32)
+            sims[:, ~live] = -1.0
+            sims[np.arange(len(recompute)), recompute] = -1.0
+            candidates = np.broadcast_to(np.arange(n, dtype=np.int32), sims.shape)
+            indices[recompute], scores[recompute] = self._top_k(candidates, sims)
+
+        # Any other row gains a changed incident that beats its weakest link
+        changed = rows[live[rows]]
+        if len(changed):
+            incoming = (matrix[changed] @ matrix.T).toarray().astype(np.float32).T
+            incoming[changed, np.arange(len(changed))] = -1.0
+            incoming[~live] = -1.0
+            incoming[recompute] = -1.0
+            touched = np.flatnonzero(
+                (incoming > scores[:, -1:]).any(axis=1) & (incoming.max(axis=1) >= self.min_similarity)
+            )
+            if len(touched):
+                merged_candidates = np.hstack(
+                    [indices[touched], np.broadcast_to(changed.astype(np.int32), (len(touched), len(changed)))]
+                )
+                merged_scores = np.hstack([scores[touched], incoming[touched]])
+                indices[touched], scores[touched] = self._top_k(merged_candidates, merged_scores)
+
+        self.indices, self.scores = indices, scores
+
+    def compact(self, keep):
+        """Drop the rows not in the boolean mask keep and renumber the links."""
+        positions = np.full(len(keep), -1, dtype=np.int32)
+        positions[keep] = np.arange(int(keep.sum()), dtype=np.int32)
+        indices, scores = self.indices[keep], np.array(self.scores[keep])
+        indices = np.where(indices >= 0, positions[np.maximum(indices, 0)], -1).astype(np.int32)
+        scores[indices < 0] = -1.0
+        self.indices, self.scores = indices, scores
+
+    def neighbors(self, row):
+        """(row, score) pairs of an incident's neighbours, most similar first."""
+        indices, scores = self.indices[row], self.scores[row]
+        keep = indices >= 0
+        return list(zip(indices[keep].tolist(), scores[keep].tolist()))
+
+
+if __name__ == "__main__":
+    import time
+    from data_loader import prepare_dataset
+    from incident_analyzer import IncidentAnalyzer
+
+    analyzer = IncidentAnalyzer(prepare_dataset())
+    matrix = analyzer.tfidf_matrix[: len(analyzer.data)]
+
+    start = time.perf_counter()
+    graph = KnnGraph.build(matrix)
+    print(f"Built {graph.k}-NN graph over {len(graph)} incidents in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    # Incremental insert of the last 10 incidents must match a full build
+    partial = KnnGraph.build(matrix[:-10])
+    partial.add(matrix)
+    print(f"Incremental insert matches full build: {np.array_equal(partial.indices, graph.indices)}")
+
+    # Deleting an incident in place must match a build without it (up to the order of ties)
+    live = np.ones(len(graph), dtype=bool)
+    live[5] = False
+    edited = KnnGraph.build(matrix)
+    edited.update(matrix, [5], live)
+    edited.compact(live)
+    print(f"In-place delete matches full build: {np.allclose(edited.scores, KnnGraph.build(matrix[live]).scores)}")
+
+    case_ids = analyzer.data["case_id"].tolist()
+    start = time.perf_counter()
+    neighbors = graph.neighbors(0)
+    print(f"Related to {case_ids[0]} ({(time.perf_counter() - start) * 1e6:.1f} µs):")
+    for row, score in neighbors:
+        print(f"  {score:.2f}  {case_ids[row]}: {analyzer.data['title'].iloc[row]}")
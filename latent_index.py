@@ -0,0 +1,141 @@
+"""
+Latent Index Module
+Latent semantic (LSA) view of the incident TF-IDF matrix.
+
+A truncated SVD projects the sparse TF-IDF rows into LSA_DIMENSIONS dense
+float32 dimensions, where terms that co-occur across incidents ("vapour
+release", "gas leak") end up close together. Incident vectors are stored
+L2-normalised, so scoring a query is one sparse-dense projection followed
+by a single matrix-vector product over a compact contiguous matrix. New
+and edited incidents are folded in with the fitted projection, without
+refitting.
+
+Fitted indexes are persisted under MODEL_DIR keyed to the TF-IDF matrix
+they were fitted on (latent_index-<version>.joblib), so a restart or a
+rebuild over unchanged data loads the projection instead of refitting it.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from config import LSA_DIMENSIONS, MODEL_DIR
+from model_store import save_versioned
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class LatentIndex:
+    def __init__(self, components, vectors):
+        """
+        :param components: (terms x d) float32 projection from TF-IDF space
+        :param vectors: (incidents x d) float32 L2-normalised incident vectors
+        """
+        self.components = components
+        self.vectors = vectors
+
+    @property
+    def dimensions(self):
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, matrix, dimensions=LSA_DIMENSIONS, seed=42):
+        """Truncated SVD of an incident TF-IDF matrix."""
+        from sklearn.decomposition import TruncatedSVD
+
+        # At most a quarter of the incident count: a near full-rank SVD of a
+        # small corpus only reproduces the lexical scores
+        d = max(1, min(dimensions, matrix.shape[0] // 4, matrix.shape[1] - 1))
+        svd = TruncatedSVD(n_components=d, algorithm="randomized", random_state=seed)
+        svd.fit(matrix)
+        components = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        return cls(components, cls._project(matrix, components))
+
+    @staticmethod
+    def _project(matrix, components):
+        return np.ascontiguousarray(_normalize(np.asarray(matrix @ components, dtype=np.float32)))
+
+    def project(self, matrix):
+        """L2-normalised latent vectors for rows of a TF-IDF matrix."""
+        return self._project(matrix, self.components)
+
+    def score(self, query_vec, rows=None):
+        """
+        Cosine similarity in latent space of a TF-IDF query vector against
+        every incident (or the given rows), clipped at 0.
+        """
+        query = self.project(query_vec)[0]
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        return np.maximum(vectors @ query, 0.0)
+
+    def add(self, matrix):
+        """Fold new TF-IDF rows into the index with the fitted projection."""
+        self.vectors = np.vstack([self.vectors, self.project(matrix)])
+
+    def replace(self, rows, matrix):
+        """Re-project edited incidents from their new TF-IDF rows."""
+        vectors = np.array(self.vectors)
+        vectors[rows] = self.project(matrix)
+        self.vectors = vectors
+
+    def compact(self, keep):
+        """Drop the incidents not in the boolean mask keep."""
+        self.vectors = np.ascontiguousarray(self.vectors[keep])
+
+
+def matrix_version(matrix, dimensions=LSA_DIMENSIONS):
+    """Short hash of a CSR TF-IDF matrix and the dimensions asked for."""
+    digest = hashlib.sha1(f"{matrix.shape}:{dimensions}".encode("utf-8"))
+    for array in (matrix.indptr, matrix.indices, matrix.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:12]
+
+
+def load_or_fit(matrix, dimensions=LSA_DIMENSIONS):
+    """Load the persisted index for this TF-IDF matrix, or fit and save it."""
+    import joblib
+
+    path = os.path.join(MODEL_DIR, f"latent_index-{matrix_version(matrix, dimensions)}.joblib")
+    if os.path.exists(path):
+        try:
+            return joblib.load(path)
+        except Exception as e:
+            print(f"Error loading latent index: {e}")
+
+    latent = LatentIndex.fit(matrix, dimensions)
+    try:
+        save_versioned(latent, path)
+    except OSError as e:
+        print(f"Error saving latent index: {e}")
+    return latent
+
+
+if __name__ == "__main__":
+    import time
+    from data_loader import prepare_dataset
+    from incident_analyzer import IncidentAnalyzer
+
+    analyzer = IncidentAnalyzer(prepare_dataset())
+    matrix = analyzer.tfidf_matrix[: len(analyzer.data)]
+
+    start = time.perf_counter()
+    latent = LatentIndex.fit(matrix)
+    print(
+        f"Fitted {latent.dimensions}-dimension LSA over {matrix.shape[0]} incidents in "
+        f"{time.perf_counter() - start:.2f}s ({latent.vectors.nbytes / 1024:.0f} KiB of vectors)"
+    )
+
+    query = "gas leak"
+    query_vec = analyzer.vectorizer.transform([query])
+    lexical = (matrix @ query_vec.T).toarray().ravel()
+    start = time.perf_counter()
+    dense = latent.score(query_vec)
+    print(f"Scored '{query}' in {(time.perf_counter() - start) * 1e6:.0f} µs")
+    for name, scores in [("lexical", lexical), ("latent", dense)]:
+        print(f"Top {name} matches:")
+        for row in np.argsort(-scores)[:5]:
+            print(f"  {scores[row]:.2f}  {analyzer.data['case_id'].iloc[row]}: {analyzer.data['title'].iloc[row]}")
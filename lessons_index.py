@@ -0,0 +1,181 @@
+"""
+Lessons Index Module
+Sentence-level index over lessons_to_prevent and what_went_well.
+
+Each incident's lesson and good-practice paragraphs are split into
+sentences and indexed on their own (TF-IDF), with a back-reference to the
+incident row. Training queries then return the few sentences that actually
+match instead of whole paragraphs. A sentence's score is blended with its
+incident's similarity so short, generic sentences from unrelated incidents
+do not outrank ones from the incidents the query is about; only sentences
+sharing terms with the query are returned.
+
+Like the action index, it is persisted under MODEL_DIR keyed to the data.
+"""
+
+import hashlib
+import os
+import re
+
+import numpy as np
+
+from config import MODEL_DIR, LESSON_FIELDS, LESSON_CONTEXT_WEIGHT
+from model_store import save_versioned
+
+# Split after ., ! or ? when the next sentence starts with a capital, digit or quote
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"“(])")
+# Line breaks, bullet markers and semicolons also end a lesson point
+_BREAK_RE = re.compile(r"\s*(?:\n+|;)\s*|\s+(?=[•▪●◦]\s)")
+_BULLET_RE = re.compile(r"^(?:[•▪●◦*-]|\d+[.)])\s+")
+# Bullet lists that lost their line breaks: a lower-case word followed by a
+# capitalised one. Only used to break up over-long sentences, since the same
+# pattern also occurs before proper nouns.
+_RUN_ON_RE = re.compile(r"(?<=[a-z0-9,)])\s+(?=[A-Z][a-z])")
+_MIN_SENTENCE_CHARS = 12
+_MAX_SENTENCE_CHARS = 240
+# Mixed into lessons_version so indexes built by an older splitter are not reused
+_SPLITTER_VERSION = "2"
+
+
+def _shorten(sentence):
+    """Break an over-long sentence at run-on boundaries, then trim what is left."""
+    if len(sentence) <= _MAX_SENTENCE_CHARS:
+        return [sentence]
+    parts = []
+    for part in _RUN_ON_RE.split(sentence):
+        if len(part) > _MAX_SENTENCE_CHARS:
+            part = part[:_MAX_SENTENCE_CHARS].rsplit(" ", 1)[0].rstrip(" ,;:") + "…"
+        parts.append(part)
+    return parts
+
+
+def split_sentences(text):
+    """Split a paragraph into trimmed sentences, dropping fragments."""
+    if text is None:
+        return []
+    text = str(text).strip()
+    if not text or text.lower() == "nan":
+        return []
+    sentences = []
+    for chunk in _BREAK_RE.split(text):
+        for sentence in _SENTENCE_RE.split(chunk):
+            for part in _shorten(_BULLET_RE.sub("", sentence.strip())):
+                if len(part) >= _MIN_SENTENCE_CHARS:
+                    sentences.append(part)
+    return sentences
+
+
+def lessons_version(data):
+    """Short hash of the splitter, case ids and lesson texts the index is built from."""
+    digest = hashlib.sha1(_SPLITTER_VERSION.encode("utf-8"))
+    cols = ["case_id"] + [f for f in LESSON_FIELDS if f in data.columns]
+    for row in data[cols].fillna("").astype(str).itertuples(index=False):
+        digest.update("\x1f".join(row).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()[:12]
+
+
+class LessonIndex:
+    def __init__(self, data):
+        """
+        Build the sentence index from prepared incident data.
+        :param data: DataFrame with 'case_id', 'title' and the LESSON_FIELDS
+            columns (rows aligned with the analyzer)
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.version = lessons_version(data)
+        self.sentences = []
+        rows, kinds = [], []
+        for field in LESSON_FIELDS:
+            if field not in data.columns:
+                continue
+            for row, text in enumerate(data[field]):
+                for sentence in split_sentences(text):
+                    self.sentences.append(sentence)
+                    rows.append(row)
+                    kinds.append(field)
+
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.kinds = np.asarray(kinds, dtype=object)
+        self.vectorizer = None
+        self.matrix = None
+        if self.sentences:
+            self.vectorizer = TfidfVectorizer(stop_words="english", ngram_range=(1, 2), sublinear_tf=True)
+            self.matrix = self.vectorizer.fit_transform(self.sentences)
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def search(self, query, field, incident_scores=None, top_n=5):
+        """
+        Top matching sentences of one field for a query.
+
+        :param field: 'lessons_to_prevent' or 'what_went_well'
+        :param incident_scores: Optional per-incident similarity used as context
+        :return: List of (sentence position, score), identical sentences collapsed
+        """
+        if self.matrix is None or not query or not query.strip():
+            return []
+        lexical = (self.matrix @ self.vectorizer.transform([query]).T).toarray().ravel()
+        scores = lexical
+        if incident_scores is not None:
+            context = np.asarray(incident_scores, dtype=np.float64)[self.rows]
+            scores = (1 - LESSON_CONTEXT_WEIGHT) * lexical + LESSON_CONTEXT_WEIGHT * context
+
+        # The incident context only re-ranks: a sentence must match the query itself
+        candidates = np.flatnonzero((lexical > 0) & (self.kinds == field))
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        hits, seen = [], set()
+        for pos in order:
+            key = self.sentences[pos].lower().rstrip(".")
+            if key in seen:
+                continue
+            seen.add(key)
+            hits.append((int(pos), float(scores[pos])))
+            if len(hits) >= top_n:
+                break
+        return hits
+
+    @property
+    def path(self):
+        return os.path.join(MODEL_DIR, f"lesson_index-{self.version}.joblib")
+
+
+def load_or_build(data):
+    """Load the persisted index for this lesson data, or build and save it."""
+    import joblib
+
+    path = os.path.join(MODEL_DIR, f"lesson_index-{lessons_version(data)}.joblib")
+    if os.path.exists(path):
+        try:
+            return joblib.load(path)
+        except Exception as e:
+            print(f"Error loading lesson index: {e}")
+
+    index = LessonIndex(data)
+    try:
+        save_versioned(index, path)
+    except OSError as e:
+        print(f"Error saving lesson index: {e}")
+    return index
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from data_loader import prepare_dataset
+
+    df = prepare_dataset()
+    start = time.perf_counter()
+    index = LessonIndex(df)
+    print(f"Indexed {len(index)} sentences from {len(df)} incidents in {time.perf_counter() - start:.2f}s")
+
+    for pos, score in index.search("confined space entry gas testing", "lessons_to_prevent"):
+        print(f"  {score:.2f}  {df['case_id'].iloc[index.rows[pos]]}: {index.sentences[pos]}")
+
+    longest = max((len(s) for s in index.sentences), default=0)
+    bullets = split_sentences("Check permits.\n- Verify isolation; log every change\n2. Brief the crew")
+    ok = longest <= _MAX_SENTENCE_CHARS + 1 and bullets == ["Check permits.", "Verify isolation", "log every change", "Brief the crew"]
+    print(f"{'ok ' if ok else 'BAD'} longest sentence {longest} chars, bullets split into {bullets}")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,408 @@
+"""
+Load Test
+Concurrent load generator for the advisor: how many simultaneous sessions
+one instance sustains before tail latency degrades.
+
+Each scenario runs a concurrency level as that many closed-loop sessions
+(one ConversationContext each). Every session sends chat messages drawn
+from an intent mix, with queries built from reports.csv titles, and a
+configurable share of writes (save_new_incident followed by the
+incremental reload the app does after a submission). LLM synthesis is
+served by a local stand-in with configurable latency, so Gemini is never
+called. Writes go to scratch copies of the CSVs and of MODEL_DIR, so
+neither the real files nor the cached indexes for the real data are
+touched.
+
+Reported per scenario: throughput, p50/p90/p99 latency for reads and
+writes, error rate and peak RSS (sampled from /proc, or the process peak
+where /proc is unavailable).
+
+With --api the same traffic is sent to a running api_server instead
+(POST /respond, POST /incidents); pass --server-pid to sample its RSS.
+
+Usage:
+    python load_test.py --concurrency 1,4,16 --requests 200
+    python load_test.py --write-ratio 0.05 --llm-latency 0.8 --mix recommend=3,search=1,stats=1
+    python load_test.py --api http://localhost:8000 --server-pid 12345 --json results.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Modules that import MODEL_DIR by name; LocalTarget points them at a scratch copy
+_MODEL_DIR_MODULES = ("action_index", "lessons_index", "topic_model", "model_trainer", "latent_index")
+
+from config import REPORTS_CSV
+
+DEFAULT_MIX = "recommend=4,search=2,training=2,stats=1,actions=1,related=1,trending=1,followup=2"
+
+TEMPLATES = {
+    "recommend": ["{title} — what should we do?", "We had an incident: {title}. Recommendations?"],
+    "search": ["Show me incidents involving {title}", "Find incidents like {title}"],
+    "training": ["What training would prevent {title}?", "Lessons learned from {title}"],
+    "stats": ["Give me an overview of incident statistics", "How many incidents like {title}?"],
+    "actions": ["Actions about {title}", "Action items with verification for {title}"],
+    "related": ["Incidents related to {case_id}"],
+    "trending": ["What's trending?", "Which hazards are on the rise?"],
+    "followup": ["what training for that?", "what should we do about it?", "show me more like that"],
+}
+
+
+# ──────────────────────────────────────────────
+# Local LLM stand-in
+# ──────────────────────────────────────────────
+class _Reply:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Stands in for the Gemini model: sleeps for a jittered latency, returns canned text."""
+
+    def __init__(self, latency=0.5, jitter=0.3, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        with self._lock:
+            return max(0.0, self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+    def generate_content(self, prompt):
+        time.sleep(self._delay())
+        return _Reply(f"Summary of {len(prompt)} characters of context.")
+
+    async def generate_content_async(self, prompt):
+        import asyncio
+
+        await asyncio.sleep(self._delay())
+        return _Reply(f"Summary of {len(prompt)} characters of context.")
+
+
+# ──────────────────────────────────────────────
+# Workload
+# ──────────────────────────────────────────────
+def parse_mix(text):
+    """'recommend=4,search=2' -> ({intent: probability})."""
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in TEMPLATES:
+            raise ValueError(f"Unknown intent in mix: {name} (choose from {', '.join(TEMPLATES)})")
+        weights[name] = float(weight or 1)
+    total = sum(weights.values())
+    return {name: w / total for name, w in weights.items()}
+
+
+class Workload:
+    def __init__(self, mix, write_ratio, seed=0):
+        reports = pd.read_csv(REPORTS_CSV, encoding="utf-8", encoding_errors="replace")
+        self.titles = reports["title"].dropna().astype(str).tolist()
+        self.case_ids = reports["case_id"].dropna().astype(str).tolist()
+        self.intents = list(mix)
+        self.weights = list(mix.values())
+        self.write_ratio = write_ratio
+        self.seed = seed
+
+    def session(self, number):
+        """Independent random stream for one simulated session."""
+        return random.Random(self.seed * 100003 + number)
+
+    def next_operation(self, rng):
+        """('write', report, actions) or ('read', message)."""
+        title = rng.choice(self.titles)
+        if rng.random() < self.write_ratio:
+            report = {
+                "title": f"Load test: {title}",
+                "what_happened": f"Simulated report similar to '{title}'.",
+                "category": "Safety",
+                "risk_level": rng.choice(["High", "Medium", "Low"]),
+                "location": "Load Test",
+            }
+            return "write", report, [{"action": "Review the simulated report", "owner": "Load Test"}]
+        intent = rng.choices(self.intents, self.weights)[0]
+        message = rng.choice(TEMPLATES[intent]).format(title=title, case_id=rng.choice(self.case_ids))
+        return "read", message
+
+
+# ──────────────────────────────────────────────
+# Targets
+# ──────────────────────────────────────────────
+class LocalTarget:
+    """
+    Drives ChatbotAgent.respond in-process. Writes go to scratch copies of
+    the CSVs and are applied with the same incremental reload as the app.
+    Indexes saved for the synthetic data go to a scratch copy of MODEL_DIR.
+    """
+
+    def __init__(self, llm_latency):
+        import importlib
+        import data_writer
+        from chatbot_agent import ChatbotAgent
+        from config import MODEL_DIR
+        from data_watcher import DataWatcher
+
+        self._scratch = tempfile.mkdtemp(prefix="load-test-")
+        # Start from the real cached indexes so startup does not rebuild them
+        models = os.path.join(self._scratch, "models")
+        if os.path.isdir(MODEL_DIR):
+            shutil.copytree(MODEL_DIR, models)
+        self._model_modules = [importlib.import_module(name) for name in _MODEL_DIR_MODULES]
+        for module in self._model_modules:
+            module.MODEL_DIR = models
+
+        reports = os.path.join(self._scratch, "reports.csv")
+        actions = os.path.join(self._scratch, "actions.csv")
+        shutil.copy(data_writer.REPORTS_CSV, reports)
+        shutil.copy(data_writer.ACTIONS_CSV, actions)
+        self._data_writer = data_writer
+        self._original_paths = (data_writer.REPORTS_CSV, data_writer.ACTIONS_CSV)
+        data_writer.REPORTS_CSV, data_writer.ACTIONS_CSV = reports, actions
+
+        self._make_agent = ChatbotAgent
+        self._model = StubModel(llm_latency)
+        self.watcher = DataWatcher(reports, actions)
+        self.agent = self._agent_for(self.watcher.build())
+
+    def _agent_for(self, analyzer):
+        agent = self._make_agent(analyzer)
+        agent.model = self._model
+        agent.gemini_enabled = True
+        return agent
+
+    def new_session(self):
+        from conversation import ConversationContext
+
+        return ConversationContext()
+
+    def read(self, message, session):
+        # One agent reference per request, as the app does per rerun
+        self.agent.respond(message, session=session)
+
+    def write(self, report, actions):
+        success, result = self._data_writer.save_new_incident(report, actions)
+        if not success:
+            raise RuntimeError(result)
+        if self.watcher.refresh(settle=0):
+            self.agent = self._agent_for(self.watcher.analyzer)
+
+    def close(self):
+        self._data_writer.REPORTS_CSV, self._data_writer.ACTIONS_CSV = self._original_paths
+        from config import MODEL_DIR
+
+        for module in self._model_modules:
+            module.MODEL_DIR = MODEL_DIR
+        shutil.rmtree(self._scratch, ignore_errors=True)
+
+
+class ApiTarget:
+    """Sends the same traffic to a running api_server over HTTP."""
+
+    def __init__(self, base_url, timeout=60.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._sessions = 0
+        self._lock = threading.Lock()
+
+    def _post(self, path, body):
+        from urllib.request import Request, urlopen
+
+        request = Request(
+            self.base_url + path,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def new_session(self):
+        with self._lock:
+            self._sessions += 1
+            return f"load-test-{os.getpid()}-{self._sessions}"
+
+    def read(self, message, session):
+        self._post("/respond", {"message": message, "session_id": session})
+
+    def write(self, report, actions):
+        self._post("/incidents", {"report": report, "actions": actions})
+
+    def close(self):
+        pass
+
+
+# ──────────────────────────────────────────────
+# Measurement
+# ──────────────────────────────────────────────
+class RssSampler:
+    """Peak resident set size of a process, sampled in a background thread."""
+
+    def __init__(self, pid=None, interval=0.05):
+        self.path = f"/proc/{pid or 'self'}/status"
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="ascii") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+        return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self._read()
+            if rss is not None:
+                self.peak = max(self.peak, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self._read() is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            # No /proc: fall back to this process's lifetime peak (KiB on Linux)
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return {"p50": None, "p90": None, "p99": None}
+    p50, p90, p99 = np.percentile(np.asarray(latencies) * 1e3, [50, 90, 99])
+    return {"p50": round(p50, 1), "p90": round(p90, 1), "p99": round(p99, 1)}
+
+
+def run_scenario(target, workload, concurrency, requests, server_pid=None):
+    """Run `requests` operations over `concurrency` sessions; returns the scenario's metrics."""
+    lock = threading.Lock()
+    issued = [0]
+    latencies = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+
+    def session_loop(number):
+        rng = workload.session(number)
+        session = target.new_session()
+        while True:
+            with lock:
+                if issued[0] >= requests:
+                    return
+                issued[0] += 1
+            operation = workload.next_operation(rng)
+            kind = operation[0]
+            start = time.perf_counter()
+            try:
+                if kind == "write":
+                    target.write(operation[1], operation[2])
+                else:
+                    target.read(operation[1], session)
+                failed = False
+            except Exception as e:
+                print(f"Error during {kind}: {e}", file=sys.stderr)
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[kind].append(elapsed)
+                errors[kind] += failed
+
+    with RssSampler(server_pid) as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as pool:
+            for future in [pool.submit(session_loop, n) for n in range(concurrency)]:
+                future.result()
+        wall = time.perf_counter() - start
+
+    done = len(latencies["read"]) + len(latencies["write"])
+    return {
+        "concurrency": concurrency,
+        "operations": done,
+        "seconds": round(wall, 2),
+        "throughput": round(done / wall, 2) if wall else None,
+        "read_ms": _percentiles(latencies["read"]),
+        "write_ms": _percentiles(latencies["write"]),
+        "reads": len(latencies["read"]),
+        "writes": len(latencies["write"]),
+        "error_rate": round((errors["read"] + errors["write"]) / done, 4) if done else 0.0,
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+    }
+
+
+def _print_table(results, out):
+    header = f"{'conc':>5} {'ops':>6} {'ops/s':>8} {'read p50':>9} {'p90':>8} {'p99':>8} {'write p50':>10} {'p99':>8} {'errors':>7} {'RSS MB':>8}"
+    print(header, file=out)
+    print("-" * len(header), file=out)
+
+    def ms(value):
+        return "-" if value is None else f"{value:.0f}"
+
+    for r in results:
+        print(
+            f"{r['concurrency']:>5} {r['operations']:>6} {r['throughput']:>8.1f} "
+            f"{ms(r['read_ms']['p50']):>9} {ms(r['read_ms']['p90']):>8} {ms(r['read_ms']['p99']):>8} "
+            f"{ms(r['write_ms']['p50']):>10} {ms(r['write_ms']['p99']):>8} "
+            f"{r['error_rate']:>7.1%} {r['peak_rss_mb']:>8.1f}",
+            file=out,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test of the Safety Incident Advisor.")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated session counts, one scenario each")
+    parser.add_argument("--requests", type=int, default=200, help="Operations per scenario")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Intent weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--write-ratio", type=float, default=0.02, help="Share of operations that submit an incident")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per stand-in LLM call (0 = instant)")
+    parser.add_argument("--api", help="Base URL of a running api_server to test instead of the in-process agent")
+    parser.add_argument("--server-pid", type=int, help="With --api, pid of the server to sample RSS from")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated traffic")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    workload = Workload(parse_mix(args.mix), args.write_ratio, args.seed)
+    if args.api:
+        target = ApiTarget(args.api)
+    else:
+        print("Loading the advisor...", file=sys.stderr)
+        target = LocalTarget(args.llm_latency)
+
+    results = []
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            print(f"Running {args.requests} operations with {concurrency} sessions...", file=sys.stderr)
+            results.append(
+                run_scenario(target, workload, concurrency, args.requests, args.server_pid if args.api else None)
+            )
+    finally:
+        target.close()
+
+    _print_table(results, sys.stdout)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,163 @@
-# Main Chatbot Interface
-
-class Chatbot:
-    def __init__(self):
-        self.name = "Chatbot"
-        self.is_running = True
-
-    def greet(self):
-        return f"Hello! I am {self.name}. How can I assist you today?"
-
-    def run(self):
-        print(self.greet())
-        while self.is_running:
-            user_input = input("You: ")
-            self.process_input(user_input)
-
-    def process_input(self, user_input):
-        if user_input.lower() in ["exit", "quit"]:
-            self.is_running = False
-            print("Goodbye!")
-        else:
-            print(f"Bot: You said '{user_input}'")
-
-if __name__ == '__main__':
-    chatbot = Chatbot()
-    chatbot.run()
\ No newline at end of file
+"""
+Batch Triage CLI
+Runs queries through the advisor offline and streams JSONL results.
+
+The analyzer is loaded once; queries are routed with the same intent
+detection and tools as ChatbotAgent.respond and processed in parallel
+batches. Input is one query per line, or JSONL objects with a "query"
+(or "text") field and an optional "id".
+
+Usage:
+    python main.py field_reports.txt > triage.jsonl
+    cat reports.jsonl | python main.py --workers 8 --batch-size 256
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from data_loader import prepare_dataset
+from incident_analyzer import IncidentAnalyzer
+from chatbot_agent import ChatbotAgent
+from tools import to_jsonable
+
+
+def parse_line(line, line_no):
+    """Turn an input line into (id, query); JSON objects may carry their own id."""
+    text = line.strip()
+    if text.startswith("{"):
+        try:
+            obj = json.loads(text)
+            return obj.get("id", line_no), str(obj.get("query") or obj.get("text") or "")
+        except json.JSONDecodeError:
+            pass
+    return line_no, text
+
+
+def read_queries(stream):
+    """Yield (id, query) pairs, skipping blank lines."""
+    for line_no, line in enumerate(stream, 1):
+        qid, query = parse_line(line, line_no)
+        if query:
+            yield qid, query
+
+
+def _summarise(intent, result):
+    """Reduce a tool result to the fields useful for triage."""
+    if intent == "stats":
+        return {"stats": result}
+    if intent == "trending":
+        return {"spikes": result["spikes"] or result["rising"]}
+    if intent == "related" and isinstance(result, dict):
+        return {
+            "case_id": result["case_id"],
+            "matches": [{"case_id": r["case_id"], "score": r["similarity"]} for r in result["related"]],
+        }
+    if intent in ("search", "related"):
+        return {"matches": [{"case_id": r["case_id"], "score": r["similarity"]} for r in result]}
+    if intent == "actions":
+        return {
+            "actions": [
+                {
+                    "action": a["action"],
+                    "owner": a["owner"],
+                    "timing": a["timing"],
+                    "verification": a["verification"],
+                    "from_case": a["case_id"],
+                    "score": a["score"],
+                }
+                for a in result
+            ]
+        }
+    if intent == "training":
+        return {
+            "matches": [
+                {"case_id": l["from_case"], "score": l["similarity"]}
+                for l in result["lessons_to_prevent"]
+            ],
+            "lessons": [l["lesson"] for l in result["lessons_to_prevent"]],
+        }
+    return {
+        "matches": [
+            {"case_id": r["case_id"], "score": r["similarity"]}
+            for r in result["similar_incidents"]
+        ],
+        "actions": [
+            {
+                "action": a["action"],
+                "owner": a["owner"],
+                "timing": a["timing"],
+                "frequency": a.get("frequency", 1),
+                "from_case": a["from_case"],
+            }
+            for a in result["recommended_actions"]
+        ],
+    }
+
+
+def triage(agent, qid, query, include_text=False):
+    """Process one query and return its JSON-ready result."""
+    intent = agent.detect_intent(query)
+    out = {"id": qid, "query": query, "intent": intent}
+    try:
+        if intent == "help":
+            return out
+        query, corrections = agent.correct_query(query, [intent])
+        if corrections:
+            out["corrections"] = dict(corrections)
+        result = agent.retrieve(intent, query)
+        out.update(_summarise(intent, result))
+        if include_text:
+            out["response"] = agent.render(intent, query, result)
+    except Exception as e:
+        out["error"] = str(e)
+    return out
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run(stream, out, workers=4, batch_size=64, include_text=False):
+    """Triage every query in a stream, writing one JSON line per query in input order."""
+    analyzer = IncidentAnalyzer(prepare_dataset())
+    agent = ChatbotAgent(analyzer)
+    # Batch output is structured data only, never LLM synthesis
+    agent.gemini_enabled = False
+
+    count = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in _batches(read_queries(stream), batch_size):
+            for result in pool.map(lambda item: triage(agent, *item, include_text), batch):
+                out.write(json.dumps(to_jsonable(result), ensure_ascii=False) + "\n")
+                count += 1
+            out.flush()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline batch triage of incident reports.")
+    parser.add_argument("input", nargs="?", default="-", help="Query file (default: stdin)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel worker threads")
+    parser.add_argument("--batch-size", type=int, default=64, help="Queries per batch")
+    parser.add_argument("--text", action="store_true", help="Include the rendered markdown response")
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        count = run(sys.stdin, sys.stdout, args.workers, args.batch_size, args.text)
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            count = run(f, sys.stdout, args.workers, args.batch_size, args.text)
+    print(f"Processed {count} queries.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
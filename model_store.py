@@ -0,0 +1,41 @@
+"""
+Model Store Module
+Saving of data-versioned joblib files under MODEL_DIR
+(action_index-<version>.joblib, lesson_index-<version>.joblib, ...).
+
+Files are written to a temporary name and renamed into place, so a
+process or thread loading the same version never reads a half-written
+file. Every incident submission produces a new data version, so only the
+newest MODEL_VERSIONS_KEEP files of each kind are kept.
+"""
+
+import glob
+import os
+import threading
+
+from config import MODEL_VERSIONS_KEEP
+
+
+def save_versioned(obj, path, keep=MODEL_VERSIONS_KEEP):
+    """
+    Atomically write obj to path ('<kind>-<version>.joblib') and prune older
+    versions of the same kind.
+    """
+    import joblib
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+    kind = os.path.basename(path).rsplit("-", 1)[0]
+    versions = sorted(
+        glob.glob(os.path.join(os.path.dirname(path), f"{glob.escape(kind)}-*.joblib")),
+        key=os.path.getmtime,
+    )
+    for old in versions[:-keep]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return path
@@ -1 +1,188 @@
-import pandas as pd\nfrom sklearn.model_selection import train_test_split\nfrom sklearn.ensemble import RandomForestClassifier\nfrom sklearn.metrics import classification_report\n\nclass SafetyIncidentModelTrainer:\n    def __init__(self, data_file):\n        self.data_file = data_file\n        self.model = RandomForestClassifier()\n\n    def load_data(self):\n        # Load the dataset\n        data = pd.read_csv(self.data_file)\n        return data\n\n    def preprocess_data(self, data):\n        # Preprocess the data (dummy implementation)\n        X = data.drop(columns=['target'])  # Features\n        y = data['target']  # Target variable\n        return X, y\n\n    def train(self):\n        data = self.load_data()\n        X, y = self.preprocess_data(data)\n        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)\n        self.model.fit(X_train, y_train)\n        y_pred = self.model.predict(X_test)\n        print(classification_report(y_test, y_pred))\n\nif __name__ == '__main__':\n    trainer = SafetyIncidentModelTrainer(data_file='safety_data.csv')  # Update with your data file\n    trainer.train()
\ No newline at end of file
+"""
+Model Trainer Module
+Learns risk_level, severity and injury_category from incident narratives.
+
+Features are the CLASSIFIER_TEXT_FIELD narrative (what_happened, the text
+a reporter has before filling in anything else) vectorised with the
+analyzer's fitted TF-IDF vocabulary. Training and prediction build them
+the same way through features(). One classifier per target is trained in
+parallel (joblib, MODEL_N_JOBS cores) and the bundle is persisted keyed to
+the data version, so a restart with unchanged data loads instead of retrains.
+Predictions are batched: one transform for all texts, every target at once.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from config import MODEL_DIR, MODEL_N_JOBS, CLASSIFIER_TARGETS, CLASSIFIER_TEXT_FIELD
+from model_store import save_versioned
+
+
+def data_version(data):
+    """Short hash of the incident texts and labels the models are trained on."""
+    # The feature field is part of the version, so models trained on other features are not loaded
+    digest = hashlib.sha1(CLASSIFIER_TEXT_FIELD.encode("utf-8"))
+    cols = ["case_id", "search_text"] + [t for t in CLASSIFIER_TARGETS if t in data.columns]
+    for row in data[cols].fillna("").astype(str).itertuples(index=False):
+        digest.update("\x1f".join(row).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()[:12]
+
+
+def _fit_target(features, labels):
+    """Train one target's classifier (runs in a joblib worker)."""
+    from sklearn.linear_model import LogisticRegression
+
+    model = LogisticRegression(max_iter=2000, class_weight="balanced")
+    model.fit(features, labels)
+    return model
+
+
+class SafetyIncidentModelTrainer:
+    def __init__(self, analyzer, targets=None, n_jobs=None):
+        """
+        :param analyzer: IncidentAnalyzer whose TF-IDF features are reused
+        :param targets: Columns to learn (default CLASSIFIER_TARGETS)
+        :param n_jobs: Parallel workers (default MODEL_N_JOBS, -1 = all cores)
+        """
+        self.analyzer = analyzer
+        self.targets = targets or CLASSIFIER_TARGETS
+        self.n_jobs = MODEL_N_JOBS if n_jobs is None else n_jobs
+        self.version = data_version(analyzer.live_data)
+        self.vectorizer = analyzer.vectorizer
+        self.models = {}
+
+    def features(self, texts):
+        """TF-IDF features of narratives, as used for training and prediction."""
+        return self.vectorizer.transform(["" if pd.isna(t) else str(t) for t in texts])
+
+    def _training_features(self):
+        data = self.analyzer.data
+        texts = data[CLASSIFIER_TEXT_FIELD] if CLASSIFIER_TEXT_FIELD in data.columns else data["search_text"]
+        return self.features(texts)
+
+    @property
+    def model_path(self):
+        return os.path.join(MODEL_DIR, f"incident_classifier-{self.version}.joblib")
+
+    def _training_rows(self, target):
+        """Row indices and labels for incidents that have a value for target."""
+        labels = self.analyzer.data[target].astype("string").str.strip()
+        mask = labels.notna() & (labels != "") & (labels.str.lower() != "none")
+        rows = np.flatnonzero(mask.to_numpy(dtype=bool) & ~self.analyzer.deleted)
+        return rows, labels.iloc[rows].tolist()
+
+    def train(self):
+        """Fit one classifier per target, in parallel across targets."""
+        from joblib import Parallel, delayed
+
+        jobs = {}
+        for target in self.targets:
+            if target not in self.analyzer.data.columns:
+                continue
+            rows, labels = self._training_rows(target)
+            # A classifier needs at least two distinct labels to learn from
+            if len(set(labels)) >= 2:
+                jobs[target] = (rows, labels)
+
+        features = self._training_features()
+        fitted = Parallel(n_jobs=self.n_jobs, prefer="processes")(
+            delayed(_fit_target)(features[rows], labels)
+            for rows, labels in jobs.values()
+        )
+        self.models = dict(zip(jobs, fitted))
+        return self
+
+    def evaluate(self, folds=5):
+        """Cross-validated accuracy per target (folds run in parallel)."""
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.model_selection import KFold, cross_val_score
+
+        features = self._training_features()
+        scores = {}
+        for target in self.targets:
+            rows, labels = self._training_rows(target)
+            if len(set(labels)) < 2:
+                continue
+            cv = KFold(n_splits=min(folds, len(labels)), shuffle=True, random_state=42)
+            scores[target] = cross_val_score(
+                LogisticRegression(max_iter=2000, class_weight="balanced"),
+                features[rows],
+                labels,
+                cv=cv,
+                n_jobs=self.n_jobs,
+            ).mean()
+        return scores
+
+    def save(self):
+        # The vectorizer is stored with the models so predictions always use
+        # the vocabulary they were trained on
+        return save_versioned(
+            {"version": self.version, "vectorizer": self.vectorizer, "models": self.models},
+            self.model_path,
+        )
+
+    def load(self):
+        """Load the persisted models for the current data version, if any."""
+        import joblib
+
+        if not os.path.exists(self.model_path):
+            return False
+        bundle = joblib.load(self.model_path)
+        self.vectorizer = bundle["vectorizer"]
+        self.models = bundle["models"]
+        return True
+
+    def predict(self, texts):
+        """
+        Classify a batch of narratives in one pass.
+        Returns one dict per text: target -> {"label", "confidence"}.
+        """
+        if not self.models:
+            return [{} for _ in texts]
+        features = self.features(texts)
+        results = [{} for _ in range(features.shape[0])]
+        for target, model in self.models.items():
+            probs = model.predict_proba(features)
+            best = probs.argmax(axis=1)
+            for i, (label_idx, prob) in enumerate(zip(best, probs[np.arange(len(best)), best])):
+                results[i][target] = {"label": str(model.classes_[label_idx]), "confidence": float(prob)}
+        return results
+
+
+def load_or_train(analyzer):
+    """Return a trainer with models for the analyzer's data, training only if needed."""
+    trainer = SafetyIncidentModelTrainer(analyzer)
+    if not trainer.load():
+        trainer.train()
+        try:
+            trainer.save()
+        except OSError as e:
+            print(f"Error saving classifier models: {e}")
+    return trainer
+
+
+if __name__ == "__main__":
+    import time
+    from data_loader import prepare_dataset
+    from incident_analyzer import IncidentAnalyzer
+
+    analyzer = IncidentAnalyzer(prepare_dataset())
+    trainer = SafetyIncidentModelTrainer(analyzer)
+
+    for target, score in trainer.evaluate().items():
+        print(f"  {target:<16} cv accuracy {score:.1%}")
+
+    start = time.perf_counter()
+    trainer.train()
+    print(f"Trained {len(trainer.models)} models in {time.perf_counter() - start:.2f}s")
+    print(f"Saved to {trainer.save()}")
+
+    sample = analyzer.data["what_happened"].fillna("").head(50).tolist()
+    start = time.perf_counter()
+    trainer.predict(sample)
+    print(f"Batch prediction: {(time.perf_counter() - start) / len(sample) * 1e3:.3f} ms per incident")
+    print(trainer.predict(["Gas leak from a flange during startup, operator evacuated"])[0])
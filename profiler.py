@@ -0,0 +1,146 @@
+"""
+Profiler Module
+On-demand sampling profiler for production sessions.
+
+A configurable fraction of calls to wrapped functions is run under cProfile,
+and each sampled call is written to PROFILE_DIR as a ``.prof`` file plus a
+``.json`` sidecar holding the call metadata (query text, intent, duration).
+The directory is rotated so it never holds more than PROFILE_MAX_FILES calls.
+
+Switch it on with the SAFETY_PROFILE_RATE environment variable (0.0 - 1.0)
+or at runtime with set_sample_rate() (e.g. from the admin toggle in app.py).
+"""
+
+import cProfile
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_SAMPLE_RATE
+
+_state = {"rate": PROFILE_SAMPLE_RATE}
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def set_sample_rate(rate):
+    """Change the fraction of calls that are profiled (0 disables profiling)."""
+    _state["rate"] = max(0.0, min(1.0, float(rate)))
+
+
+def get_sample_rate():
+    """Return the current sampling fraction."""
+    return _state["rate"]
+
+
+def annotate(**meta):
+    """
+    Attach metadata to the call currently being profiled on this thread.
+    Does nothing when the current call is not sampled.
+    """
+    current = getattr(_local, "meta", None)
+    if current is not None:
+        current.update(meta)
+
+
+def _rotate(directory):
+    """Delete the oldest profiles so at most PROFILE_MAX_FILES calls are kept."""
+    profiles = sorted(
+        (f for f in os.listdir(directory) if f.endswith(".prof")),
+        key=lambda f: os.path.getmtime(os.path.join(directory, f)),
+    )
+    for name in profiles[: max(0, len(profiles) - PROFILE_MAX_FILES)]:
+        base = os.path.join(directory, name[: -len(".prof")])
+        for ext in (".prof", ".json"):
+            try:
+                os.remove(base + ext)
+            except OSError:
+                pass
+
+
+def _write(name, profile, meta):
+    """Dump one sampled call to the profile directory."""
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base = os.path.join(PROFILE_DIR, f"{stamp}_{name}_{threading.get_ident()}")
+        profile.dump_stats(base + ".prof")
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, default=str)
+        with _lock:
+            _rotate(PROFILE_DIR)
+    except Exception as e:
+        print(f"Error writing profile: {e}")
+
+
+@contextmanager
+def profile_call(name, **meta):
+    """
+    Profile the enclosed block if it is picked by the sampler.
+    Extra keyword arguments are stored in the metadata sidecar.
+    """
+    rate = _state["rate"]
+    # Nested sampled calls are covered by the outer profile
+    if rate <= 0 or getattr(_local, "meta", None) is not None or random.random() >= rate:
+        yield
+        return
+
+    meta = dict(meta, function=name, started_at=datetime.now().isoformat())
+    _local.meta = meta
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    profile.enable()
+    try:
+        yield
+    except Exception as e:
+        meta["error"] = repr(e)
+        raise
+    finally:
+        profile.disable()
+        meta["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        _local.meta = None
+        _write(name, profile, meta)
+
+
+def profiled(name=None, query_arg=None):
+    """
+    Decorator form of profile_call.
+
+    :param name: Label used in the profile file name (defaults to the function name)
+    :param query_arg: Index of a positional argument to record as the query text
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            meta = {}
+            if query_arg is not None and len(args) > query_arg:
+                meta["query"] = args[query_arg]
+            with profile_call(label, **meta):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+if __name__ == "__main__":
+    import pstats
+    import sys
+
+    # Print the top entries of every saved profile (or the ones given)
+    paths = sys.argv[1:] or sorted(
+        os.path.join(PROFILE_DIR, f) for f in os.listdir(PROFILE_DIR) if f.endswith(".prof")
+    )
+    for path in paths:
+        sidecar = path[: -len(".prof")] + ".json"
+        if os.path.exists(sidecar):
+            with open(sidecar, encoding="utf-8") as f:
+                print(json.load(f))
+        pstats.Stats(path).sort_stats("cumulative").print_stats(15)
@@ -0,0 +1,168 @@
+"""
+Sharded Index Module
+Per-site partitions of the incident index with parallel fan-out search.
+
+Incidents are partitioned by SHARD_FIELD (location), and any site with
+more than SHARD_MAX_ROWS incidents is split into several shards by size.
+Each shard holds its own CSR matrix, built with the analyzer's fitted
+vectorizer, so every shard shares one global vocabulary and IDF and scores
+stay comparable across shards. A query is vectorised once and sent to the
+selected shards in a thread pool. Each shard returns its own top-k, and the
+sorted per-shard lists are combined with a k-way merge. Rebuilding one
+site's shards leaves the others untouched, and deleted incidents are left
+out when a site is rebuilt.
+"""
+
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from config import SHARD_FIELD, SHARD_MAX_ROWS, SHARD_WORKERS
+
+_pool = {"executor": None}
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    """Thread pool shared by every ShardedIndex (created on first use)."""
+    with _pool_lock:
+        if _pool["executor"] is None:
+            _pool["executor"] = ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard")
+        return _pool["executor"]
+
+
+class Shard:
+    def __init__(self, key, rows, matrix):
+        """
+        :param key: Site (SHARD_FIELD value) the shard belongs to
+        :param rows: Global row positions of the shard's incidents
+        :param matrix: TF-IDF rows of those incidents (global vocabulary)
+        """
+        self.key = key
+        self.rows = rows
+        self.matrix = matrix
+
+    def __len__(self):
+        return len(self.rows)
+
+    def top_k(self, analyzer, query_vec, k, mask=None):
+        """
+        The shard's k best (-score, row) pairs, best first (ready for heapq.merge).
+        :param mask: Optional global boolean mask of eligible incidents
+        """
+        lexical = (self.matrix @ query_vec.T).toarray().ravel()
+        scores = analyzer._blend(lexical, query_vec, self.rows)
+        rows = self.rows
+        if mask is not None:
+            keep = mask[rows]
+            rows, scores = rows[keep], scores[keep]
+        if len(rows) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[part], scores[part]
+        order = np.lexsort((rows, -scores))
+        return list(zip((-scores[order]).tolist(), rows[order].tolist()))
+
+
+class ShardedIndex:
+    def __init__(self, analyzer, field=SHARD_FIELD, max_rows=SHARD_MAX_ROWS):
+        """
+        :param analyzer: IncidentAnalyzer whose data and vectorizer are sharded
+        :param field: Column incidents are partitioned by (None: by size only)
+        :param max_rows: Largest shard; bigger sites are split
+        """
+        self.analyzer = analyzer
+        self.field = field
+        self.max_rows = max_rows
+        self.shards = {}
+        self.rebuild()
+
+    def _keys(self, rows=None):
+        data = self.analyzer.data if rows is None else self.analyzer.data.iloc[rows]
+        if self.field is None or self.field not in data.columns:
+            return np.full(len(data), "", dtype=object)
+        return data[self.field].astype("string").fillna("Unknown").to_numpy(dtype=object)
+
+    def rebuild(self, keys=None):
+        """
+        (Re)index the shards of the given sites from the analyzer's current
+        data (all sites when keys is None). Other sites' shards are kept.
+        """
+        all_keys = self._keys()
+        live = ~self.analyzer.deleted
+        if keys is None:
+            self.shards = {}
+            keys = set(all_keys[live].tolist())
+        for key in keys:
+            rows = np.flatnonzero((all_keys == key) & live)
+            if not len(rows):
+                self.shards.pop(key, None)
+                continue
+            # Rows of the global TF-IDF matrix: same vocabulary and IDF as every other shard
+            matrix = self.analyzer.tfidf_matrix[rows]
+            self.shards[key] = [
+                Shard(key, rows[start : start + self.max_rows], matrix[start : start + self.max_rows])
+                for start in range(0, len(rows), self.max_rows)
+            ]
+
+    def update(self, analyzer, rows, moved=()):
+        """
+        Re-index only the sites of the given new, edited or deleted rows.
+        :param moved: Sites edited rows were moved away from
+        """
+        self.analyzer = analyzer
+        self.rebuild(set(self._keys(rows).tolist()) | set(moved))
+
+    def select(self, site=None):
+        """Shards of the sites whose name contains site (case-insensitive); all when None."""
+        if not site:
+            return [s for shards in self.shards.values() for s in shards]
+        needle = str(site).lower()
+        return [s for key, shards in self.shards.items() if needle in str(key).lower() for s in shards]
+
+    def search(self, query, site=None, top_k=10, mask=None):
+        """
+        Fan a query out to the selected shards and merge their top-k.
+        Returns (rows, scores) of the best top_k incidents overall, best first.
+        """
+        shards = self.select(site)
+        if not shards:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        query_vec = self.analyzer.vectorizer.transform([query])
+        if len(shards) == 1:
+            partials = [shards[0].top_k(self.analyzer, query_vec, top_k, mask)]
+        else:
+            pool = _executor()
+            futures = [pool.submit(s.top_k, self.analyzer, query_vec, top_k, mask) for s in shards]
+            partials = [f.result() for f in futures]
+        merged = list(islice(heapq.merge(*partials), top_k))
+        rows = np.array([row for _, row in merged], dtype=np.int64)
+        return rows, -np.array([neg for neg, _ in merged], dtype=np.float64)
+
+
+if __name__ == "__main__":
+    import time
+    from data_loader import prepare_dataset
+    from incident_analyzer import IncidentAnalyzer
+
+    analyzer = IncidentAnalyzer(prepare_dataset())
+    start = time.perf_counter()
+    index = ShardedIndex(analyzer)
+    sizes = {key: sum(len(s) for s in shards) for key, shards in index.shards.items()}
+    print(f"Built {len(index.select())} shards in {(time.perf_counter() - start) * 1e3:.1f} ms: {sizes}")
+
+    query = "chemical vapour release during transfer"
+    start = time.perf_counter()
+    rows, scores = index.search(query, top_k=5)
+    print(f"All sites ({(time.perf_counter() - start) * 1e3:.2f} ms):")
+    for row, score in zip(rows, scores):
+        print(f"  {score:.2f}  {analyzer.data['case_id'].iloc[row]} [{analyzer.data['location'].iloc[row]}]")
+
+    full = analyzer.score(query)
+    print(f"Matches the monolithic index: {np.allclose(scores, np.sort(full)[::-1][:5])}")
+
+    start = time.perf_counter()
+    rows, scores = index.search(query, site="Trinidad", top_k=3)
+    print(f"Trinidad only ({(time.perf_counter() - start) * 1e3:.2f} ms): {analyzer.data['case_id'].iloc[rows].tolist()}")
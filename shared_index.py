@@ -0,0 +1,232 @@
+"""
+Shared Index Module
+Publishes the analyzer's immutable arrays as memory-mapped files so that
+several worker processes (Streamlit replicas, API workers) can attach to one
+copy instead of each building and holding their own.
+
+Layout of SHARED_INDEX_DIR:
+    CURRENT              name of the live generation (swapped atomically)
+    gen-000001/          one directory per published generation
+        tfidf_data.npy, tfidf_indices.npy, tfidf_indptr.npy
+        idf.npy, vocabulary.json
+        facet_<column>.npy, facet_<column>.json
+        action_offsets.npy
+        knn_indices.npy, knn_scores.npy
+        lsa_components.npy, lsa_vectors.npy   (only with the LSA mode on)
+        data.pkl         prepared DataFrame rows for this generation
+        meta.json
+
+Only the numeric arrays are shared. data.pkl holds Python objects (text,
+action lists), which cannot be memory-mapped. Every attached worker
+therefore unpickles a private copy of the DataFrame: about 5.5 KB per
+incident, or roughly 1.1 MB for the bundled 197 incidents. That is most
+of a generation's size, so the per-worker saving is in the index arrays
+(vocabulary-sized TF-IDF, kNN and LSA data), not the incident records.
+
+Writers call publish() after rebuilding; readers hold a SharedAnalyzer and
+call get(), which re-attaches only when CURRENT points to a new generation.
+Old generations are unlinked, which is safe on POSIX: processes that still
+map them keep their pages until they move on.
+"""
+
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import SHARED_INDEX_DIR, SHARED_INDEX_KEEP
+from incident_analyzer import IncidentAnalyzer
+from knn_graph import KnnGraph
+from latent_index import LatentIndex
+
+POINTER_FILE = "CURRENT"
+
+
+def _generations(root):
+    return sorted(d for d in os.listdir(root) if d.startswith("gen-"))
+
+
+def current_generation(root=None):
+    """Return the name of the live generation, or None if nothing is published."""
+    root = root or SHARED_INDEX_DIR
+    try:
+        with open(os.path.join(root, POINTER_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def publish(analyzer, root=None):
+    """
+    Write the analyzer's index as a new generation and make it current.
+    Returns the generation name.
+    """
+    root = root or SHARED_INDEX_DIR
+    os.makedirs(root, exist_ok=True)
+
+    tmp = os.path.join(root, f".tmp-{os.getpid()}-{threading.get_ident()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    matrix = analyzer.tfidf_matrix.tocsr()
+    np.save(os.path.join(tmp, "tfidf_data.npy"), matrix.data.astype(np.float64))
+    # indices and indptr must share one dtype or scipy copies them on attach
+    index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+    np.save(os.path.join(tmp, "tfidf_indices.npy"), matrix.indices.astype(index_dtype))
+    np.save(os.path.join(tmp, "tfidf_indptr.npy"), matrix.indptr.astype(index_dtype))
+    np.save(os.path.join(tmp, "idf.npy"), np.asarray(analyzer.vectorizer.idf_, dtype=np.float64))
+
+    # Vocabulary stored as a term list in column order
+    terms = [None] * len(analyzer.vectorizer.vocabulary_)
+    for term, col in analyzer.vectorizer.vocabulary_.items():
+        terms[col] = term
+    with open(os.path.join(tmp, "vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(terms, f)
+
+    for col, (codes, labels) in analyzer.facets.items():
+        np.save(os.path.join(tmp, f"facet_{col}.npy"), np.asarray(codes, dtype=np.int32))
+        with open(os.path.join(tmp, f"facet_{col}.json"), "w", encoding="utf-8") as f:
+            json.dump([None if pd.isna(v) else str(v) for v in labels], f)
+
+    np.save(os.path.join(tmp, "action_offsets.npy"), np.asarray(analyzer.action_offsets, dtype=np.int64))
+    np.save(os.path.join(tmp, "knn_indices.npy"), np.asarray(analyzer.knn.indices, dtype=np.int32))
+    np.save(os.path.join(tmp, "knn_scores.npy"), np.asarray(analyzer.knn.scores, dtype=np.float32))
+    if analyzer.latent is not None:
+        np.save(os.path.join(tmp, "lsa_components.npy"), analyzer.latent.components)
+        np.save(os.path.join(tmp, "lsa_vectors.npy"), analyzer.latent.vectors)
+    analyzer.data.to_pickle(os.path.join(tmp, "data.pkl"))
+
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "shape": list(matrix.shape),
+                "facets": list(analyzer.facets),
+                "rows": len(analyzer.data),
+                "knn": {"k": analyzer.knn.k, "min_similarity": analyzer.knn.min_similarity},
+                "latent": analyzer.latent is not None,
+            },
+            f,
+        )
+
+    # Claim the next generation number; another writer may race us to it
+    while True:
+        existing = _generations(root)
+        number = int(existing[-1].split("-")[1]) + 1 if existing else 1
+        name = f"gen-{number:06d}"
+        try:
+            os.rename(tmp, os.path.join(root, name))
+            break
+        except OSError:
+            if not os.path.exists(os.path.join(root, name)):
+                raise
+
+    # Atomically swap the pointer so readers never see a half-written generation
+    pointer_tmp = os.path.join(root, f".{POINTER_FILE}.{os.getpid()}-{threading.get_ident()}")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(pointer_tmp, os.path.join(root, POINTER_FILE))
+
+    for old in _generations(root)[:-SHARED_INDEX_KEEP]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return name
+
+
+def attach(root=None, generation=None):
+    """
+    Build an IncidentAnalyzer over a published generation.
+    The TF-IDF arrays, facet codes, action offsets, kNN graph and LSA vectors are memory-mapped
+    read-only, so every attached process shares the same physical pages.
+    The incident DataFrame is unpickled into private memory.
+    """
+    from scipy.sparse import csr_matrix
+
+    root = root or SHARED_INDEX_DIR
+    generation = generation or current_generation(root)
+    if generation is None:
+        raise FileNotFoundError(f"No shared index published in {root}")
+    path = os.path.join(root, generation)
+
+    def load(name):
+        return np.load(os.path.join(path, name), mmap_mode="r")
+
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(os.path.join(path, "vocabulary.json"), encoding="utf-8") as f:
+        vocabulary = {term: col for col, term in enumerate(json.load(f))}
+
+    matrix = csr_matrix(
+        (load("tfidf_data.npy"), load("tfidf_indices.npy"), load("tfidf_indptr.npy")),
+        shape=tuple(meta["shape"]),
+        copy=False,
+    )
+
+    facets = {}
+    for col in meta["facets"]:
+        with open(os.path.join(path, f"facet_{col}.json"), encoding="utf-8") as f:
+            labels = np.asarray(json.load(f), dtype=object)
+        facets[col] = (load(f"facet_{col}.npy"), labels)
+
+    analyzer = IncidentAnalyzer.from_index(
+        pd.read_pickle(os.path.join(path, "data.pkl")),
+        vocabulary,
+        np.asarray(load("idf.npy")),
+        matrix,
+        facets=facets,
+        action_offsets=load("action_offsets.npy"),
+        knn=KnnGraph(
+            meta["knn"]["k"],
+            meta["knn"]["min_similarity"],
+            indices=load("knn_indices.npy"),
+            scores=load("knn_scores.npy"),
+        ),
+        latent=LatentIndex(load("lsa_components.npy"), load("lsa_vectors.npy")) if meta.get("latent") else None,
+    )
+    analyzer.generation = generation
+    return analyzer
+
+
+def load_or_publish(root=None):
+    """
+    Attach to the live generation, or build one from the CSVs and publish it
+    if none exists yet (first process to start).
+    """
+    if current_generation(root) is None:
+        from data_loader import prepare_dataset
+
+        publish(IncidentAnalyzer(prepare_dataset()), root)
+    return attach(root)
+
+
+class SharedAnalyzer:
+    """
+    Per-process handle on the shared index. get() returns the attached
+    analyzer and re-attaches when a writer has published a new generation.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or SHARED_INDEX_DIR
+        self._analyzer = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        generation = current_generation(self.root)
+        analyzer = self._analyzer
+        if analyzer is not None and analyzer.generation == generation:
+            return analyzer
+        with self._lock:
+            if self._analyzer is None or self._analyzer.generation != generation:
+                self._analyzer = attach(self.root, generation) if generation else load_or_publish(self.root)
+            return self._analyzer
+
+
+if __name__ == "__main__":
+    from data_loader import prepare_dataset
+
+    # Build from the CSVs and publish a new generation
+    name = publish(IncidentAnalyzer(prepare_dataset()))
+    print(f"Published {name} to {SHARED_INDEX_DIR}")
+    analyzer = attach()
+    print(f"Attached {analyzer.generation}: {analyzer.tfidf_matrix.shape}")
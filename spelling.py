@@ -0,0 +1,302 @@
+"""
+Spelling Module
+Typo-tolerant query correction with a symmetric-delete index.
+
+Every term of the analyzer's TF-IDF vocabulary is indexed under each string
+obtained by deleting up to SPELL_MAX_DISTANCE characters from its first
+SPELL_PREFIX_LENGTH characters. A misspelt query word ("presure") produces
+the same kind of deletes, so its candidate corrections come from a handful
+of dictionary lookups instead of a scan of the vocabulary, and only those
+few candidates are checked with an edit distance. Only terms with the
+word's first letter are considered (typos rarely change it, while a
+different first letter turns names like "Baytown" into "laydown"); the
+closest wins, ties going to the term found in more incidents. Suggestions
+are cached per index, so a repeated typo costs one dictionary lookup.
+
+Words in the vocabulary, stop words and other known words (the rest of the
+incident corpus and the intent vocabulary) are never corrected, and neither
+are their inflections ("cranes", "isolating") or capitalised words inside a
+sentence, which are usually names of sites, units or companies. When the
+vocabulary changes, the previous index is brought up to date by
+re-indexing only the added and removed terms.
+"""
+
+import re
+import threading
+
+import numpy as np
+
+from config import SPELL_MAX_DISTANCE, SPELL_PREFIX_LENGTH, SPELL_MIN_LENGTH, INTENT_EXAMPLES_CSV
+
+# Letters-only words that are not part of an identifier like CASE-012 or a hyphenated term
+_WORD_RE = re.compile(r"(?<![\w-])[^\W\d_]+(?![\w-])")
+_TOKEN_RE = re.compile(r"[^\W\d_]+")
+_SENTENCE_END_RE = re.compile(r"(?:^|[.!?:]\s*)$")
+# Inflection endings and what they replace: "cranes" -> "crane", "batteries" -> "battery"
+_INFLECTIONS = (("ies", "y"), ("es", ""), ("s", ""), ("ied", "y"), ("ed", ""), ("ed", "e"), ("ing", ""), ("ing", "e"))
+
+_CACHE_SIZE = 10000
+
+_latest = {"index": None}
+_latest_lock = threading.Lock()
+_intent_words = {"words": None}
+
+
+def _deletes(word, distance):
+    """word and every string made by deleting up to distance characters from it."""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance (insertions, deletions, substitutions
+    and adjacent transpositions) between a and b, or limit + 1 once it is
+    known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def corpus_words(texts):
+    """Lower-cased letters-only words of some texts."""
+    words = set()
+    for text in texts:
+        words.update(_TOKEN_RE.findall(str(text).lower()))
+    return words
+
+
+def intent_words():
+    """Words of the intent keywords and examples (how people ask, not what about)."""
+    if _intent_words["words"] is None:
+        from tools import INTENT_KEYWORDS
+
+        words = corpus_words(k for keywords in INTENT_KEYWORDS.values() for k in keywords)
+        try:
+            import pandas as pd
+
+            words |= corpus_words(pd.read_csv(INTENT_EXAMPLES_CSV)["text"].fillna(""))
+        except Exception as e:
+            print(f"Error reading intent examples: {e}")
+        _intent_words["words"] = frozenset(words)
+    return _intent_words["words"]
+
+
+class SpellingIndex:
+    def __init__(self, terms, known=(), max_distance=SPELL_MAX_DISTANCE, prefix_length=SPELL_PREFIX_LENGTH,
+                 min_length=SPELL_MIN_LENGTH):
+        """
+        :param terms: {term: weight}; among equally close candidates the
+            highest weight (e.g. document frequency) wins
+        :param known: Other correctly spelt words that are never corrected
+        :param max_distance: Largest edit distance corrected
+        :param prefix_length: Characters of a word used for candidate lookup
+        :param min_length: Shorter words are never corrected
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.min_length = min_length
+        self.terms = {}
+        self.known = frozenset(known)
+        # delete string -> tuple of terms (tuples, so copies can share them)
+        self._deletes = {}
+        self._cache = {}
+        self._apply(terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _keys(self, term):
+        return _deletes(term[: self.prefix_length], self.max_distance)
+
+    def _apply(self, terms):
+        """Index added terms and unindex removed ones. Returns (added, removed) counts."""
+        removed = [t for t in self.terms if t not in terms]
+        added = [t for t in terms if t not in self.terms]
+        for term in removed:
+            for key in self._keys(term):
+                remaining = tuple(t for t in self._deletes.get(key, ()) if t != term)
+                if remaining:
+                    self._deletes[key] = remaining
+                else:
+                    self._deletes.pop(key, None)
+        for term in added:
+            for key in self._keys(term):
+                self._deletes[key] = self._deletes.get(key, ()) + (term,)
+        self.terms = dict(terms)
+        return len(added), len(removed)
+
+    def updated(self, terms=None, known=None):
+        """
+        Copy of the index for a changed vocabulary (only added and removed
+        terms are re-indexed) and/or with more known words. This index is
+        left as it is for queries still using it.
+        """
+        index = object.__new__(SpellingIndex)
+        index.__dict__.update(self.__dict__)
+        index._cache = {}
+        if terms is not None:
+            index._deletes = dict(self._deletes)
+            index._apply(terms)
+        if known:
+            index.known = self.known | frozenset(known)
+        return index
+
+    def suggest(self, word):
+        """Closest vocabulary term to a lower-cased word, or None."""
+        if word in self._cache:
+            return self._cache[word]
+        # One edit for words of up to 6 letters, where two edits reach too many other words
+        limit = min(self.max_distance, max(1, (len(word) - 1) // 3))
+        candidates = set()
+        for key in _deletes(word[: self.prefix_length], limit):
+            candidates.update(self._deletes.get(key, ()))
+        best, best_key = None, None
+        for term in sorted(candidates, key=lambda t: abs(len(t) - len(word))):
+            if term[0] != word[0]:
+                continue
+            distance = edit_distance(word, term, limit)
+            if distance > limit:
+                continue
+            key = (distance, -self.terms[term], term)
+            if best_key is None or key < best_key:
+                best, best_key = term, key
+                # Farther candidates can no longer win
+                limit = distance
+
+        if len(self._cache) >= _CACHE_SIZE:
+            self._cache.clear()
+        self._cache[word] = best
+        return best
+
+    def _is_known(self, word):
+        """True for vocabulary terms, known words and their inflections."""
+        return any(
+            form in self.terms or form in self.known for form in [word] + base_forms(word)
+        )
+
+    def correct(self, text):
+        """
+        Correct the misspelt words of a text.
+        Returns (corrected text, [(word, correction), ...]); words that are
+        known (or an inflection of a known word), too short, capitalised
+        inside a sentence (likely a name) or have no close term are kept as
+        typed.
+        """
+        corrections = []
+
+        def fix(match):
+            word = match.group(0)
+            lower = word.lower()
+            if len(lower) < self.min_length or self._is_known(lower):
+                return word
+            if word[0].isupper() and not _SENTENCE_END_RE.search(text[: match.start()]):
+                return word
+            suggestion = self.suggest(lower)
+            if suggestion is None:
+                return word
+            corrections.append((word, suggestion))
+            return suggestion.capitalize() if word[0].isupper() else suggestion
+
+        return _WORD_RE.sub(fix, text), corrections
+
+
+def base_forms(word):
+    """
+    Candidate uninflected forms of a lower-case word ("isolating" ->
+    "isolat", "isolate"); a doubled final consonant is undone too
+    ("tagged" -> "tag").
+    """
+    forms = []
+    for ending, replacement in _INFLECTIONS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            stem = word[: -len(ending)]
+            forms.append(stem + replacement)
+            if not replacement and len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] not in "aeiousl":
+                forms.append(stem[:-1])
+    return forms
+
+
+def vocabulary_terms(vectorizer, matrix):
+    """{term: number of incidents containing it} for the letters-only unigrams of a vocabulary."""
+    frequency = np.bincount(matrix.indices, minlength=len(vectorizer.vocabulary_)) if matrix.nnz else None
+    return {
+        term: int(frequency[col]) if frequency is not None else 0
+        for term, col in vectorizer.vocabulary_.items()
+        if term.isalpha() and len(term) >= 3
+    }
+
+
+def build(vectorizer, matrix, texts):
+    """
+    Spelling index for an analyzer's vocabulary (vectorizer and incident
+    TF-IDF matrix) and corpus. The index built last is brought up to date
+    with the new vocabulary instead of being rebuilt from scratch.
+    """
+    terms = vocabulary_terms(vectorizer, matrix)
+    known = corpus_words(texts) | set(vectorizer.get_stop_words() or ()) | intent_words()
+    with _latest_lock:
+        latest = _latest["index"]
+        if latest is None:
+            index = SpellingIndex(terms, known)
+        else:
+            index = latest.updated(terms)
+            index.known = frozenset(known)
+        _latest["index"] = index
+    return index
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from data_loader import prepare_dataset
+    from incident_analyzer import IncidentAnalyzer
+
+    analyzer = IncidentAnalyzer(prepare_dataset())
+    matrix = analyzer.tfidf_matrix[: len(analyzer.data)]
+    start = time.perf_counter()
+    index = SpellingIndex(vocabulary_terms(analyzer.vectorizer, matrix))
+    print(f"Indexed {len(index)} terms under {len(index._deletes)} deletes in {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+    start = time.perf_counter()
+    updated = index.updated(vocabulary_terms(analyzer.vectorizer, matrix))
+    print(f"Incremental update for an unchanged vocabulary: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    intent_words()
+    start = time.perf_counter()
+    index = build(analyzer.vectorizer, matrix, analyzer.data["search_text"])
+    print(f"Fresh index with the corpus words as known: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    for query in ["presure relese during valve replacement", "confind space entry", "chlorine leek at the pump", "Ammonia release at Baytown"]:
+        start = time.perf_counter()
+        corrected, corrections = index.correct(query)
+        elapsed = (time.perf_counter() - start) * 1e6
+        start = time.perf_counter()
+        index.correct(query)
+        cached = (time.perf_counter() - start) * 1e6
+        before = len(analyzer.find_similar(query))
+        after = len(analyzer.find_similar(corrected))
+        print(f"'{query}' -> '{corrected}' {corrections} ({elapsed:.0f} µs, {cached:.0f} µs cached), matches: {before} -> {after}")
+
+    # Inflections of known words are kept; typos are still corrected
+    failures = 0
+    for query, expected in [("cranes lifting pipes", "cranes lifting pipes"), ("presure relese", "pressure release")]:
+        corrected, _ = index.correct(query)
+        failures += corrected != expected
+        print(f"{'ok ' if corrected == expected else 'BAD'} '{query}' -> '{corrected}' (expected '{expected}')")
+    sys.exit(1 if failures else 0)
@@ -3,191 +3,430 @@ Tools Module
 High-level tool functions that the chatbot agent uses to answer user queries.
 """
 
+import math
+import re
+import sys
 from collections import Counter
+from datetime import datetime
 
+import numpy as np
+import pandas as pd
 
-def get_recommendations(analyzer, query, top_n=5):
+from config import INTENT_MODEL_MIN_CONFIDENCE, SIMILARITY_THRESHOLD
+
+
+def get_recommendations(analyzer, query, top_n=5, max_actions=10, scores=None):
     """
-    Find similar past incidents and extract their corrective actions.
+    Find similar past incidents and rank their corrective actions.
 
     Returns a dict with:
       - similar_incidents: list of matching incidents with details
-      - recommended_actions: deduplicated list of corrective actions from those incidents
-    """
-    similar = analyzer.find_similar(query, top_n=top_n)
-
-    # Collect all actions from similar incidents
-    all_actions = []
-    for incident in similar:
-        for action in incident.get("actions_list", []):
-            all_actions.append(
-                {
-                    "action": action["action"],
-                    "owner": action.get("owner", "N/A"),
-                    "timing": action.get("timing", "N/A"),
-                    "from_case": incident["case_id"],
-                    "from_title": incident["title"],
-                    "similarity": incident["similarity"],
-                }
-            )
+      - recommended_actions: canonical actions (rewordings merged) ranked by
+        how strongly the matching incidents used them
 
+    scores: per-incident scores already computed for this turn (optional)
+    """
+    similar = analyzer.find_similar(query, top_n=top_n, scores=scores)
     return {
         "similar_incidents": similar,
-        "recommended_actions": all_actions,
+        "recommended_actions": rank_actions(analyzer, similar, max_actions),
     }
 
 
-def get_training_suggestions(analyzer, query, top_n=5):
+def rank_actions(analyzer, incidents, max_actions=10):
+    """
+    Aggregate the canonical actions of a set of scored incidents.
+    Each action's score is the summed similarity of the incidents that used it.
     """
-    Extract training-related recommendations from similar past incidents.
+    index = analyzer.get_action_index()
+    rows = np.array([analyzer.case_rows[inc["case_id"]] for inc in incidents], dtype=np.int64)
+    sims = np.array([inc["similarity"] for inc in incidents], dtype=np.float64)
+    scores = np.zeros(index.incidence.shape[0])
+    scores[rows] = sims
 
-    Looks at 'lessons_to_prevent' and 'what_went_well' fields.
+    # Which of the matched incidents used each ranked action
+    used = index.incidence[rows].tocsc() if len(rows) else None
+
+    ranked = []
+    for cluster, score in index.rank(scores, top_n=max_actions):
+        canonical = index.canonical[cluster]
+        users = used[:, cluster].nonzero()[0]
+        best = users[int(sims[users].argmax())]
+        source = incidents[best]
+        ranked.append(
+            {
+                "action": canonical["action"],
+                "owner": canonical["owners"][0] if canonical["owners"] else "N/A",
+                "owners": canonical["owners"],
+                "timing": canonical["timing"],
+                "frequency": canonical["frequency"],
+                "from_case": source["case_id"],
+                "from_title": source["title"],
+                "from_cases": [incidents[u]["case_id"] for u in users],
+                "similarity": source["similarity"],
+                "score": score,
+            }
+        )
+    return ranked
+
+
+def get_training_suggestions(analyzer, query, top_n=5, scores=None):
     """
-    similar = analyzer.find_similar(query, top_n=top_n)
+    Find the lesson and good-practice sentences that best match a query.
 
-    lessons = []
-    good_practices = []
+    Searches the sentence-level lessons index built from 'lessons_to_prevent'
+    and 'what_went_well', so only the relevant sentences are returned rather
+    than whole paragraphs. top_n is the number of sentences per field.
 
-    for incident in similar:
-        # Extract lessons
-        lesson_text = incident.get("lessons_to_prevent", "")
-        if lesson_text and str(lesson_text) != "nan":
-            lessons.append(
-                {
-                    "lesson": str(lesson_text).strip(),
-                    "from_case": incident["case_id"],
-                    "from_title": incident["title"],
-                    "risk_level": incident.get("risk_level", "N/A"),
-                    "similarity": incident["similarity"],
-                }
-            )
+    scores: per-incident scores already computed for this turn (optional)
+    """
+    index = analyzer.get_lesson_index()
+    incident_scores = analyzer.score(query) if scores is None else scores
 
-        # Extract what went well
-        well_text = incident.get("what_went_well", "")
-        if well_text and str(well_text) != "nan":
-            good_practices.append(
+    def sentences(field, key):
+        hits = []
+        for pos, score in index.search(query, field, incident_scores, top_n=top_n):
+            incident = analyzer.data.iloc[index.rows[pos]]
+            hits.append(
                 {
-                    "practice": str(well_text).strip(),
+                    key: index.sentences[pos],
                     "from_case": incident["case_id"],
                     "from_title": incident["title"],
-                    "similarity": incident["similarity"],
+                    "risk_level": incident.get("risk_level", "N/A"),
+                    "similarity": score,
                 }
             )
+        return hits
 
     return {
-        "lessons_to_prevent": lessons,
-        "good_practices": good_practices,
+        "lessons_to_prevent": sentences("lessons_to_prevent", "lesson"),
+        "good_practices": sentences("what_went_well", "practice"),
     }
 
 
-def search_incidents(analyzer, query, filters=None, top_n=10):
+def search_incidents(analyzer, query, filters=None, top_n=10, scores=None):
     """
     Search incidents by text similarity with optional filters.
 
     :param filters: dict like {'risk_level': 'High', 'category': 'Safety'}
+    :param scores: per-incident scores already computed for this turn (optional)
+    """
+    return analyzer.find_similar(query, top_n=top_n, filters=filters, scores=scores)
+
+
+def search_actions(analyzer, query, filters=None, top_n=10):
+    """
+    Search individual corrective actions directly, without going through incidents.
+
+    :param filters: dict like {'owner': 'Maintenance Planner', 'timing': '<30 days'}
+        (facets: owner, timing, verification)
+    """
+    return analyzer.get_action_index().search(query, filters=filters, top_n=top_n)
+
+
+def get_related(analyzer, case_id, top_n=5):
+    """
+    Incidents related to a given case, read from the precomputed kNN graph.
     """
-    return analyzer.find_similar(query, top_n=top_n, filters=filters)
+    return analyzer.related(case_id, top_n=top_n)
+
+
+def get_trends(analyzer, dimension=None, top_n=5):
+    """
+    What's trending, answered from the precomputed per-year series.
+
+    Returns a dict with:
+      - spikes: unusual spikes in the most recent years (strongest first)
+      - rising: when nothing spikes, the values growing most above baseline
+      - per_year: incident totals per year
+    :param dimension: Restrict to 'category', 'location' or 'topic'
+    """
+    trends = analyzer.trends
+    dims = [dimension] if dimension in trends.dimensions else None
+    spikes = trends.spikes(dims=dims)
+    rising = [] if spikes else trends.spikes(dims=dims, threshold=0.0)
+    return {
+        "spikes": spikes[:top_n],
+        "rising": rising[:top_n],
+        "per_year": dict(zip(trends.periods.tolist(), trends.totals.tolist())),
+    }
+
+
+def find_case_ids(user_message):
+    """Case IDs (CASE-012, INC-197) mentioned in a message, upper-cased."""
+    return [m.upper() for m in _CASE_ID_RE.findall(user_message)]
 
 
-def get_statistics(analyzer):
+def get_statistics(analyzer, scores=None):
     """
     Return summary statistics about the entire incident database.
+
+    With per-incident scores for a topic, a 'matching' entry adds the same
+    statistics over the incidents at or above SIMILARITY_THRESHOLD.
     """
-    return analyzer.get_statistics()
+    stats = analyzer.get_statistics()
+    if scores is not None:
+        stats["matching"] = analyzer.get_statistics(rows=np.flatnonzero(scores >= SIMILARITY_THRESHOLD))
+    return stats
 
 
-def detect_intent(user_message):
+def to_jsonable(value):
+    """Convert tool results (pandas NaN/NA, timestamps, numpy scalars) into plain JSON types."""
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+# Keywords per intent, in tie-break priority order (earlier wins a tie)
+INTENT_KEYWORDS = {
+    "stats": [
+        "statistics",
+        "stats",
+        "overview",
+        "summary",
+        "how many",
+        "total",
+        "count",
+        "count of",
+        "breakdown",
+        "distribution",
+        "number of",
+        "how often",
+        "how frequently",
+    ],
+    # Phrases that only occur when asking about the action records themselves
+    "actions": [
+        "owned by",
+        "who owns",
+        "assigned to",
+        "verified by",
+        "action items",
+        "actions about",
+        "actions with",
+        "actions owned",
+    ],
+    "related": ["related", "similar to case", "like case", "more like"],
+    "recommend": [
+        "recommend",
+        "suggestion",
+        "what should",
+        "action",
+        "corrective",
+        "what to do",
+        "how to handle",
+        "advice",
+        "fix",
+        "mitigation",
+    ],
+    "training": [
+        "training",
+        "train",
+        "lesson",
+        "learn",
+        "best practice",
+        "what went well",
+        "good practice",
+        "prevent",
+        "retrain",
+        "trained",
+        "taught",
+        "skills",
+        "toolbox talk",
+        "refresher",
+        "competency",
+    ],
+    # Explicit phrases only: "rising" or "surge" usually describe an incident
+    "trending": ["trending", "trend", "on the rise"],
+    "help": ["help", "what can you do", "how do i use"],
+    "search": [
+        "search",
+        "find",
+        "show",
+        "list",
+        "incidents",
+        "filter",
+        "look up",
+        "high risk",
+        "low risk",
+        "medium",
+    ],
+}
+
+# Common inflections accepted after a keyword ("prevent" -> "prevention",
+# "recommend" -> "recommended"). The agent suffix -er is left out: "helper",
+# "shower".
+_SUFFIXES = r"(?:s|es|ed|ing|ings|ion|ions|ive|ative|ations?)?"
+# Search verbs in the past tense describe the incident ("listed equipment",
+# "showed signs of corrosion"), so these intents do not take -ed
+_NO_PAST_TENSE = {"search"}
+# Question phrases that name the intent outright score more than one hit, so
+# "how many high risk incidents" is a stats question, not a search
+_KEYWORD_WEIGHTS = {"how many": 3, "number of": 3, "count of": 3}
+
+
+def _compile_intent_pattern(keywords):
+    """
+    Build one alternation with a named group per intent. Keywords are
+    word-boundary anchored, so "total" no longer matches inside other words.
     """
-    Simple keyword-based intent detection.
-    Returns one of: 'recommend', 'training', 'search', 'stats', 'help', 'general'
-    """
-    msg = user_message.lower().strip()
-
-    # Stats / overview
-    if any(
-        kw in msg
-        for kw in [
-            "statistics",
-            "stats",
-            "overview",
-            "summary",
-            "how many",
-            "total",
-            "count",
-            "breakdown",
-            "distribution",
-        ]
-    ):
-        return "stats"
-
-    # Training suggestions
-    if any(
-        kw in msg
-        for kw in [
-            "training",
-            "train",
-            "lesson",
-            "learn",
-            "best practice",
-            "what went well",
-            "good practice",
-            "prevent",
-        ]
-    ):
-        return "training"
-
-    # Recommendations / what to do
-    if any(
-        kw in msg
-        for kw in [
-            "recommend",
-            "suggestion",
-            "what should",
-            "action",
-            "corrective",
-            "what to do",
-            "how to handle",
-            "advice",
-            "fix",
-            "mitigation",
-        ]
-    ):
+    groups = []
+    for intent, kws in keywords.items():
+        # Longest first so multi-word phrases win over their prefixes
+        alternatives = "|".join(
+            re.escape(kw).replace(r"\ ", r"\s+") for kw in sorted(kws, key=len, reverse=True)
+        )
+        suffixes = _SUFFIXES.replace("|ed|", "|") if intent in _NO_PAST_TENSE else _SUFFIXES
+        groups.append(f"(?P<{intent}>{alternatives}){suffixes}")
+    return re.compile(rf"\b(?:{'|'.join(groups)})\b", re.IGNORECASE)
+
+
+_INTENT_PATTERN = _compile_intent_pattern(INTENT_KEYWORDS)
+_INTENT_PRIORITY = {intent: rank for rank, intent in enumerate(INTENT_KEYWORDS)}
+_intent_model = {"model": None}
+_CASE_ID_RE = re.compile(r"\b(?:CASE|INC)-\d+\b", re.IGNORECASE)
+# Owner / timing phrasings that only make sense for action records:
+# "actions ... owners", "timing of actions", "<30 days", "within 90 days"
+_ACTION_PHRASE_RE = re.compile(
+    r"\bactions?\b(?:\s+[^\s.?!]+){0,6}?\s+(?:owners?|owned|timing|verification)\b"
+    r"|\btiming\s+of\s+(?:the\s+)?actions?\b"
+    r"|[<>]\s*\d+\s*days?\b|\bwithin\s+\d+\s*days?\b",
+    re.IGNORECASE,
+)
+_CLAUSE_RE = re.compile(
+    r"[?;!]+|\.\s+|\s+[—–-]+\s+"
+    r"|(?:,\s*|\s+)(?:and|also|plus|then)\s+(?=(?:what|how|which|who|show|find|list|give|tell|any)\b)"
+    r"|,\s*(?=(?:what|how|which|who|show|find|list|give|tell)\b)",
+    re.IGNORECASE,
+)
+
+
+def _keyword_scores(user_message):
+    """
+    Count keyword hits per intent in a single regex pass, weighting the
+    phrases in _KEYWORD_WEIGHTS. "related" only
+    counts next to a case ID, so "work-related injuries" is not a lookup.
+    Owner and timing phrasings add action hits.
+    """
+    scores = {}
+    for match in _INTENT_PATTERN.finditer(user_message):
+        keyword = " ".join(match.group(match.lastgroup).lower().split())
+        scores[match.lastgroup] = scores.get(match.lastgroup, 0) + _KEYWORD_WEIGHTS.get(keyword, 1)
+    action_phrases = len(_ACTION_PHRASE_RE.findall(user_message))
+    if action_phrases:
+        scores["actions"] = scores.get("actions", 0) + action_phrases
+    if "related" in scores and not _CASE_ID_RE.search(user_message):
+        del scores["related"]
+    return scores
+
+
+def _best_intent(scores):
+    """Highest score wins; ties fall back to INTENT_KEYWORDS order."""
+    if not scores:
+        # Default: treat as an incident description for recommendations
         return "recommend"
+    return min(scores, key=lambda i: (-scores[i], _INTENT_PRIORITY[i]))
+
+
+def match_intent(user_message):
+    """
+    Rule-based intent detection in a single pass over the text.
+    Every keyword hit scores one point for its intent (more for the phrases
+    in _KEYWORD_WEIGHTS); the highest score
+    wins and ties fall back to INTENT_KEYWORDS order.
+    Returns 'recommend' when nothing matches.
+    """
+    return _best_intent(_keyword_scores(user_message))
+
 
-    # Help
-    if any(kw in msg for kw in ["help", "what can you do", "how do i use"]):
-        return "help"
-
-    # Search for specific incidents
-    if any(
-        kw in msg
-        for kw in [
-            "search",
-            "find",
-            "show",
-            "list",
-            "incidents",
-            "filter",
-            "look up",
-            "high risk",
-            "low risk",
-            "medium",
-        ]
-    ):
-        return "search"
-
-    # Default: treat as an incident description for recommendations
-    return "recommend"
+def split_clauses(user_message):
+    """
+    Split a message into clauses at sentence ends, dashes and conjunctions
+    that introduce a new question ("..., and how often has this happened").
+    """
+    return [c.strip() for c in _CLAUSE_RE.split(user_message) if c and c.strip()]
+
+
+def match_intents(user_message):
+    """
+    Intents asked for in a multi-part message, in order of first mention.
+    Each clause is matched on its own; clauses without keyword hits (for
+    example an incident description) add no intent.
+    """
+    intents = []
+    for clause in split_clauses(user_message):
+        if _keyword_scores(clause):
+            intent = match_intent(clause)
+            if intent not in intents:
+                intents.append(intent)
+    return intents
+
+
+def topic_text(user_message):
+    """
+    The descriptive part of a multi-part message: the clauses with no intent
+    keywords ("we had a chlorine leak"). Empty when every clause is a question.
+    """
+    return " ".join(c for c in split_clauses(user_message) if not _keyword_scores(c))
+
+
+def set_intent_model(model):
+    """
+    Install (or remove with None) a trained intent classifier used by
+    detect_intent. Returns the previously installed model.
+    """
+    previous, _intent_model["model"] = _intent_model["model"], model
+    return previous
+
+
+def detect_intent(user_message):
+    """
+    Detect the intent of a message.
+    Returns one of: 'recommend', 'actions', 'related', 'training', 'trending', 'search', 'stats', 'help'
+
+    Uses the compiled keyword matcher. When the keywords are ambiguous (no hit,
+    or a tie between intents) and a trained classifier from intent_classifier
+    is loaded, a confident model prediction decides instead.
+    """
+    scores = _keyword_scores(user_message)
+    model = _intent_model["model"]
+    if model is not None:
+        top = sorted(scores.values(), reverse=True)
+        if not top or (len(top) > 1 and top[0] == top[1]):
+            intent, confidence = model.predict_one(user_message)
+            if confidence >= INTENT_MODEL_MIN_CONFIDENCE:
+                return intent
+    return _best_intent(scores)
 
 
 if __name__ == "__main__":
-    # Test intent detection
+    # Test intent detection (message, expected intent)
     test_messages = [
-        "What training should we do for chemical handling?",
-        "Show me high risk incidents",
-        "How many incidents happened in 2023?",
-        "We had a pressure release during valve replacement, what should we do?",
-        "help",
+        ("What training should we do for chemical handling?", "training"),
+        ("Show me high risk incidents", "search"),
+        ("How many incidents happened in 2023?", "stats"),
+        ("How many high risk incidents do we have?", "stats"),
+        ("Show recommended actions for forklift incidents", "recommend"),
+        ("Listed equipment was not inspected before use", "recommend"),
+        ("We had a pressure release during valve replacement, what should we do?", "recommend"),
+        ("What actions are owned by the Maintenance Planner with <30 days timing?", "actions"),
+        ("what actions have owners in Maintenance Planner with <30 days timing", "actions"),
+        ("Which actions are due within 90 days?", "actions"),
+        ("What training should operators get on verification of isolation?", "training"),
+        ("help", "help"),
     ]
-    for msg in test_messages:
-        print(f"  '{msg}' -> {detect_intent(msg)}")
+    failures = 0
+    for msg, expected in test_messages:
+        intent = detect_intent(msg)
+        failures += intent != expected
+        print(f"  {'ok ' if intent == expected else 'BAD'} '{msg}' -> {intent} (expected {expected})")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,214 @@
+"""
+Topic Model Module
+Hazard themes (isolation / trapped pressure, confined space, electrical, ...)
+learned from the incident corpus.
+
+Mini-batch k-means is trained over the analyzer's TF-IDF matrix and
+persisted under MODEL_DIR, keyed to the vocabulary it was trained on
+(topic_model-<version>.joblib); it is not retrained when incidents are
+added, so topic ids and labels stay stable. A corpus of fewer than
+TOPIC_MIN_INCIDENTS incidents gets a model that is used but never saved.
+
+Each topic is labelled with the terms that set it apart: weight above the
+corpus mean, discounted for terms that stand out in several topics.
+Assignment is one sparse product against the k centroids, so a new
+incident is assigned in constant time at submission. The centroids are
+stored by term, so they can be aligned with any later vocabulary; a new
+vocabulary reuses the newest saved model until more than
+TOPIC_REFIT_DRIFT of the corpus's TF-IDF weight falls on terms the model
+has never seen.
+
+Run this module to (re)train the model and list the topics:
+    python topic_model.py
+"""
+
+import glob
+import hashlib
+import os
+
+import numpy as np
+
+from config import MODEL_DIR, TOPIC_COUNT, TOPIC_LABEL_TERMS, TOPIC_MIN_INCIDENTS, TOPIC_REFIT_DRIFT
+from model_store import save_versioned
+
+UNASSIGNED = "Other"
+
+
+class TopicModel:
+    def __init__(self, n_topics=TOPIC_COUNT, label_terms=TOPIC_LABEL_TERMS, seed=42):
+        """
+        :param n_topics: Number of topics (capped by the number of incidents)
+        :param label_terms: Top terms joined into each topic's label
+        """
+        self.n_topics = n_topics
+        self.label_terms = label_terms
+        self.seed = seed
+        self.terms = {}
+        self.centroids = None
+        self.labels = []
+        self._aligned = (None, None)
+
+    def fit(self, matrix, vocabulary):
+        """
+        Cluster an L2-normalised TF-IDF matrix.
+        :param vocabulary: dict term -> column of matrix
+        """
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.preprocessing import normalize
+
+        if matrix.shape[0] == 0:
+            return self
+        k = max(1, min(self.n_topics, matrix.shape[0]))
+        kmeans = MiniBatchKMeans(n_clusters=k, random_state=self.seed, n_init=5, batch_size=1024)
+        kmeans.fit(matrix)
+
+        self.terms = dict(vocabulary)
+        self.centroids = normalize(kmeans.cluster_centers_).astype(np.float32)
+        columns = np.empty(len(vocabulary), dtype=object)
+        for term, col in vocabulary.items():
+            columns[col] = term
+        # Label with the terms that most set a topic apart: weight above the
+        # corpus mean, discounted by how many topics the term stands out in
+        centers = kmeans.cluster_centers_
+        above = centers - np.asarray(matrix.mean(axis=0)).ravel()
+        spread = np.maximum((above > 0).sum(axis=0), 1)
+        distinct = above * np.log(k / spread)
+        self.labels = [self._label(columns[np.argsort(-row)]) for row in distinct]
+        self._aligned = (None, None)
+        return self
+
+    def _label(self, ranked_terms):
+        """Label from the top terms, skipping ones already covered ("pressure" vs "pressure release")."""
+        chosen = []
+        for term in ranked_terms:
+            if any(term in c or c in term for c in chosen):
+                continue
+            chosen.append(term)
+            if len(chosen) == self.label_terms:
+                break
+        return " / ".join(chosen)
+
+    def _weights_for(self, vocabulary):
+        """Centroids as a (len(vocabulary) x k) matrix in another vocabulary's column order."""
+        cached_vocab, weights = self._aligned
+        if cached_vocab is vocabulary:
+            return weights
+        weights = np.zeros((len(vocabulary), len(self.labels)), dtype=np.float32)
+        for term, col in vocabulary.items():
+            own = self.terms.get(term)
+            if own is not None:
+                weights[col] = self.centroids[:, own]
+        self._aligned = (vocabulary, weights)
+        return weights
+
+    def assign(self, matrix, vocabulary):
+        """
+        Topic label for each row of a TF-IDF matrix built with vocabulary.
+        Rows sharing no terms with any topic are labelled UNASSIGNED.
+        """
+        if self.centroids is None or matrix.shape[0] == 0:
+            return [UNASSIGNED] * matrix.shape[0]
+        scores = np.asarray(matrix @ self._weights_for(vocabulary))
+        best = scores.argmax(axis=1)
+        matched = scores[np.arange(len(best)), best] > 0
+        return [self.labels[b] if ok else UNASSIGNED for b, ok in zip(best, matched)]
+
+    def drift(self, matrix, vocabulary):
+        """Share of the matrix's TF-IDF weight on terms this model was not trained on."""
+        mass = np.asarray(matrix.sum(axis=0)).ravel()
+        total = mass.sum()
+        if total == 0:
+            return 0.0
+        unseen = [col for term, col in vocabulary.items() if term not in self.terms]
+        return float(mass[unseen].sum() / total)
+
+    def __getstate__(self):
+        # The alignment cache is keyed by object identity; rebuild it after loading
+        state = self.__dict__.copy()
+        state["_aligned"] = (None, None)
+        return state
+
+    def save(self, path=None):
+        path = path or model_path(self.terms)
+        return save_versioned(self, path)
+
+
+def vocabulary_version(vocabulary):
+    """Short hash of the terms a model is trained over."""
+    digest = hashlib.sha1()
+    for term in sorted(vocabulary):
+        digest.update(term.encode("utf-8") + b"\x1f")
+    return digest.hexdigest()[:12]
+
+
+def model_path(vocabulary):
+    return os.path.join(MODEL_DIR, f"topic_model-{vocabulary_version(vocabulary)}.joblib")
+
+
+def _newest_model():
+    """The most recently saved topic model, or None."""
+    import joblib
+
+    paths = sorted(glob.glob(os.path.join(MODEL_DIR, "topic_model-*.joblib")), key=os.path.getmtime)
+    if not paths:
+        return None
+    try:
+        return joblib.load(paths[-1])
+    except Exception as e:
+        print(f"Error loading topic model: {e}")
+        return None
+
+
+def load_or_train(matrix, vocabulary):
+    """
+    Load the persisted topic model for this vocabulary. A new vocabulary
+    reuses the newest saved model while its drift stays within
+    TOPIC_REFIT_DRIFT; otherwise a model is trained on this matrix. Either
+    way it is saved under this vocabulary (unless the corpus is too small
+    to be trusted).
+    """
+    import joblib
+
+    if matrix.shape[0] < TOPIC_MIN_INCIDENTS:
+        return TopicModel().fit(matrix, vocabulary)
+
+    path = model_path(vocabulary)
+    if os.path.exists(path):
+        try:
+            return joblib.load(path)
+        except Exception as e:
+            print(f"Error loading topic model: {e}")
+
+    model = _newest_model()
+    if model is None or model.drift(matrix, vocabulary) > TOPIC_REFIT_DRIFT:
+        model = TopicModel().fit(matrix, vocabulary)
+    try:
+        save_versioned(model, path)
+    except OSError as e:
+        print(f"Error saving topic model: {e}")
+    return model
+
+
+if __name__ == "__main__":
+    import time
+    from collections import Counter
+    from data_loader import prepare_dataset
+    from incident_analyzer import IncidentAnalyzer
+    # Imported from the module so the pickle does not refer to __main__
+    from topic_model import TopicModel as PersistedTopicModel
+
+    analyzer = IncidentAnalyzer(prepare_dataset())
+    matrix = analyzer.tfidf_matrix[: len(analyzer.data)]
+    vocabulary = analyzer.vectorizer.vocabulary_
+
+    start = time.perf_counter()
+    model = PersistedTopicModel().fit(matrix, vocabulary)
+    print(f"Trained {len(model.labels)} topics in {time.perf_counter() - start:.2f}s; saved to {model.save()}")
+
+    for label, count in Counter(model.assign(matrix, vocabulary)).most_common():
+        print(f"  {count:4d}  {label}")
+
+    sample = analyzer.vectorizer.transform(["Trapped pressure released when a fitting was loosened"])
+    start = time.perf_counter()
+    topic = model.assign(sample, vocabulary)[0]
+    print(f"Assigned new incident to '{topic}' in {(time.perf_counter() - start) * 1e6:.0f} µs")
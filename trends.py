@@ -0,0 +1,211 @@
+"""
+Trends Module
+Per-period incident counts and spike detection for hazard themes.
+
+For each dimension in TREND_DIMENSIONS (category, location, topic) a
+(values x periods) count matrix is kept over yearly periods, the only
+granularity every record has. Counts are updated in place when incidents
+are added, edited or deleted, and rolling-window sums and spike scores are
+computed over the whole matrix at once from cumulative sums.
+
+A value spikes in a period when its count is well above what its share of
+incidents over the previous TREND_WINDOW periods predicts for that period's
+total (Poisson z-score), so overall growth in reporting does not register
+as a spike of every value. Each baseline also holds TREND_PRIOR_INCIDENTS
+pseudo-incidents spread evenly over the values, so a value never seen
+before needs more than a handful of incidents to count as a spike.
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    TREND_DIMENSIONS,
+    TREND_WINDOW,
+    TREND_Z_THRESHOLD,
+    TREND_MIN_COUNT,
+    TREND_RECENT_PERIODS,
+    TREND_PRIOR_INCIDENTS,
+)
+
+
+class TrendIndex:
+    def __init__(self, data, dimensions=TREND_DIMENSIONS, window=TREND_WINDOW, prior=TREND_PRIOR_INCIDENTS):
+        """
+        :param data: DataFrame with a 'year' column (data_loader.normalize_dates)
+            and the dimension columns
+        :param window: Trailing periods used as the baseline for spikes
+        :param prior: Pseudo-incidents spread evenly over the values of a
+            dimension in every baseline
+        """
+        self.dimensions = [d for d in dimensions if d in data.columns]
+        self.window = window
+        self.prior = prior
+        self.first_period = None
+        self.totals = np.zeros(0, dtype=np.int64)
+        self.labels = {dim: [] for dim in self.dimensions}
+        self._positions = {dim: {} for dim in self.dimensions}
+        self.counts = {dim: np.zeros((0, 0), dtype=np.int64) for dim in self.dimensions}
+        self.add(data)
+
+    @property
+    def periods(self):
+        if self.first_period is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.arange(self.first_period, self.first_period + len(self.totals))
+
+    def _extend_periods(self, years):
+        """Grow every matrix so the period axis covers years (contiguous, zero-filled)."""
+        lo, hi = int(years.min()), int(years.max())
+        if self.first_period is None:
+            self.first_period = lo
+            before, after = 0, hi - lo + 1
+        else:
+            before = max(0, self.first_period - lo)
+            after = max(0, hi - (self.first_period + len(self.totals) - 1))
+            self.first_period -= before
+        if before or after:
+            self.totals = np.pad(self.totals, (before, after))
+            for dim in self.dimensions:
+                self.counts[dim] = np.pad(self.counts[dim], ((0, 0), (before, after)))
+
+    def _codes(self, dim, values):
+        """Row positions for values, adding rows for values not seen before."""
+        positions = self._positions[dim]
+        codes = np.empty(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            code = positions.get(value)
+            if code is None:
+                code = positions[value] = len(self.labels[dim])
+                self.labels[dim].append(value)
+            codes[i] = code
+        missing = len(self.labels[dim]) - self.counts[dim].shape[0]
+        if missing:
+            self.counts[dim] = np.pad(self.counts[dim], ((0, missing), (0, 0)))
+        return codes
+
+    def add(self, data):
+        """Count incidents into the series (used for the initial load and for new incidents)."""
+        self._count(data, 1)
+
+    def remove(self, data):
+        """Take incidents back out of the series (deleted incidents, or the old version of edited ones)."""
+        self._count(data, -1)
+
+    def _count(self, data, sign):
+        if "year" not in data.columns or data.empty:
+            return
+        years = pd.to_numeric(data["year"], errors="coerce")
+        dated = years.notna().to_numpy()
+        if not dated.any():
+            return
+        years = years[dated].astype(np.int64).to_numpy()
+        self._extend_periods(years)
+        columns = years - self.first_period
+
+        np.add.at(self.totals, columns, sign)
+        for dim in self.dimensions:
+            values = data[dim][dated].astype("string").fillna("Unknown").str.strip().tolist()
+            codes = self._codes(dim, values)
+            np.add.at(self.counts[dim], (codes, columns), sign)
+
+    def rolling(self, dim, window=None):
+        """Counts per value over the trailing window ending at each period."""
+        window = window or self.window
+        cumulative = np.cumsum(self.counts[dim], axis=1)
+        shifted = np.zeros_like(cumulative)
+        shifted[:, window:] = cumulative[:, :-window] if cumulative.shape[1] > window else 0
+        return cumulative - shifted
+
+    def spike_scores(self, dim):
+        """
+        (expected, z) matrices for every value and period. expected is what the
+        value's share over the previous window, smoothed towards an even share
+        by the prior, predicts for the period's total; periods without a
+        baseline get z = 0.
+        """
+        counts = self.counts[dim].astype(np.float64)
+        window_counts = self.rolling(dim).astype(np.float64)
+        window_totals = np.convolve(self.totals, np.ones(self.window), mode="full")[: len(self.totals)]
+
+        # Baseline for period t: the window ending at t - 1
+        base_counts = np.zeros_like(counts)
+        base_counts[:, 1:] = window_counts[:, :-1]
+        base_totals = np.zeros(len(self.totals))
+        base_totals[1:] = window_totals[:-1]
+
+        n_values = max(len(counts), 1)
+        share = (base_counts + self.prior / n_values) / (base_totals + self.prior)
+        expected = share * self.totals
+        z = (counts - expected) / np.sqrt(expected + 1.0)
+        z[:, base_totals == 0] = 0.0
+        return expected, z
+
+    def spikes(self, dims=None, recent=TREND_RECENT_PERIODS, threshold=TREND_Z_THRESHOLD, min_count=TREND_MIN_COUNT):
+        """
+        Unusual spikes in the most recent periods that have incidents, strongest first.
+        Returns dicts with dimension, value, period, count, expected and z.
+        """
+        if not len(self.totals):
+            return []
+        recent_cols = np.flatnonzero(self.totals > 0)[-recent:]
+        found = []
+        for dim in dims or self.dimensions:
+            expected, z = self.spike_scores(dim)
+            counts = self.counts[dim]
+            rows, cols = np.nonzero(
+                (z[:, recent_cols] >= threshold) & (counts[:, recent_cols] >= min_count)
+            )
+            for row, col in zip(rows, recent_cols[cols]):
+                found.append(
+                    {
+                        "dimension": dim,
+                        "value": self.labels[dim][row],
+                        "period": int(self.first_period + col),
+                        "count": int(counts[row, col]),
+                        "expected": float(expected[row, col]),
+                        "z": float(z[row, col]),
+                    }
+                )
+        return sorted(found, key=lambda s: -s["z"])
+
+    def series(self, dim, value):
+        """{period: count} for one value of a dimension."""
+        row = self._positions[dim].get(value)
+        if row is None:
+            return {}
+        return {int(p): int(c) for p, c in zip(self.periods, self.counts[dim][row])}
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from data_loader import prepare_dataset
+    from incident_analyzer import IncidentAnalyzer
+
+    data = IncidentAnalyzer(prepare_dataset()).data
+    start = time.perf_counter()
+    trends = TrendIndex(data)
+    print(f"Built series for {len(trends.periods)} periods in {(time.perf_counter() - start) * 1e3:.1f} ms")
+    print(f"Incidents per year: {dict(zip(trends.periods.tolist(), trends.totals.tolist()))}")
+
+    start = time.perf_counter()
+    spikes = trends.spikes()
+    print(f"{len(spikes)} spikes in {(time.perf_counter() - start) * 1e3:.2f} ms:")
+    for s in spikes:
+        print(f"  {s['dimension']:<9} {s['value']:<40} {s['period']}: {s['count']} (expected {s['expected']:.1f}, z={s['z']:.1f})")
+
+    # A value first seen with a handful of incidents is not a spike; a
+    # value tripling over its usual share still is
+    years = [y for y in (2021, 2022, 2023) for _ in range(30)] + [2024] * 33
+    categories = ["A", "B", "C"] * 30 + ["A"] * 10 + ["B"] * 10 + ["C"] * 10 + ["New"] * 3
+    toy = TrendIndex(pd.DataFrame({"year": years, "category": categories}), dimensions=["category"])
+    ok = not [s for s in toy.spikes() if s["value"] == "New"]
+    print(f"{'ok ' if ok else 'BAD'} new value with 3 incidents and no baseline is not a spike")
+    years += [2025] * 40
+    categories += ["A"] * 30 + ["B"] * 5 + ["C"] * 5
+    toy = TrendIndex(pd.DataFrame({"year": years, "category": categories}), dimensions=["category"])
+    found = [(s["value"], s["period"]) for s in toy.spikes()]
+    print(f"{'ok ' if ('A', 2025) in found else 'BAD'} tripled value is a spike: {found}")
+    ok = ok and ("A", 2025) in found
+    sys.exit(0 if ok else 1)